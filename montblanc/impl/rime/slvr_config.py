@@ -18,6 +18,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program; if not, see <http://www.gnu.org/licenses/>.
 
+import json
 import os
 
 from montblanc.slvr_config import SolverConfig
@@ -32,6 +33,18 @@ def _init_weights(s):
 
     return s
 
+def _str2bool(s):
+    """ Convert 'True' and 'False' strings to booleans """
+    value = { 'true': True, 'false': False }.get(s.lower(), None)
+
+    if value is None:
+        import configargparse
+
+        raise configargparse.ArgumentTypeError("'{s}' must be "
+            "one of True or False".format(s=s))
+
+    return value
+
 class RimeSolverConfig(SolverConfig):
     E_BEAM_WIDTH = 'beam_lw'
     DEFAULT_E_BEAM_WIDTH = 50
@@ -83,6 +96,247 @@ class RimeSolverConfig(SolverConfig):
     SOURCE_BATCH_SIZE_DESCRIPTION = (
         "Minimum source batch size used when computing the RIME")
 
+    SOURCE_STREAMING = 'source_streaming'
+    DEFAULT_SOURCE_STREAMING = False
+    VALID_SOURCE_STREAMING = [True, False]
+    SOURCE_STREAMING_DESCRIPTION = (
+        "If True, the CPU solver accumulates visibilities "
+        "over batches of '{sbs}' sources, rather than computing "
+        "the per-baseline terms for all sources at once. "
+        "Per-source intermediate arrays are not allocated.").format(
+            sbs=SOURCE_BATCH_SIZE)
+
+    COHERENCY_ENGINE = 'coherency_engine'
+    COHERENCY_ENGINE_GATHER = 'gather'
+    COHERENCY_ENGINE_GEMM = 'gemm'
+    DEFAULT_COHERENCY_ENGINE = COHERENCY_ENGINE_GATHER
+    VALID_COHERENCY_ENGINES = [COHERENCY_ENGINE_GATHER,
+        COHERENCY_ENGINE_GEMM]
+    COHERENCY_ENGINE_DESCRIPTION = (
+        "Method used by the CPU solver to sum coherencies over sources. "
+        "If '{g}', per-baseline jones matrices are gathered "
+        "from per-antenna jones matrices and summed. "
+        "If '{m}', point source coherencies are computed as a "
+        "Gram matrix product with batched complex matrix multiplies.").format(
+            g=COHERENCY_ENGINE_GATHER, m=COHERENCY_ENGINE_GEMM)
+
+    VISIBILITY_TILE_SHAPE = 'vis_tile_shape'
+    DEFAULT_VISIBILITY_TILE_SHAPE = None
+    VISIBILITY_TILE_SHAPE_DESCRIPTION = (
+        "Dictionary containing the size of visibility tiles "
+        "solved independently by the CPU solver, keyed on the "
+        "ntime, nbl and nchan dimensions. Dimensions that are "
+        "not present are not subdivided. "
+        "e.g. {'ntime': 1, 'nbl': 64}. "
+        "If None, the visibility space is solved as a whole.")
+
+    CPU_THREADS = 'cpu_threads'
+    DEFAULT_CPU_THREADS = None
+    CPU_THREADS_DESCRIPTION = (
+        "Number of threads with which the CPU solver "
+        "solves visibility tiles concurrently with the numba "
+        "backend. Tiles solved with numexpr are solved in turn "
+        "on numexpr's own threads. "
+        "If None, the number of available CPUs is used.")
+
+    CPU_PROCESSES = 'cpu_processes'
+    DEFAULT_CPU_PROCESSES = None
+    CPU_PROCESSES_DESCRIPTION = (
+        "Number of worker processes with which the multi-process "
+        "CPU solver solves visibility tiles. "
+        "If None, the number of available CPUs is used.")
+
+    CPU_BACKEND = 'cpu_backend'
+    CPU_BACKEND_NUMEXPR = 'numexpr'
+    CPU_BACKEND_NUMBA = 'numba'
+    DEFAULT_CPU_BACKEND = CPU_BACKEND_NUMEXPR
+    VALID_CPU_BACKENDS = [CPU_BACKEND_NUMEXPR, CPU_BACKEND_NUMBA]
+    CPU_BACKEND_DESCRIPTION = (
+        "Backend with which the CPU solver computes model visibilities "
+        "and chi-squared terms. "
+        "If '{ne}', each RIME term is computed over whole arrays "
+        "with numpy and numexpr. "
+        "If '{nb}', the RIME is computed in a single fused loop "
+        "compiled with numba, which must be installed.").format(
+            ne=CPU_BACKEND_NUMEXPR, nb=CPU_BACKEND_NUMBA)
+
+    TERM_CACHE_SIZE = 'term_cache_size'
+    DEFAULT_TERM_CACHE_SIZE = 0
+    TERM_CACHE_SIZE_DESCRIPTION = (
+        "Size in megabytes of the CPU solver's cache of intermediate "
+        "RIME terms, such as the K and E terms. Terms are reused "
+        "between solves if the arrays they depend on have not "
+        "been marked dirty, either explicitly or by their "
+        "transfer methods. The cache is shared with the solver's "
+        "tiles and other sub-solvers. Least recently used terms "
+        "are evicted first. If 0, terms are not cached.")
+
+    POLARISATION_MODE = 'polarisation_mode'
+    POLARISATION_MODE_AUTO = 'auto'
+    POLARISATION_MODE_FULL = 'full'
+    POLARISATION_MODE_DIAGONAL = 'diagonal'
+    POLARISATION_MODE_SCALAR = 'scalar'
+    DEFAULT_POLARISATION_MODE = POLARISATION_MODE_FULL
+    VALID_POLARISATION_MODES = [POLARISATION_MODE_AUTO,
+        POLARISATION_MODE_FULL, POLARISATION_MODE_DIAGONAL,
+        POLARISATION_MODE_SCALAR]
+    POLARISATION_MODE_DESCRIPTION = (
+        "Number of correlations carried by the CPU solver when "
+        "summing coherencies over sources. "
+        "If '{d}', only the XX and YY correlations are computed, "
+        "which is exact for an unpolarised sky (Q = U = V = 0) "
+        "and a diagonal beam. "
+        "If '{s}', a single correlation is computed and broadcast "
+        "to XX and YY, which is exact if the beam is also scalar. "
+        "If '{f}', all four correlations are computed. "
+        "If '{a}', the smallest exact mode is detected "
+        "from the stokes parameters and beam cube. "
+        "The per antenna jones array is only populated "
+        "when all four correlations are computed.").format(
+            d=POLARISATION_MODE_DIAGONAL, s=POLARISATION_MODE_SCALAR,
+            f=POLARISATION_MODE_FULL, a=POLARISATION_MODE_AUTO)
+
+    SPARSE_FLAGS = 'sparse_flags'
+    DEFAULT_SPARSE_FLAGS = False
+    VALID_SPARSE_FLAGS = [True, False]
+    SPARSE_FLAGS_DESCRIPTION = (
+        "If True, the CPU solver sums coherencies over sources only "
+        "for (time, baseline, channel) samples with unflagged "
+        "correlations, scattering the results into the visibility "
+        "grid. This saves work on heavily flagged data. "
+        "Not used by the numba backend.")
+
+    BDA_TOLERANCE = 'bda_tolerance'
+    DEFAULT_BDA_TOLERANCE = None
+    BDA_TOLERANCE_DESCRIPTION = (
+        "If set, the CPU solver predicts model visibilities with "
+        "baseline-dependent averaging. Each baseline is evaluated "
+        "on blocks of timesteps and channels, sized by its uv "
+        "track so that linear interpolation between blocks "
+        "bounds the error of each source's contribution to this "
+        "fraction of its amplitude. Not used by the numba backend.")
+
+    BEAM_MODEL = 'beam_model'
+    BEAM_MODEL_CUBE = 'cube'
+    BEAM_MODEL_COS3 = 'cos3'
+    BEAM_MODEL_GAUSSIAN = 'gaussian'
+    BEAM_MODEL_AIRY = 'airy'
+    DEFAULT_BEAM_MODEL = BEAM_MODEL_CUBE
+    VALID_BEAM_MODELS = [BEAM_MODEL_CUBE, BEAM_MODEL_COS3,
+        BEAM_MODEL_GAUSSIAN, BEAM_MODEL_AIRY]
+    BEAM_MODEL_DESCRIPTION = (
+        "Primary beam model used by the CPU solver. "
+        "If '{cube}', the beam is interpolated from the E_beam cube. "
+        "Otherwise, a scalar, circularly symmetric beam is "
+        "evaluated in closed form, and the E_beam cube is not "
+        "created. The beam is a function of rho = "
+        "beam_width*1e-9*frequency*r, r being the distance of a "
+        "source from the pointing centre after rotation, pointing "
+        "errors and antenna scaling. "
+        "'{cos3}' is cos(min(rho, beam_clip))**3, "
+        "'{gauss}' is exp(-rho**2) and "
+        "'{airy}' is 2*J1(rho)/rho, which requires scipy. "
+        "Analytic beams are not used by the numba backend.").format(
+            cube=BEAM_MODEL_CUBE, cos3=BEAM_MODEL_COS3,
+            gauss=BEAM_MODEL_GAUSSIAN, airy=BEAM_MODEL_AIRY)
+
+    BEAM_TIME_FACTOR = 'beam_time_factor'
+    DEFAULT_BEAM_TIME_FACTOR = None
+    BEAM_TIME_FACTOR_DESCRIPTION = (
+        "If set, the CPU solver evaluates the E term every "
+        "this many timesteps, and at the last timestep, linearly "
+        "interpolating it onto the remaining timesteps. "
+        "Not used by the numba backend.")
+
+    BEAM_MAX_ROTATION = 'beam_max_rotation'
+    DEFAULT_BEAM_MAX_ROTATION = None
+    BEAM_MAX_ROTATION_DESCRIPTION = (
+        "If set, the CPU solver evaluates the E term on timesteps "
+        "spaced so that parallactic angles rotate by at most this "
+        "many radians between evaluations, linearly interpolating "
+        "it onto the remaining timesteps. Combined with '{f}', "
+        "the smaller spacing is used. "
+        "Not used by the numba backend.").format(f=BEAM_TIME_FACTOR)
+
+    BEAM_COMPRESSION = 'beam_compression'
+    BEAM_COMPRESSION_NONE = 'none'
+    BEAM_COMPRESSION_COMPLEX64 = 'complex64'
+    BEAM_COMPRESSION_FLOAT16 = 'float16'
+    BEAM_COMPRESSION_SVD = 'svd'
+    DEFAULT_BEAM_COMPRESSION = BEAM_COMPRESSION_NONE
+    VALID_BEAM_COMPRESSIONS = [BEAM_COMPRESSION_NONE,
+        BEAM_COMPRESSION_COMPLEX64, BEAM_COMPRESSION_FLOAT16,
+        BEAM_COMPRESSION_SVD]
+    BEAM_COMPRESSION_DESCRIPTION = (
+        "Representation of the beam cube from which the CPU "
+        "solver interpolates the E term. "
+        "If '{n}', the E_beam cube is used as is. "
+        "If '{c}' or '{h}', the real and imaginary planes, and "
+        "the amplitudes, of the cube are stored in single or "
+        "half precision and upcast during interpolation. "
+        "If '{s}', the frequency planes of the cube are stored "
+        "as a singular value decomposition truncated to "
+        "'{r}' components, and reconstructed at the "
+        "interpolation points. The compressed cube is rebuilt "
+        "whenever E_beam is marked dirty. "
+        "Not used by the numba backend.").format(
+            n=BEAM_COMPRESSION_NONE, c=BEAM_COMPRESSION_COMPLEX64,
+            h=BEAM_COMPRESSION_FLOAT16, s=BEAM_COMPRESSION_SVD,
+            r='beam_rank')
+
+    BEAM_RANK = 'beam_rank'
+    DEFAULT_BEAM_RANK = 8
+    BEAM_RANK_DESCRIPTION = (
+        "Number of singular components retained when the "
+        "beam cube is compressed with '{s}'.").format(
+            s=BEAM_COMPRESSION_SVD)
+
+    BEAM_CLUSTERING = 'beam_clustering'
+    BEAM_CLUSTERING_NONE = 'none'
+    BEAM_CLUSTERING_GRID = 'grid'
+    BEAM_CLUSTERING_KMEANS = 'kmeans'
+    DEFAULT_BEAM_CLUSTERING = BEAM_CLUSTERING_NONE
+    VALID_BEAM_CLUSTERINGS = [BEAM_CLUSTERING_NONE,
+        BEAM_CLUSTERING_GRID, BEAM_CLUSTERING_KMEANS]
+    BEAM_CLUSTERING_DESCRIPTION = (
+        "If not '{n}', the CPU solver clusters sources by their "
+        "lm coordinates, and evaluates the E term once per cluster "
+        "centre, applying it to every source in the cluster. "
+        "If '{g}', the centres are those of the occupied cells of "
+        "a regular grid. If '{k}', they are refined from the grid "
+        "cells with k-means. No source is further than "
+        "'{t}' from its centre. "
+        "Not used by the numba backend.").format(
+            n=BEAM_CLUSTERING_NONE, g=BEAM_CLUSTERING_GRID,
+            k=BEAM_CLUSTERING_KMEANS, t='beam_cluster_tolerance')
+
+    BEAM_CLUSTER_TOLERANCE = 'beam_cluster_tolerance'
+    DEFAULT_BEAM_CLUSTER_TOLERANCE = 1e-3
+    BEAM_CLUSTER_TOLERANCE_DESCRIPTION = (
+        "Largest distance in lm of a source from its cluster "
+        "centre, when sources are clustered with '{c}'.").format(
+            c=BEAM_CLUSTERING)
+
+    HOMOGENEOUS_BEAM = 'homogeneous_beam'
+    HOMOGENEOUS_BEAM_AUTO = 'auto'
+    HOMOGENEOUS_BEAM_ALWAYS = 'always'
+    HOMOGENEOUS_BEAM_NEVER = 'never'
+    DEFAULT_HOMOGENEOUS_BEAM = HOMOGENEOUS_BEAM_NEVER
+    VALID_HOMOGENEOUS_BEAMS = [HOMOGENEOUS_BEAM_AUTO,
+        HOMOGENEOUS_BEAM_ALWAYS, HOMOGENEOUS_BEAM_NEVER]
+    HOMOGENEOUS_BEAM_DESCRIPTION = (
+        "Whether every antenna sees the same E term. If so, "
+        "the CPU solver evaluates the E term for the first antenna "
+        "and broadcasts it across antennas. "
+        "If '{al}', this is assumed. If '{n}', the E term is "
+        "evaluated for each antenna. If '{au}', it is detected "
+        "from the parallactic angles, pointing errors and "
+        "antenna scaling, which must match across antennas, "
+        "and detected again when these are marked dirty. "
+        "Not used by the numba backend.").format(
+            al=HOMOGENEOUS_BEAM_ALWAYS, n=HOMOGENEOUS_BEAM_NEVER,
+            au=HOMOGENEOUS_BEAM_AUTO)
+
     NSOLVERS = 'nsolvers'
     DEFAULT_NSOLVERS = 2
     NSOLVERS_DESCRIPTION = (
@@ -97,14 +351,20 @@ class RimeSolverConfig(SolverConfig):
     VISIBILITY_OUTPUT = 'vis_output'
     VISIBILITY_OUTPUT_MODEL = 'model'
     VISIBILITY_OUTPUT_RESIDUALS = 'residuals'
+    VISIBILITY_OUTPUT_NONE = 'none'
     DEFAULT_VISIBILITY_OUTPUT = VISIBILITY_OUTPUT_MODEL
     VALID_VISIBILITY_OUTPUTS = [VISIBILITY_OUTPUT_MODEL,
-        VISIBILITY_OUTPUT_RESIDUALS]
+        VISIBILITY_OUTPUT_RESIDUALS, VISIBILITY_OUTPUT_NONE]
     VISIBILITY_OUTPUT_DESCRIPTION = (
         "If '{m}' produces model visibilities. "
         "If '{r}' produces residuals from the "
-        "difference of model and observed visibilities.").format(
-            m=VISIBILITY_OUTPUT_MODEL, r=VISIBILITY_OUTPUT_RESIDUALS)
+        "difference of model and observed visibilities. "
+        "If '{n}' only the chi-squared value is produced, "
+        "and the model visibility and chi-squared term "
+        "arrays are not allocated. "
+        "Only supported by the CPU solver.").format(
+            m=VISIBILITY_OUTPUT_MODEL, r=VISIBILITY_OUTPUT_RESIDUALS,
+            n=VISIBILITY_OUTPUT_NONE)
 
     VISIBILITY_WRITE_MODE = 'vis_write_mode'
     VISIBILITY_WRITE_MODE_OVERWRITE = 'overwrite'
@@ -168,6 +428,123 @@ class RimeSolverConfig(SolverConfig):
             SolverConfig.REQUIRED: True
         },
 
+        SOURCE_STREAMING: {
+            SolverConfig.DESCRIPTION: SOURCE_STREAMING_DESCRIPTION,
+            SolverConfig.VALID: VALID_SOURCE_STREAMING,
+            SolverConfig.DEFAULT: DEFAULT_SOURCE_STREAMING,
+            SolverConfig.REQUIRED: True
+        },
+
+        COHERENCY_ENGINE: {
+            SolverConfig.DESCRIPTION: COHERENCY_ENGINE_DESCRIPTION,
+            SolverConfig.VALID: VALID_COHERENCY_ENGINES,
+            SolverConfig.DEFAULT: DEFAULT_COHERENCY_ENGINE,
+            SolverConfig.REQUIRED: True
+        },
+
+        VISIBILITY_TILE_SHAPE: {
+            SolverConfig.DESCRIPTION: VISIBILITY_TILE_SHAPE_DESCRIPTION,
+            SolverConfig.DEFAULT: DEFAULT_VISIBILITY_TILE_SHAPE,
+            SolverConfig.REQUIRED: False
+        },
+
+        CPU_THREADS: {
+            SolverConfig.DESCRIPTION: CPU_THREADS_DESCRIPTION,
+            SolverConfig.DEFAULT: DEFAULT_CPU_THREADS,
+            SolverConfig.REQUIRED: False
+        },
+
+        CPU_PROCESSES: {
+            SolverConfig.DESCRIPTION: CPU_PROCESSES_DESCRIPTION,
+            SolverConfig.DEFAULT: DEFAULT_CPU_PROCESSES,
+            SolverConfig.REQUIRED: False
+        },
+
+        CPU_BACKEND: {
+            SolverConfig.DESCRIPTION: CPU_BACKEND_DESCRIPTION,
+            SolverConfig.VALID: VALID_CPU_BACKENDS,
+            SolverConfig.DEFAULT: DEFAULT_CPU_BACKEND,
+            SolverConfig.REQUIRED: True
+        },
+
+        TERM_CACHE_SIZE: {
+            SolverConfig.DESCRIPTION: TERM_CACHE_SIZE_DESCRIPTION,
+            SolverConfig.DEFAULT: DEFAULT_TERM_CACHE_SIZE,
+            SolverConfig.REQUIRED: False
+        },
+
+        POLARISATION_MODE: {
+            SolverConfig.DESCRIPTION: POLARISATION_MODE_DESCRIPTION,
+            SolverConfig.VALID: VALID_POLARISATION_MODES,
+            SolverConfig.DEFAULT: DEFAULT_POLARISATION_MODE,
+            SolverConfig.REQUIRED: False
+        },
+
+        SPARSE_FLAGS: {
+            SolverConfig.DESCRIPTION: SPARSE_FLAGS_DESCRIPTION,
+            SolverConfig.VALID: VALID_SPARSE_FLAGS,
+            SolverConfig.DEFAULT: DEFAULT_SPARSE_FLAGS,
+            SolverConfig.REQUIRED: False
+        },
+
+        BDA_TOLERANCE: {
+            SolverConfig.DESCRIPTION: BDA_TOLERANCE_DESCRIPTION,
+            SolverConfig.DEFAULT: DEFAULT_BDA_TOLERANCE,
+            SolverConfig.REQUIRED: False
+        },
+
+        BEAM_MODEL: {
+            SolverConfig.DESCRIPTION: BEAM_MODEL_DESCRIPTION,
+            SolverConfig.VALID: VALID_BEAM_MODELS,
+            SolverConfig.DEFAULT: DEFAULT_BEAM_MODEL,
+            SolverConfig.REQUIRED: False
+        },
+
+        BEAM_TIME_FACTOR: {
+            SolverConfig.DESCRIPTION: BEAM_TIME_FACTOR_DESCRIPTION,
+            SolverConfig.DEFAULT: DEFAULT_BEAM_TIME_FACTOR,
+            SolverConfig.REQUIRED: False
+        },
+
+        BEAM_MAX_ROTATION: {
+            SolverConfig.DESCRIPTION: BEAM_MAX_ROTATION_DESCRIPTION,
+            SolverConfig.DEFAULT: DEFAULT_BEAM_MAX_ROTATION,
+            SolverConfig.REQUIRED: False
+        },
+
+        BEAM_COMPRESSION: {
+            SolverConfig.DESCRIPTION: BEAM_COMPRESSION_DESCRIPTION,
+            SolverConfig.VALID: VALID_BEAM_COMPRESSIONS,
+            SolverConfig.DEFAULT: DEFAULT_BEAM_COMPRESSION,
+            SolverConfig.REQUIRED: False
+        },
+
+        BEAM_RANK: {
+            SolverConfig.DESCRIPTION: BEAM_RANK_DESCRIPTION,
+            SolverConfig.DEFAULT: DEFAULT_BEAM_RANK,
+            SolverConfig.REQUIRED: False
+        },
+
+        BEAM_CLUSTERING: {
+            SolverConfig.DESCRIPTION: BEAM_CLUSTERING_DESCRIPTION,
+            SolverConfig.VALID: VALID_BEAM_CLUSTERINGS,
+            SolverConfig.DEFAULT: DEFAULT_BEAM_CLUSTERING,
+            SolverConfig.REQUIRED: False
+        },
+
+        BEAM_CLUSTER_TOLERANCE: {
+            SolverConfig.DESCRIPTION: BEAM_CLUSTER_TOLERANCE_DESCRIPTION,
+            SolverConfig.DEFAULT: DEFAULT_BEAM_CLUSTER_TOLERANCE,
+            SolverConfig.REQUIRED: False
+        },
+
+        HOMOGENEOUS_BEAM: {
+            SolverConfig.DESCRIPTION: HOMOGENEOUS_BEAM_DESCRIPTION,
+            SolverConfig.VALID: VALID_HOMOGENEOUS_BEAMS,
+            SolverConfig.DEFAULT: DEFAULT_HOMOGENEOUS_BEAM,
+            SolverConfig.REQUIRED: False
+        },
+
         NSOLVERS: {
             SolverConfig.DESCRIPTION: NSOLVERS_DESCRIPTION,
             SolverConfig.DEFAULT: DEFAULT_NSOLVERS,
@@ -241,6 +618,123 @@ class RimeSolverConfig(SolverConfig):
             help=self.SOURCE_BATCH_SIZE_DESCRIPTION,
             default=self.DEFAULT_SOURCE_BATCH_SIZE)
 
+        p.add_argument('--{v}'.format(v=self.SOURCE_STREAMING),
+            required=False,
+            type=_str2bool,
+            choices=self.VALID_SOURCE_STREAMING,
+            help=self.SOURCE_STREAMING_DESCRIPTION,
+            default=self.DEFAULT_SOURCE_STREAMING)
+
+        p.add_argument('--{v}'.format(v=self.COHERENCY_ENGINE),
+            required=False,
+            type=str,
+            choices=self.VALID_COHERENCY_ENGINES,
+            help=self.COHERENCY_ENGINE_DESCRIPTION,
+            default=self.DEFAULT_COHERENCY_ENGINE)
+
+        p.add_argument('--{v}'.format(v=self.VISIBILITY_TILE_SHAPE),
+            required=False,
+            type=json.loads,
+            help=self.VISIBILITY_TILE_SHAPE_DESCRIPTION,
+            default=self.DEFAULT_VISIBILITY_TILE_SHAPE)
+
+        p.add_argument('--{v}'.format(v=self.CPU_THREADS),
+            required=False,
+            type=int,
+            help=self.CPU_THREADS_DESCRIPTION,
+            default=self.DEFAULT_CPU_THREADS)
+
+        p.add_argument('--{v}'.format(v=self.CPU_PROCESSES),
+            required=False,
+            type=int,
+            help=self.CPU_PROCESSES_DESCRIPTION,
+            default=self.DEFAULT_CPU_PROCESSES)
+
+        p.add_argument('--{v}'.format(v=self.CPU_BACKEND),
+            required=False,
+            type=str,
+            choices=self.VALID_CPU_BACKENDS,
+            help=self.CPU_BACKEND_DESCRIPTION,
+            default=self.DEFAULT_CPU_BACKEND)
+
+        p.add_argument('--{v}'.format(v=self.TERM_CACHE_SIZE),
+            required=False,
+            type=int,
+            help=self.TERM_CACHE_SIZE_DESCRIPTION,
+            default=self.DEFAULT_TERM_CACHE_SIZE)
+
+        p.add_argument('--{v}'.format(v=self.POLARISATION_MODE),
+            required=False,
+            type=str,
+            choices=self.VALID_POLARISATION_MODES,
+            help=self.POLARISATION_MODE_DESCRIPTION,
+            default=self.DEFAULT_POLARISATION_MODE)
+
+        p.add_argument('--{v}'.format(v=self.SPARSE_FLAGS),
+            required=False,
+            type=_str2bool,
+            choices=self.VALID_SPARSE_FLAGS,
+            help=self.SPARSE_FLAGS_DESCRIPTION,
+            default=self.DEFAULT_SPARSE_FLAGS)
+
+        p.add_argument('--{v}'.format(v=self.BDA_TOLERANCE),
+            required=False,
+            type=float,
+            help=self.BDA_TOLERANCE_DESCRIPTION,
+            default=self.DEFAULT_BDA_TOLERANCE)
+
+        p.add_argument('--{v}'.format(v=self.BEAM_MODEL),
+            required=False,
+            type=str,
+            choices=self.VALID_BEAM_MODELS,
+            help=self.BEAM_MODEL_DESCRIPTION,
+            default=self.DEFAULT_BEAM_MODEL)
+
+        p.add_argument('--{v}'.format(v=self.BEAM_TIME_FACTOR),
+            required=False,
+            type=int,
+            help=self.BEAM_TIME_FACTOR_DESCRIPTION,
+            default=self.DEFAULT_BEAM_TIME_FACTOR)
+
+        p.add_argument('--{v}'.format(v=self.BEAM_MAX_ROTATION),
+            required=False,
+            type=float,
+            help=self.BEAM_MAX_ROTATION_DESCRIPTION,
+            default=self.DEFAULT_BEAM_MAX_ROTATION)
+
+        p.add_argument('--{v}'.format(v=self.BEAM_COMPRESSION),
+            required=False,
+            type=str,
+            choices=self.VALID_BEAM_COMPRESSIONS,
+            help=self.BEAM_COMPRESSION_DESCRIPTION,
+            default=self.DEFAULT_BEAM_COMPRESSION)
+
+        p.add_argument('--{v}'.format(v=self.BEAM_RANK),
+            required=False,
+            type=int,
+            help=self.BEAM_RANK_DESCRIPTION,
+            default=self.DEFAULT_BEAM_RANK)
+
+        p.add_argument('--{v}'.format(v=self.BEAM_CLUSTERING),
+            required=False,
+            type=str,
+            choices=self.VALID_BEAM_CLUSTERINGS,
+            help=self.BEAM_CLUSTERING_DESCRIPTION,
+            default=self.DEFAULT_BEAM_CLUSTERING)
+
+        p.add_argument('--{v}'.format(v=self.BEAM_CLUSTER_TOLERANCE),
+            required=False,
+            type=float,
+            help=self.BEAM_CLUSTER_TOLERANCE_DESCRIPTION,
+            default=self.DEFAULT_BEAM_CLUSTER_TOLERANCE)
+
+        p.add_argument('--{v}'.format(v=self.HOMOGENEOUS_BEAM),
+            required=False,
+            type=str,
+            choices=self.VALID_HOMOGENEOUS_BEAMS,
+            help=self.HOMOGENEOUS_BEAM_DESCRIPTION,
+            default=self.DEFAULT_HOMOGENEOUS_BEAM)
+
         p.add_argument('--{v}'.format(v=self.NSOLVERS),
             required=False,
             type=int,
@@ -99,7 +99,19 @@ def ap_idx(self, default_ap=None, src=False, chan=False):
 
     return idx0, idx1
 
-def monkey_patch_antenna_pairs(slvr):
+def array_ap_idx(self, default_ap=None, src=False, chan=False):
+    """
+    As ap_idx, but the antenna pairs default to those
+    stored in the solver's antenna1 and antenna2 arrays.
+    This is only suitable for solvers whose arrays
+    reside in host memory.
+    """
+    if default_ap is None:
+        default_ap = (self.antenna1, self.antenna2)
+
+    return ap_idx(self, default_ap, src=src, chan=chan)
+
+def monkey_patch_antenna_pairs(slvr, from_arrays=False):
     # Monkey patch these functions onto the solver object
     import types
 
@@ -107,4 +119,4 @@ def monkey_patch_antenna_pairs(slvr):
         default_ant_pairs, slvr)
 
     slvr.ap_idx = types.MethodType(
-        ap_idx, slvr)
\ No newline at end of file
+        array_ap_idx if from_arrays else ap_idx, slvr)
\ No newline at end of file
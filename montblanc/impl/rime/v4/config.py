@@ -66,6 +66,10 @@ P = [
     prop_dict('beam_ul', 'ft', 0.5),
     prop_dict('beam_um', 'ft', 0.5),
     prop_dict('beam_ufreq', 'ft', 1.5e9),
+
+    # Scale and clipping radius of analytic beam models
+    prop_dict('beam_width', 'ft', 65),
+    prop_dict('beam_clip', 'ft', 1.0881),
 ]
 
 def rand_uvw(slvr, ary):
@@ -216,7 +220,7 @@ A = [
         test=rand_sersic_shape),
 
     # Visibility flagging arrays
-    ary_dict('flag', ('ntime', 'nbl', 'nchan', 4), np.uint8,
+    ary_dict('flag', ('ntime', 'nbl', 'nchan', 'npol'), np.uint8,
         classifiers=frozenset([Classifier.X2_INPUT,
             Classifier.COHERENCIES_INPUT]),
         default=0,
@@ -224,12 +228,12 @@ A = [
             0, 1, size=ary.shape)),
 
     # Bayesian Data
-    ary_dict('weight_vector', ('ntime','nbl','nchan',4), 'ft',
+    ary_dict('weight_vector', ('ntime','nbl','nchan','npol'), 'ft',
         classifiers=frozenset([Classifier.X2_INPUT,
             Classifier.COHERENCIES_INPUT]),
         default=1,
         test=lambda slvr, ary: rary(ary)),
-    ary_dict('observed_vis', ('ntime','nbl','nchan',4), 'ct',
+    ary_dict('observed_vis', ('ntime','nbl','nchan','npol'), 'ct',
         classifiers=frozenset([Classifier.X2_INPUT,
             Classifier.COHERENCIES_INPUT]),
         default=0,
@@ -240,7 +244,7 @@ A = [
         classifiers=frozenset([Classifier.GPU_SCRATCH])),
     ary_dict('jones', ('nsrc','ntime','na','nchan',4), 'ct',
         classifiers=frozenset([Classifier.GPU_SCRATCH])),
-    ary_dict('model_vis', ('ntime','nbl','nchan',4), 'ct',
+    ary_dict('model_vis', ('ntime','nbl','nchan','npol'), 'ct',
         classifiers=frozenset([Classifier.SIMULATOR_OUTPUT])),
     ary_dict('chi_sqrd_result', ('ntime','nbl','nchan'), 'ft',
         classifiers=frozenset([Classifier.GPU_SCRATCH])),
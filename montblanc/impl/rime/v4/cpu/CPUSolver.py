@@ -18,6 +18,10 @@
 # You should have received a copy of the GNU General Public License
 # along with this program; if not, see <http://www.gnu.org/licenses/>.
 
+import itertools
+import multiprocessing
+
+import concurrent.futures as cf
 import numexpr as ne
 import numpy as np
 
@@ -25,6 +29,68 @@ import montblanc
 import montblanc.util as mbu
 from montblanc.solvers import MontblancNumpySolver
 from montblanc.config import RimeSolverConfig as Options
+from montblanc.impl.rime.v4.cpu.term_cache import TermCache, cached_term
+from montblanc.impl.rime.v4.cpu.beam_models import BEAM_MODELS
+from montblanc.impl.rime.v4.cpu.beam_compression import (
+    BEAM_COMPRESSIONS, corr_offsets)
+from montblanc.impl.rime.v4.cpu.clustering import SOURCE_CLUSTERINGS
+from montblanc.impl.rime.v4.cpu.averaging import (averaged_size,
+    block_angle_mean, block_first, block_interpolate, block_mean,
+    block_sum, sample_interpolate)
+
+ALL_SLICE = slice(None,None,1)
+
+# Number of channels over which channel phasors are
+# computed by recurrence before being re-anchored
+PHASOR_ANCHOR_INTERVAL = 32
+
+# Number of timestep chunks solved in turn
+# by an untiled solve with a chi-squared bound
+X2_BOUND_TIME_CHUNKS = 8
+
+# Number of bytes of model visibilities reduced at once
+# into the chi-squared sum of a solver outputting no visibilities
+X2_SUM_CHUNK_BYTES = 32*1024**2
+
+# Number of parameter sets whose visibilities are
+# held at once when computing a batch of chi-squared values
+X2_BATCH_BLOCK_SIZE = 8
+
+# Indices of the (XX, XY, YX, YY) correlations
+# held in the visibility arrays, keyed on npol
+POLARISATION_INDICES = { 1: [0], 2: [0, 3], 4: [0, 1, 2, 3] }
+
+# Indices of the correlations carried when summing coherencies,
+# keyed on polarisation mode. None denotes all four correlations.
+POLARISATION_MODE_CORRELATIONS = {
+    Options.POLARISATION_MODE_FULL: None,
+    Options.POLARISATION_MODE_DIAGONAL: [0, 3],
+    Options.POLARISATION_MODE_SCALAR: [0],
+}
+
+# Arrays holding intermediate terms and results
+RESULT_ARRAYS = frozenset(['B_sqrt', 'jones', 'model_vis', 'chi_sqrd_result'])
+
+# Arrays averaged jointly into the visibility data of a resolution level
+VISIBILITY_DATA_ARRAYS = frozenset(['observed_vis', 'weight_vector', 'flag'])
+
+# Arrays of angles, which wrap at +-pi and are averaged on the unit circle
+ANGLE_ARRAYS = frozenset(['parallactic_angles'])
+
+def _bda_factor(phase_step, size, max_phase):
+    """
+    Returns the largest power of two averaging factors for which
+    the phase change over factor samples, given the phase change
+    phase_step over a single sample, does not exceed max_phase.
+    Factors leave at least two blocks along a dimension of the
+    given size, so that blocks can be interpolated.
+    """
+    with np.errstate(divide='ignore'):
+        factor = np.floor(max_phase/np.asarray(phase_step, dtype=np.float64))
+
+    factor = np.clip(factor, 1, max(size - 1, 1))
+
+    return (2**np.floor(np.log2(factor))).astype(np.intp)
 
 class CPUSolver(MontblancNumpySolver):
     def __init__(self, slvr_cfg):
@@ -33,12 +99,16 @@ class CPUSolver(MontblancNumpySolver):
         # Monkey patch these functions onto the object
         # TODO: Remove this when deprecating v2.
         from montblanc.impl.rime.v4.ant_pairs import monkey_patch_antenna_pairs
-        monkey_patch_antenna_pairs(self)
+        monkey_patch_antenna_pairs(self, from_arrays=True)
 
         from montblanc.impl.rime.v4.config import (A, P)
 
         self.register_default_dimensions()
 
+        if self.dim_local_size(Options.NPOL) not in POLARISATION_INDICES:
+            raise ValueError("'{n}' must be one of {v}.".format(
+                n=Options.NPOL, v=sorted(POLARISATION_INDICES)))
+
         # Configure the dimensions of the beam cube
         self.register_dimension('beam_lw',
             slvr_cfg[Options.E_BEAM_WIDTH],
@@ -54,8 +124,470 @@ class CPUSolver(MontblancNumpySolver):
 
         self.register_properties(P)
         self.register_arrays(A)
-        self.create_arrays()
 
+        # Number of sources handled in each batch
+        # when accumulating visibilities
+        self._source_batch_size = slvr_cfg.get(Options.SOURCE_BATCH_SIZE)
+        self._source_streaming = slvr_cfg.get(Options.SOURCE_STREAMING)
+        # Method used to sum coherencies over sources
+        self._coherency_engine = slvr_cfg.get(Options.COHERENCY_ENGINE)
+        # Shape of the visibility tiles solved by each thread
+        self._vis_tile_shape = slvr_cfg.get(Options.VISIBILITY_TILE_SHAPE)
+        self._cpu_threads = slvr_cfg.get(Options.CPU_THREADS)
+
+        if self._cpu_threads is None:
+            self._cpu_threads = multiprocessing.cpu_count()
+
+        self._cpu_backend = slvr_cfg.get(Options.CPU_BACKEND)
+        # Correlations carried when summing coherencies
+        self._polarisation_mode = slvr_cfg.get(Options.POLARISATION_MODE,
+            Options.DEFAULT_POLARISATION_MODE)
+        # Sum coherencies only for unflagged samples
+        self._sparse_flags = slvr_cfg.get(Options.SPARSE_FLAGS)
+        # Error tolerance of baseline-dependent averaging
+        self._bda_tolerance = slvr_cfg.get(Options.BDA_TOLERANCE)
+        # Beam cube, or analytic beam model
+        self._beam_model = slvr_cfg.get(Options.BEAM_MODEL,
+            Options.DEFAULT_BEAM_MODEL)
+        # Representation of the beam cube used for interpolation
+        self._beam_compression = slvr_cfg.get(Options.BEAM_COMPRESSION,
+            Options.DEFAULT_BEAM_COMPRESSION)
+        self._beam_rank = slvr_cfg.get(Options.BEAM_RANK,
+            Options.DEFAULT_BEAM_RANK)
+        # Spacing of the timesteps on which the E term is evaluated
+        self._beam_time_factor = slvr_cfg.get(Options.BEAM_TIME_FACTOR)
+        self._beam_max_rotation = slvr_cfg.get(Options.BEAM_MAX_ROTATION)
+        # Clustering of sources sharing an E term
+        self._beam_clustering = slvr_cfg.get(Options.BEAM_CLUSTERING,
+            Options.DEFAULT_BEAM_CLUSTERING)
+        self._beam_cluster_tolerance = slvr_cfg.get(
+            Options.BEAM_CLUSTER_TOLERANCE,
+            Options.DEFAULT_BEAM_CLUSTER_TOLERANCE)
+        # Whether the E term is shared by all antennas
+        self._homogeneous_beam_mode = slvr_cfg.get(Options.HOMOGENEOUS_BEAM,
+            Options.DEFAULT_HOMOGENEOUS_BEAM)
+
+        # Cache of intermediate terms, sized in megabytes
+        term_cache_size = slvr_cfg.get(Options.TERM_CACHE_SIZE)
+        self._term_cache = (TermCache(term_cache_size*1024**2)
+            if term_cache_size else None)
+
+        # Portion of the problem of the solver owning the term cache
+        # held by this solver's arrays, distinguishing the terms
+        # of the sub-solvers sharing the cache
+        self._term_view = ()
+
+        # The fused numba kernel interpolates the full beam cube
+        # for every source, antenna and correlation, so options
+        # changing how the E term is evaluated aren't supported
+        if self._cpu_backend == Options.CPU_BACKEND_NUMBA:
+            for name, value, supported in (
+                    (Options.BEAM_COMPRESSION, self._beam_compression,
+                        [Options.BEAM_COMPRESSION_NONE]),
+                    (Options.BEAM_CLUSTERING, self._beam_clustering,
+                        [Options.BEAM_CLUSTERING_NONE]),
+                    (Options.HOMOGENEOUS_BEAM, self._homogeneous_beam_mode,
+                        [Options.HOMOGENEOUS_BEAM_AUTO,
+                            Options.HOMOGENEOUS_BEAM_NEVER]),
+                    (Options.POLARISATION_MODE, self._polarisation_mode,
+                        [Options.POLARISATION_MODE_AUTO,
+                            Options.POLARISATION_MODE_FULL])):
+                if value not in supported:
+                    raise ValueError("'{n}' '{v}' is not supported by the "
+                        "'{b}' CPU backend and must be one of {s}.".format(
+                            n=name, v=value, b=self._cpu_backend,
+                            s=supported))
+
+        # Fail early if numba is not available
+        if self._cpu_backend == Options.CPU_BACKEND_NUMBA:
+            import montblanc.impl.rime.v4.cpu.numba_rime
+
+        # Likewise for scipy, needed by the airy beam
+        if self._beam_model == Options.BEAM_MODEL_AIRY:
+            import scipy.special
+
+        # Look for ignored and supplied arrays in the solver configuration
+        array_cfg = slvr_cfg.get('array_cfg', {})
+        ignore = array_cfg.get('ignore', None)
+        supplied = array_cfg.get('supplied', None)
+
+        ignore = set() if ignore is None else set(ignore)
+
+        # Per-source intermediate arrays aren't stored when
+        # streaming over the sources, solving visibility tiles,
+        # using the fused numba kernel, or when per antenna
+        # terms are computed on a subset of the samples
+        if (self._source_streaming or self._vis_tile_shape is not None
+                or self._cpu_backend == Options.CPU_BACKEND_NUMBA
+                or self._bda_tolerance is not None or self._sparse_flags):
+            ignore.update(['B_sqrt', 'jones'])
+
+        # Only the chi-squared value is produced, so
+        # result arrays and the jones terms aren't stored
+        if not self.outputs_visibilities():
+            ignore.update(['jones', 'model_vis', 'chi_sqrd_result'])
+
+        # Analytic beams don't need the beam cube
+        if self._beam_model != Options.BEAM_MODEL_CUBE:
+            ignore.add('E_beam')
+
+        self._ignored_arrays = ignore
+
+        # Visibilities summed over all sources, retained
+        # for incremental updates by update_sources
+        self._ekb_vis = None
+        self._ekb_vis_versions = None
+
+        # Indices of unflagged samples, along with the
+        # array versions from which they were computed
+        self._unflagged_samples = None
+        self._unflagged_samples_versions = None
+
+        # Amplitudes of the beam cube
+        self._E_beam_amplitudes = mbu.DerivedTerm()
+
+        # Compressed beam cube
+        self._compressed_E_beam = mbu.DerivedTerm()
+
+        # Source clusters
+        self._beam_clusters = mbu.DerivedTerm()
+
+        # Whether every antenna sees the same E term
+        self._homogeneous_beam = mbu.DerivedTerm()
+
+        # Polarisation mode detected in the auto polarisation mode
+        self._detected_polarisation_mode = mbu.DerivedTerm()
+
+        # Solvers over time and channel averaged data, keyed on
+        # the averaging factors, along with the array versions
+        # from which their arrays were averaged
+        self._resolution_levels = {}
+
+        # Create arrays on the solver, ignoring
+        # and using supplied arrays as necessary
+        self.create_arrays(list(ignore), supplied)
+
+    def _source_slice(self, src, src_end):
+        """
+        Returns a dictionary of slices keyed on the following
+        dimensions, for the source range [src, src_end):
+            nsrc, npsrc, ngsrc, nssrc, ...
+        """
+
+        # Get a list of source number variables/dimensions
+        src_nr_vars = mbu.source_nr_vars()
+        src_nr_var_counts = { nr_var: self.dim_local_size(nr_var)
+            for nr_var in src_nr_vars }
+
+        # Get the source slice ranges for each individual
+        # source type, as well as the total source range
+        cpu_slice = mbu.source_range_slices(
+            src, src_end, src_nr_var_counts)
+        cpu_slice[Options.NSRC] = slice(src, src_end, 1)
+
+        return cpu_slice
+
+    def _gen_source_slices(self, src_batch_size):
+        """
+        Iterate over the source space in batches of src_batch_size,
+        returning a dictionary of slices keyed on the following dimensions:
+            nsrc, npsrc, ngsrc, nssrc, ...
+        """
+        nsrc = self.dim_local_size('nsrc')
+
+        for src in xrange(0, nsrc, src_batch_size):
+            yield self._source_slice(src, min(src + src_batch_size, nsrc))
+
+    def _gen_vis_slices(self, tile_shape):
+        """
+        Iterate over the visibility space in tiles, returning a
+        dictionary of slices keyed on the following dimensions:
+            ntime, nbl, nchan
+
+        tile_shape is a dictionary containing the tile size of
+        each of these dimensions. Missing dimensions are not tiled.
+        """
+        ntime, nbl, nchan = self.dim_local_size('ntime', 'nbl', 'nchan')
+
+        time_diff = tile_shape.get(Options.NTIME, ntime)
+        bl_diff = tile_shape.get(Options.NBL, nbl)
+        chan_diff = tile_shape.get(Options.NCHAN, nchan)
+
+        cpu_slice = {}
+
+        # Set up time slicing
+        for t in xrange(0, ntime, time_diff):
+            t_end = min(t + time_diff, ntime)
+            cpu_slice[Options.NTIME] = slice(t, t_end, 1)
+
+            # Set up baseline slicing
+            for bl in xrange(0, nbl, bl_diff):
+                bl_end = min(bl + bl_diff, nbl)
+                cpu_slice[Options.NBL] = slice(bl, bl_end, 1)
+
+                # Set up channel slicing
+                for ch in xrange(0, nchan, chan_diff):
+                    ch_end = min(ch + chan_diff, nchan)
+                    cpu_slice[Options.NCHAN] = slice(ch, ch_end, 1)
+
+                    yield cpu_slice.copy()
+
+    def _array_views(self, cpu_slice):
+        """
+        Returns a dictionary of views over this solver's arrays,
+        keyed on array name. Each array is indexed with the
+        dimension slices in cpu_slice, or in its entirety
+        along dimensions not present in cpu_slice.
+        """
+        views = {}
+
+        for name, ary in self.arrays().iteritems():
+            if name in self._ignored_arrays:
+                continue
+
+            idx = tuple(cpu_slice.get(d, ALL_SLICE)
+                if isinstance(d, str) else ALL_SLICE
+                for d in ary['shape'])
+
+            views[name] = getattr(self, name)[idx]
+
+        return views
+
+    def _sub_solver(self, cpu_slice, ignore=None, supplied=None, view=None):
+        """
+        Returns a CPUSolver over the portion of this solver's
+        problem described by cpu_slice, a dictionary of dimension
+        slices such as those produced by _gen_source_slices.
+
+        The arrays of the sub-solver are views of the arrays
+        on this solver, so no data is copied. Arrays listed
+        in ignore are not created on the sub-solver. Arrays
+        in the supplied dictionary are used in place of views.
+        If the supplied arrays are derived from the arrays of
+        the same names on this solver, view is a hashable
+        identifying the derivation (see _share_term_cache).
+        """
+        from montblanc.src_types import SOURCE_VAR_TYPES
+
+        def _size(dim):
+            s = cpu_slice.get(dim, None)
+            return self.dim_local_size(dim) if s is None else s.stop - s.start
+
+        sub_cfg = self._slvr_cfg.copy()
+        sub_cfg[Options.NTIME] = _size(Options.NTIME)
+        sub_cfg[Options.NA] = _size(Options.NA)
+        sub_cfg[Options.NBL] = _size(Options.NBL)
+        sub_cfg[Options.NCHAN] = _size(Options.NCHAN)
+        sub_cfg[Options.SOURCES] = montblanc.sources(**{ src_type: _size(nr_var)
+            for src_type, nr_var in SOURCE_VAR_TYPES.iteritems() })
+        sub_cfg[Options.DATA_SOURCE] = Options.DATA_SOURCE_EMPTY
+        sub_cfg[Options.VISIBILITY_TILE_SHAPE] = None
+        sub_cfg[Options.TERM_CACHE_SIZE] = 0
+
+        supplied = {} if supplied is None else supplied
+        supplied_names = frozenset(supplied)
+
+        ignore = set() if ignore is None else set(ignore)
+        ignore.update(self._ignored_arrays)
+        views = self._array_views(cpu_slice)
+        views.update(supplied)
+        supplied = { n: a for n, a in views.iteritems() if n not in ignore }
+
+        sub_cfg['array_cfg'] = { 'ignore': list(ignore), 'supplied': supplied }
+
+        subslvr = CPUSolver(sub_cfg)
+        self._share_term_cache(subslvr, cpu_slice, view, supplied_names)
+        self._share_derived_terms(subslvr, cpu_slice, supplied_names)
+
+        # Transfer properties over
+        for p in self.properties().itervalues():
+            setattr(subslvr, p.name, getattr(self, p.name))
+
+        return subslvr
+
+    def _share_term_cache(self, subslvr, cpu_slice, view=None,
+            supplied=frozenset()):
+        """
+        Shares this solver's term cache with subslvr, a sub-solver
+        over the portion of this solver's problem described by
+        cpu_slice. The sub-solver takes this solver's array versions,
+        so that terms cached by sub-solvers are invalidated by
+        marking this solver's arrays dirty, and a term view
+        distinguishing its terms from those of other sub-solvers.
+
+        The names of arrays supplied to the sub-solver in place of
+        views are listed in supplied. These arrays must be derived
+        from the arrays of the same names on this solver in the
+        manner identified by view, otherwise the cache isn't shared.
+        """
+        if self._term_cache is None or (supplied and view is None):
+            return
+
+        subslvr._term_cache = self._term_cache
+        subslvr._term_view = self._term_view + ((view,
+            tuple(sorted((dim, s.start, s.stop)
+                for dim, s in cpu_slice.iteritems()))),)
+
+        for name in subslvr._array_versions:
+            subslvr._array_versions[name] = self._array_versions[name]
+
+    def _share_derived_terms(self, subslvr, cpu_slice, supplied=frozenset()):
+        """
+        Shares the terms derived from this solver's arrays with
+        subslvr, a sub-solver over the portion of this solver's problem
+        described by cpu_slice, so that they aren't derived again by
+        each sub-solver. Terms depending on the names of arrays in
+        supplied, which the sub-solver doesn't share, aren't shared.
+        """
+        if 'E_beam' not in supplied and 'E_beam' not in subslvr._ignored_arrays:
+            if self._beam_compression != Options.BEAM_COMPRESSION_NONE:
+                subslvr._compressed_E_beam.pin(self.compressed_E_beam())
+            else:
+                subslvr._E_beam_amplitudes.pin(self.E_beam_amplitudes())
+
+        # Homogeneity across all antennas implies
+        # homogeneity across a subset of antennas
+        if (subslvr._homogeneous_beam_mode == Options.HOMOGENEOUS_BEAM_AUTO
+                and supplied.isdisjoint(['parallactic_angles',
+                    'point_errors', 'antenna_scaling'])):
+            subslvr._homogeneous_beam_mode = (
+                Options.HOMOGENEOUS_BEAM_ALWAYS if self.homogeneous_beam()
+                else Options.HOMOGENEOUS_BEAM_NEVER)
+
+        if (self._beam_clustering != Options.BEAM_CLUSTERING_NONE
+                and 'lm' not in supplied):
+            centres, labels = self.beam_clusters()
+            src = cpu_slice.get(Options.NSRC, ALL_SLICE)
+            subslvr._beam_clusters.pin((centres, labels[src]))
+
+        # Likewise, the correlations needed by all sources
+        # suffice for a subset of sources
+        if (subslvr._polarisation_mode == Options.POLARISATION_MODE_AUTO
+                and 'stokes' not in self._ignored_arrays
+                and supplied.isdisjoint(['stokes', 'E_beam'])):
+            subslvr._polarisation_mode = self.polarisation_mode()
+
+    def _derive_terms(self):
+        """
+        Derives the terms shared with sub-solvers by
+        _share_derived_terms, so that they are derived once,
+        before sub-solvers are created on a pool of threads.
+        """
+        if 'E_beam' not in self._ignored_arrays:
+            if self._beam_compression != Options.BEAM_COMPRESSION_NONE:
+                self.compressed_E_beam()
+            else:
+                self.E_beam_amplitudes()
+
+        self.homogeneous_beam()
+
+        if self._beam_clustering != Options.BEAM_CLUSTERING_NONE:
+            self.beam_clusters()
+
+        if 'stokes' not in self._ignored_arrays:
+            self.polarisation_mode()
+
+    def term_cache(self):
+        """ Returns the cache of intermediate terms, or None """
+        return self._term_cache
+
+    def term_view(self):
+        """
+        Returns the view under which this solver's
+        terms are held in the term cache
+        """
+        return self._term_view
+
+    def _channel_bands(self):
+        """
+        Partitions the channels into bands of evenly spaced
+        frequencies, returning a list of (start, end, spacing)
+        tuples. Channels are considered evenly spaced if successive
+        frequency differences agree to within a few ulps.
+        """
+        freq = self.frequency.astype(np.float64)
+        nchan = freq.size
+        diff = np.diff(freq)
+        tol = 4*np.finfo(self.frequency.dtype).eps*np.abs(freq).max()
+
+        bands = []
+        start = 0
+
+        while start < nchan:
+            end = min(start + 2, nchan)
+
+            while end < nchan and abs(diff[end-1] - diff[start]) <= tol:
+                end += 1
+
+            # Derive the spacing from the band's end points
+            spacing = (0.0 if end - start == 1 else
+                (freq[end-1] - freq[start]) / (end - start - 1))
+
+            bands.append((start, end, spacing))
+            start = end
+
+        return bands
+
+    def _exp_channel_quadratic(self, a=None, b=None):
+        """
+        Evaluates exp(a*f + b*f**2) for each channel frequency f,
+        where a and b are arrays of the same shape, either of
+        which may be None.
+
+        Within each band of evenly spaced channels, only the first
+        term and the ratio between successive terms of each block
+        of PHASOR_ANCHOR_INTERVAL channels are computed with exp.
+        The remaining terms are obtained by the recurrence
+            g[k+1] = g[k]*r[k], r[k+1] = r[k]*c
+        where c = exp(2*b*df**2). Re-anchoring each block
+        bounds the accumulation of rounding errors.
+
+        Returns an array of shape a.shape + (nchan,)
+        """
+        nchan = self.dim_local_size('nchan')
+        coeffs = [c for c in (a, b) if c is not None]
+        result = np.empty(shape=coeffs[0].shape + (nchan,),
+            dtype=np.result_type(self.ft, *coeffs))
+
+        # Exponents of the first term and first ratio of a block
+        first = ' + '.join(([] if a is None else ['a*f0']) +
+            ([] if b is None else ['b*f0**2']))
+        ratio = ' + '.join(([] if a is None else ['a*df']) +
+            ([] if b is None else ['b*(2*f0*df + df**2)']))
+
+        for start, end, spacing in self._channel_bands():
+            for blk in xrange(start, end, PHASOR_ANCHOR_INTERVAL):
+                blk_end = min(blk + PHASOR_ANCHOR_INTERVAL, end)
+                variables = { 'a': a, 'b': b,
+                    'f0': self.frequency[blk], 'df': spacing }
+
+                g = result[..., blk:blk_end]
+                g[..., 0] = ne.evaluate('exp({e})'.format(e=first),
+                    variables)
+
+                if blk_end - blk == 1:
+                    continue
+
+                r = np.empty_like(g[..., 1:])
+                r[...] = ne.evaluate('exp({e})'.format(e=ratio),
+                    variables)[..., np.newaxis]
+
+                # Ratios change by a constant factor for quadratics
+                if b is not None and blk_end - blk > 2:
+                    r[..., 1:] = ne.evaluate('exp(2*b*df**2)',
+                        variables)[..., np.newaxis]
+
+                np.cumprod(r, axis=-1, out=r)
+
+                if b is not None:
+                    np.cumprod(r, axis=-1, out=r)
+
+                g[..., 1:] = g[..., 0, np.newaxis]*r
+
+        return result
+
+    @cached_term(['uvw', 'antenna1', 'antenna2', 'gauss_shape', 'frequency'],
+        ['gauss_scale'])
     def compute_gaussian_shape(self):
         """
         Compute the shape values for the gaussian sources.
@@ -92,16 +624,18 @@ class CPUSolver(MontblancNumpySolver):
             'u_el' : np.outer(el, u), 'v_em' : np.outer(em, v)})\
             .reshape(ngsrc, ntime,nbl)
 
-        scale_uv = (self.gauss_scale*self.frequency)\
-            [np.newaxis,np.newaxis,np.newaxis,:]
-
-        return ne.evaluate('exp(-((u1*scale_uv*R)**2 + (v1*scale_uv)**2))',
+        # exp(-((u1*scale_uv*R)**2 + (v1*scale_uv)**2)),
+        # where scale_uv = gauss_scale*frequency
+        return self._exp_channel_quadratic(b=ne.evaluate(
+            '-(gauss_scale**2)*((u1*R)**2 + v1**2)',
             local_dict={
-                'u1':u1[:,:,:,np.newaxis],
-                'v1':v1[:,:,:,np.newaxis],
-                'scale_uv': scale_uv,
-                'R':R[:,np.newaxis,np.newaxis,np.newaxis]})
+                'u1': u1,
+                'v1': v1,
+                'gauss_scale': self.gauss_scale,
+                'R': R[:,np.newaxis,np.newaxis]}).astype(self.ft))
 
+    @cached_term(['uvw', 'antenna1', 'antenna2', 'sersic_shape', 'frequency'],
+        ['two_pi_over_c'])
     def compute_sersic_shape(self):
         """
         Compute the shape values for the sersic (exponential) sources.
@@ -159,6 +693,7 @@ class CPUSolver(MontblancNumpySolver):
         return ne.evaluate('1/(den*sqrt(den))',
             { 'den' : den[:, :, :, :] })
 
+    @cached_term(['uvw', 'lm', 'frequency'])
     def compute_k_jones_scalar_per_ant(self):
         """
         Computes the scalar K (phase) term of the RIME per antenna.
@@ -168,8 +703,6 @@ class CPUSolver(MontblancNumpySolver):
         
         nsrc, ntime, na, nchan = self.dim_local_size('nsrc', 'ntime', 'na', 'nchan')
 
-        freq = self.frequency
-
         u, v, w = self.uvw[:,:,0], self.uvw[:,:,1], self.uvw[:,:,2]
         l, m = self.lm[:,0], self.lm[:,1]
 
@@ -183,12 +716,12 @@ class CPUSolver(MontblancNumpySolver):
 
         # e^(2*pi*sqrt(u*l+v*m+w*n)*frequency/C).
         # Dim. ntime x na x nchan x nsrcs
-        cplx_phase = ne.evaluate('exp(-2*pi*1j*p*f/C)', {
-            'p': phase[:, :, :, np.newaxis],
-            'f': freq[np.newaxis, np.newaxis, np.newaxis, :],
-            'C': montblanc.constants.C,
-            'pi': np.pi
-        })
+        cplx_phase = self._exp_channel_quadratic(a=ne.evaluate(
+            '-2*pi*1j*p/C', {
+                'p': phase,
+                'C': montblanc.constants.C,
+                'pi': np.pi
+            }).astype(self.ct))
 
         assert cplx_phase.shape == (nsrc, ntime, na, nchan)
 
@@ -232,6 +765,7 @@ class CPUSolver(MontblancNumpySolver):
 
         return result
 
+    @cached_term(['stokes', 'alpha', 'frequency', 'ref_frequency'])
     def compute_b_jones(self):
         """
         Computes the brightness matrix from the stokes parameters.
@@ -264,6 +798,7 @@ class CPUSolver(MontblancNumpySolver):
         except AttributeError as e:
             mbu.rethrow_attribute_exception(e)
 
+    @cached_term(['stokes', 'alpha', 'frequency', 'ref_frequency'])
     def compute_b_sqrt_jones(self, b_jones=None):
         """
         Computes the square root of the brightness matrix.
@@ -278,7 +813,8 @@ class CPUSolver(MontblancNumpySolver):
             # Note that this code handles a special case of the above
             # where we assume that both the trace and determinant
             # are real and positive.
-            B = self.compute_b_jones() if b_jones is None else b_jones.copy()
+            B = (self.compute_b_jones() if b_jones is None
+                else b_jones).copy()
 
             # trace = I+Q + I-Q = 2*I
             # det = (I+Q)*(I-Q) - (U+iV)*(U-iV) = I**2-Q**2-U**2-V**2
@@ -316,53 +852,137 @@ class CPUSolver(MontblancNumpySolver):
         except AttributeError as e:
             mbu.rethrow_attribute_exception(e)
 
-    def trilinear_interpolate(self, sum, abs_sum,
-            gl, gm, gchan, weight):
+    def E_beam_amplitudes(self):
         """
-        Given a grid position in the beam cube (gl, gm, gchan),
-        and positive unit offsets from this position (ld, lm, chd),
-        round the grid position to integer positions and add the offset.
-        Then, load in the complex number at the computed grid position,
-        weight it with the distance from the original grid position,
-        and add it to the sum and abs_sum arguments.
+        Returns the amplitudes of the beam cube. These are
+        computed once for each version of the beam cube,
+        rather than for each interpolated sample.
         """
-        nsrc, ntime, na, nchan, beam_lw, beam_mh, beam_nud = (
-            self.dim_local_size('nsrc', 'ntime', 'na', 'nchan',
-                'beam_lw', 'beam_mh', 'beam_nud'))
+        return self._E_beam_amplitudes.get(
+            (self.array_version('E_beam'),),
+            lambda: np.abs(self.E_beam))
+
+    def compressed_E_beam(self):
+        """
+        Returns the beam cube in the configured compressed
+        representation (see beam_compression). The cube is
+        compressed once for each version of the beam cube.
+        """
+        return self._compressed_E_beam.get(
+            (self.array_version('E_beam'),),
+            lambda: BEAM_COMPRESSIONS[self._beam_compression](
+                self.E_beam, np.abs(self.E_beam), self._beam_rank))
+
+    def beam_corners(self, vl, vm, vchan):
+        """
+        Given grid positions in the beam cube (vl, vm, vchan),
+        clipped to the extents of the cube, computes the offsets
+        of the eight surrounding grid points within the flattened
+        (beam_lw*beam_mh*beam_nud, 4) cube, along with the unit
+        offsets (ld, md, chd) of the positions from the lowest
+        grid point. vchan varies over the last dimension of
+        vl and vm.
+
+        Returns a tuple (offsets, ld, md, chd) where offsets
+        is a (8,) + vl.shape array ordered with the l corner
+        varying slowest and the channel corner fastest.
+        """
+        beam_lw, beam_mh, beam_nud = self.dim_local_size(
+            'beam_lw', 'beam_mh', 'beam_nud')
+
+        gl0 = np.floor(vl)
+        gm0 = np.floor(vm)
+        gchan0 = np.floor(vchan)
+        ld, md, chd = vl - gl0, vm - gm0, vchan - gchan0
 
-        gl = np.clip(gl, 0.0, beam_lw-1)
-        gm = np.clip(gm, 0.0, beam_mh-1)
-        gchan = np.clip(gchan, 0.0, beam_nud-1)
+        # Strides of the l and m dimensions in the flattened cube,
+        # and the steps to the upper grid points, which
+        # are zero on the upper edges of the cube
+        l_stride, m_stride = beam_mh*beam_nud, beam_nud
+        l_step = np.where(gl0 < beam_lw-1, l_stride, 0)
+        m_step = np.where(gm0 < beam_mh-1, m_stride, 0)
+        chan_step = np.where(gchan0 < beam_nud-1, 1, 0)
 
-        # Indices within the cube
-        l_idx = gl.astype(np.int32)
-        m_idx = gm.astype(np.int32)
-        ch_idx = gchan.astype(np.int32)[np.newaxis,np.newaxis,np.newaxis,:]
+        base = (gl0.astype(np.intp)*l_stride + gm0.astype(np.intp)*m_stride
+            + gchan0.astype(np.intp))
 
-        beam_pols = self.E_beam[l_idx,m_idx,ch_idx]
-        assert beam_pols.shape == (nsrc, ntime, na, nchan, 4)
+        offsets = np.empty(shape=(8,) + base.shape, dtype=np.intp)
 
-        sum += weight[:,:,:,:,np.newaxis]*beam_pols
-        abs_sum += weight[:,:,:,:,np.newaxis]*np.abs(beam_pols)
+        for i, (dl, dm, dchan) in enumerate(itertools.product(
+                (0, l_step), (0, m_step), (0, chan_step))):
+            np.add(base, dl + dm + dchan, out=offsets[i])
 
-    def compute_E_beam(self):
+        return offsets, ld, md, chd
+
+    def gather_beam_corners(self, offsets, corrs=None):
         """
-        Rotates sources through a beam cube. At each timestep,
-        the source position is computed within the grid defining
-        the cube, taking into account pointing errors and
-        scaling parameters for each antenna.
+        Loads the complex values and amplitudes of the beam cube at
+        the flat corner offsets produced by beam_corners, with a
+        single gather from each of the flattened cubes, or from
+        the compressed beam cube if one is configured. If corrs
+        is supplied, only the correlations with these
+        indices are loaded.
+
+        Returns a tuple of (8,) + offsets.shape[1:] + (4,) complex
+        values and amplitudes, or (8,) + offsets.shape[1:] +
+        (len(corrs),) if corrs is supplied.
+        """
+        if self._beam_compression != Options.BEAM_COMPRESSION_NONE:
+            return self.compressed_E_beam().gather(offsets, corrs)
 
-        The complex numbers at the eight grid points surrounding
-        the source are bilinearly interpolated together to
-        produce a single complex number, the
-        Direction-Dependent Effect for the source at a particular
-        time, antenna and frequency.
+        E_beam, E_beam_abs = self.E_beam, self.E_beam_amplitudes()
 
-        Returns a (nsrc,ntime,na,nchan,4) matrix of complex scalars.
+        npol = E_beam.shape[3]
+        E_flat = np.ascontiguousarray(E_beam).reshape(-1, npol)
+        E_abs_flat = np.ascontiguousarray(E_beam_abs).reshape(-1, npol)
+
+        # Index the correlations within the cubes,
+        # rather than copying them out of the cubes
+        if corrs is not None:
+            offsets = corr_offsets(offsets, npol, corrs)
+            E_flat, E_abs_flat = E_flat.ravel(), E_abs_flat.ravel()
+
+        return (np.take(E_flat, offsets, axis=0),
+            np.take(E_abs_flat, offsets, axis=0))
+
+    @staticmethod
+    def corner_weights(ld, md, chd, dl=None, dm=None):
         """
-        nsrc, ntime, na, nchan, beam_lw, beam_mh, beam_nud = (
-            self.dim_local_size('nsrc', 'ntime', 'na', 'nchan',
-                'beam_lw', 'beam_mh', 'beam_nud'))
+        Returns the trilinear weights of the eight corners
+        produced by beam_corners, as a generator over corners.
+        If dl or dm is True, the weights are differentiated
+        with respect to the l or m grid position.
+        """
+        wl = (-1, 1) if dl else (1-ld, ld)
+        wm = (-1, 1) if dm else (1-md, md)
+
+        for a, b, c in itertools.product(wl, wm, (1-chd, chd)):
+            yield a*b*c
+
+    @staticmethod
+    def interpolate_corners(corners, weights):
+        """
+        Sums the corner values, weighted by weights.
+        """
+        result = np.zeros(shape=corners.shape[1:], dtype=corners.dtype)
+
+        for corner, weight in itertools.izip(corners, weights):
+            result += weight[...,np.newaxis]*corner
+
+        return result
+
+    def compute_beam_lm(self):
+        """
+        Computes the l and m coordinates of each source relative
+        to the beam of each antenna. At each timestep, sources are
+        rotated by the parallactic angle, offset by the pointing
+        errors and scaled by the antenna scaling parameters.
+
+        Returns a tuple of two (nsrc,ntime,na,nchan) matrices
+        of floating point scalars.
+        """
+        nsrc, ntime, na, nchan = self.dim_local_size(
+            'nsrc', 'ntime', 'na', 'nchan')
 
         sint = np.sin(self.parallactic_angles)
         cost = np.cos(self.parallactic_angles)
@@ -389,33 +1009,324 @@ class CPUSolver(MontblancNumpySolver):
         l *= a[np.newaxis, np.newaxis, :, :]
         m *= b[np.newaxis, np.newaxis, :, :]
 
-        # Compute grid position and difference from
-        # actual position for the source at each channel
+        return l, m
+
+    def compute_E_beam(self, corrs=None):
+        """
+        Computes the Direction-Dependent Effect of each source at
+        a particular time, antenna and frequency, either from the
+        beam cube or from the configured analytic beam model.
+
+        If corrs is supplied, only the correlations with
+        these indices are computed.
+
+        If the E term is homogeneous across antennas, it is
+        evaluated for the first antenna and broadcast across
+        antennas, producing a read-only view. If sources are
+        clustered, it is evaluated at the cluster centres.
+
+        Returns a (nsrc,ntime,na,nchan,4) matrix of complex scalars,
+        or a (nsrc,ntime,na,nchan,len(corrs)) matrix if corrs is supplied.
+        """
+        if self.homogeneous_beam():
+            return self._broadcast_antennas(
+                self.compute_E_beam_homogeneous(corrs=corrs))
+        elif self._beam_clustering != Options.BEAM_CLUSTERING_NONE:
+            return self.compute_E_beam_clustered(corrs)
+        elif self.beam_time_samples() is not None:
+            return self.compute_E_beam_decimated(corrs)
+        elif self._beam_model == Options.BEAM_MODEL_CUBE:
+            return self.compute_E_beam_cube(corrs=corrs)
+
+        return self.compute_E_beam_analytic(corrs=corrs)
+
+    def homogeneous_beam(self):
+        """
+        Returns True if every antenna sees the same E term, as
+        configured, or detected from parallactic angles, pointing
+        errors and antenna scaling that match across antennas.
+        Detection is repeated if any of these arrays
+        have since been marked dirty.
+        """
+        mode = self._homogeneous_beam_mode
+
+        if mode == Options.HOMOGENEOUS_BEAM_ALWAYS:
+            return True
+        elif mode == Options.HOMOGENEOUS_BEAM_NEVER:
+            return False
+
+        names = ['parallactic_angles', 'point_errors', 'antenna_scaling']
+
+        def _detect():
+            arrays = [self.parallactic_angles, self.point_errors,
+                self.antenna_scaling.swapaxes(0, 1)]
+
+            return all(np.all(a == a[:,:1]) for a in arrays)
+
+        return self._homogeneous_beam.get(
+            tuple(self.array_version(n) for n in names), _detect)
+
+    def _broadcast_antennas(self, ary):
+        """
+        Broadcasts ary, of shape (nsrc,ntime,1,...),
+        across the antenna dimension, without copying.
+        """
+        na = self.dim_local_size('na')
+        return np.broadcast_to(ary, ary.shape[:2] + (na,) + ary.shape[3:])
+
+    def _antenna_sub_solver(self):
+        """
+        Returns a CPUSolver over the first antenna, holding
+        the arrays needed to compute the E term. The E term
+        is evaluated for the single antenna of the sub-solver.
+        """
+        ignore = RESULT_ARRAYS | VISIBILITY_DATA_ARRAYS | set(['G_term'])
+
+        subslvr = self._sub_solver({ Options.NA: slice(0, 1, 1) },
+            ignore=ignore)
+        subslvr._homogeneous_beam_mode = Options.HOMOGENEOUS_BEAM_NEVER
+
+        return subslvr
+
+    def compute_E_beam_homogeneous(self, corrs=None):
+        """
+        Computes the E term of the first antenna, which
+        is shared by every antenna of a homogeneous beam.
+
+        Returns a (nsrc,ntime,1,nchan,4) matrix of complex scalars,
+        or a (nsrc,ntime,1,nchan,len(corrs)) matrix if corrs is supplied.
+        """
+        if self._beam_model == Options.BEAM_MODEL_CUBE:
+            return self._compute_E_beam_cube_homogeneous(corrs=corrs)
+
+        return self._compute_E_beam_analytic_homogeneous(corrs=corrs)
+
+    @cached_term(['lm', 'parallactic_angles', 'point_errors',
+            'antenna_scaling', 'frequency'],
+        ['beam_width', 'beam_clip'])
+    def _compute_E_beam_analytic_homogeneous(self, corrs=None):
+        return self._antenna_sub_solver().compute_E_beam(corrs)
+
+    @cached_term(['lm', 'parallactic_angles', 'point_errors',
+            'antenna_scaling', 'E_beam', 'frequency'],
+        ['beam_ll', 'beam_lm', 'beam_lfreq',
+            'beam_ul', 'beam_um', 'beam_ufreq'])
+    def _compute_E_beam_cube_homogeneous(self, corrs=None):
+        return self._antenna_sub_solver().compute_E_beam(corrs)
+
+    def beam_clusters(self):
+        """
+        Returns a tuple (centres, labels) of the (nclusters, 2)
+        lm coordinates of the centres of the source clusters, and
+        the (nsrc,) cluster index of each source, produced by
+        the configured clustering method (see clustering).
+        Sources are clustered again only if the lm
+        array has since been marked dirty.
+        """
+        return self._beam_clusters.get((self.array_version('lm'),),
+            lambda: SOURCE_CLUSTERINGS[self._beam_clustering](
+                self.lm, self._beam_cluster_tolerance))
+
+    def _cluster_sub_solver(self, centres):
+        """
+        Returns a CPUSolver with a point source at each of
+        the cluster centres, holding the arrays needed to compute
+        the E term. The E term is evaluated for each centre.
+        """
+        from montblanc.src_types import POINT_NR_VAR
+
+        nclusters = len(centres)
+        cpu_slice = { nr_var: slice(0, 0, 1)
+            for nr_var in mbu.source_nr_vars() }
+        cpu_slice[POINT_NR_VAR] = slice(0, nclusters, 1)
+        cpu_slice[Options.NSRC] = slice(0, nclusters, 1)
+
+        ignore = (RESULT_ARRAYS | VISIBILITY_DATA_ARRAYS |
+            set(['G_term', 'stokes', 'alpha', 'gauss_shape', 'sersic_shape']))
+        supplied = { 'lm': centres.astype(self.lm.dtype) }
+
+        subslvr = self._sub_solver(cpu_slice, ignore=ignore,
+            supplied=supplied)
+        subslvr._beam_clustering = Options.BEAM_CLUSTERING_NONE
+
+        return subslvr
+
+    def compute_E_beam_clustered(self, corrs=None):
+        """
+        Computes the E term at the centre of each source
+        cluster produced by beam_clusters, and applies
+        it to every source in the cluster.
+
+        Returns a (nsrc,ntime,na,nchan,4) matrix of complex scalars,
+        or a (nsrc,ntime,na,nchan,len(corrs)) matrix if corrs is supplied.
+        """
+        centres, labels = self.beam_clusters()
+        E = self._cluster_sub_solver(centres).compute_E_beam(corrs)
+
+        return np.take(E, labels, axis=0)
+
+    def beam_time_factor(self):
+        """
+        Returns the spacing of the timesteps on which the E term is
+        evaluated, the smaller of the configured factor, and the
+        spacing over which parallactic angles rotate by at most
+        the configured maximum rotation. 1 if neither is configured.
+        """
+        ntime = self.dim_local_size('ntime')
+        factors = []
+
+        if self._beam_time_factor is not None:
+            factors.append(self._beam_time_factor)
+
+        if self._beam_max_rotation is not None and ntime > 1:
+            # Rotation between successive timesteps,
+            # accounting for wrapping of the angles
+            step = np.abs(np.angle(np.exp(1j*np.diff(
+                self.parallactic_angles.astype(np.float64), axis=0)))).max()
+
+            with np.errstate(divide='ignore'):
+                factors.append(np.floor(self._beam_max_rotation/step))
+
+        factor = min(factors) if len(factors) > 0 else 1
+
+        return int(np.clip(factor, 1, max(ntime - 1, 1)))
+
+    def beam_time_samples(self):
+        """
+        Returns the indices of the timesteps on which the E term
+        is evaluated, every beam_time_factor() timesteps along
+        with the last timestep, or None if the E term is
+        evaluated on every timestep.
+        """
+        ntime = self.dim_local_size('ntime')
+        factor = self.beam_time_factor()
+
+        if factor == 1:
+            return None
+
+        return np.union1d(np.arange(0, ntime, factor), [ntime - 1])
+
+    def _beam_time_sub_solver(self, samples):
+        """
+        Returns a CPUSolver over the timesteps with indices samples,
+        holding the arrays needed to compute the E term. The E term
+        is evaluated on every timestep of the sub-solver.
+        """
+        ignore = RESULT_ARRAYS | VISIBILITY_DATA_ARRAYS | set(['G_term'])
+        supplied = { name: np.take(getattr(self, name), samples, axis=0)
+            for name in ('parallactic_angles', 'point_errors') }
+
+        subslvr = self._sub_solver({
+            Options.NTIME: slice(0, len(samples), 1) },
+            ignore=ignore, supplied=supplied,
+            view=('beam_time_samples', tuple(samples)))
+        subslvr._beam_time_factor = subslvr._beam_max_rotation = None
+
+        return subslvr
+
+    def compute_E_beam_decimated(self, corrs=None):
+        """
+        Computes the E term on the timesteps produced by
+        beam_time_samples, linearly interpolating it
+        onto the remaining timesteps.
+
+        Returns a (nsrc,ntime,na,nchan,4) matrix of complex scalars,
+        or a (nsrc,ntime,na,nchan,len(corrs)) matrix if corrs is supplied.
+        """
+        ntime = self.dim_local_size('ntime')
+        samples = self.beam_time_samples()
+        E = self._beam_time_sub_solver(samples).compute_E_beam(corrs)
+
+        return sample_interpolate(E, 1, samples, ntime)
+
+    def _analytic_beam(self, l, m):
+        """
+        Evaluates the analytic beam model at the l and m
+        coordinates produced by compute_beam_lm.
+
+        Returns a tuple (beam, d_beam_dl, d_beam_dm) of
+        (nsrc,ntime,na,nchan) matrices of floating point scalars.
+        """
+        r = np.sqrt(l**2 + m**2)
+        scale = (self.beam_width*1e-9*self.frequency)[
+            np.newaxis,np.newaxis,np.newaxis,:]
+
+        beam, d_beam = BEAM_MODELS[self._beam_model](scale*r,
+            self.beam_clip)
+
+        # d(rho)/dl = scale*l/r, which is zero at the pointing centre
+        d_beam_dr = scale*d_beam/np.where(r > 0, r, 1)
+
+        return beam, d_beam_dr*l, d_beam_dr*m
+
+    def _diagonal_beam(self, beam, corrs=None):
+        """
+        Places the scalar beam on the diagonal of a
+        (...,4) matrix, selecting corrs if supplied.
+        """
+        E = np.zeros(shape=beam.shape + (4,), dtype=self.ct)
+        E[...,0] = E[...,3] = beam
+
+        return E if corrs is None else np.take(E, corrs, axis=-1)
+
+    @cached_term(['lm', 'parallactic_angles', 'point_errors',
+            'antenna_scaling', 'frequency'],
+        ['beam_width', 'beam_clip'])
+    def compute_E_beam_analytic(self, corrs=None):
+        """
+        Evaluates the analytic beam model of each source at each
+        time, antenna and frequency. The beam is scalar, so only
+        the diagonal correlations are non-zero.
+
+        Returns a (nsrc,ntime,na,nchan,4) matrix of complex scalars,
+        or a (nsrc,ntime,na,nchan,len(corrs)) matrix if corrs is supplied.
+        """
+        beam, _, _ = self._analytic_beam(*self.compute_beam_lm())
+
+        return self._diagonal_beam(beam, corrs)
+
+    @cached_term(['lm', 'parallactic_angles', 'point_errors',
+            'antenna_scaling', 'E_beam', 'frequency'],
+        ['beam_ll', 'beam_lm', 'beam_lfreq',
+            'beam_ul', 'beam_um', 'beam_ufreq'])
+    def compute_E_beam_cube(self, corrs=None):
+        """
+        Rotates sources through a beam cube. At each timestep,
+        the source position is computed within the grid defining
+        the cube, taking into account pointing errors and
+        scaling parameters for each antenna.
+
+        The complex numbers at the eight grid points surrounding
+        the source are bilinearly interpolated together to
+        produce a single complex number, the
+        Direction-Dependent Effect for the source at a particular
+        time, antenna and frequency.
+
+        If corrs is supplied, only the correlations of the beam
+        cube with these indices are interpolated.
+
+        Returns a (nsrc,ntime,na,nchan,4) matrix of complex scalars,
+        or a (nsrc,ntime,na,nchan,len(corrs)) matrix if corrs is supplied.
+        """
+        nsrc, ntime, na, nchan, beam_lw, beam_mh, beam_nud = (
+            self.dim_local_size('nsrc', 'ntime', 'na', 'nchan',
+                'beam_lw', 'beam_mh', 'beam_nud'))
+
+        l, m = self.compute_beam_lm()
+
+        # Compute grid positions of the source at each channel
         vl = (beam_lw-1) * (l-self.beam_ll) / (self.beam_ul-self.beam_ll)
         vl = np.clip(vl, 0.0, beam_lw-1)
         assert l.shape == (nsrc, ntime, na, nchan)
-        gl0 = np.floor(vl)
-        gl1 = np.minimum(gl0 + 1.0, beam_lw-1)
-        ld = vl - gl0
 
         vm = (beam_mh-1) * (m-self.beam_lm) / (self.beam_um-self.beam_lm)
         vm = np.clip(vm, 0.0, beam_mh-1)
         assert m.shape == (nsrc, ntime, na, nchan)
-        gm0 = np.floor(vm)
-        gm1 = np.minimum(gm0 + 1.0, beam_mh-1)
-        md = vm - gm0
 
         vchan = ((beam_nud-1)*(self.frequency - self.beam_lfreq) /
             (self.beam_ufreq - self.beam_lfreq))
         vchan = np.clip(vchan, 0.0, beam_nud-1)
         assert vchan.shape == self.frequency.shape
-        gchan0 = np.floor(vchan)
-        gchan1 = np.minimum(gchan0 + 1.0, beam_nud-1)
-        chd = (vchan - gchan0)[np.newaxis,np.newaxis,np.newaxis,:]
-
-        # Initialise the sum to zero
-        pol_sum = np.zeros_like(self.jones)
-        abs_sum = np.zeros(shape=pol_sum.shape, dtype=self.ft)
 
         # A simplified trilinear weighting is used here. Given
         # point x between points x1 and x2, with function f
@@ -444,28 +1355,18 @@ class CPUSolver(MontblancNumpySolver):
         #
         # f(x,y,z) ~= f(x1,y1,z1)(1-(x-x1))(1-(y-y1))(1-(z-z1)) + ...
         #           + f(x2,y2,z2)   (x-x1)    (y-y1)    (z-z1)
+        offsets, ld, md, chd = self.beam_corners(vl, vm, vchan)
 
-        # Load in the complex values from the E beam
-        # at the supplied coordinate offsets.
+        # Load in the complex values and amplitudes
+        # of the E beam at all eight corners at once.
         # Save sum of interpolated complex values in pol_sum
         # Save sum of interpolated absolute values in abs_sum
-        self.trilinear_interpolate(pol_sum, abs_sum,
-            gl0, gm0, gchan0, (1-ld)*(1-md)*(1-chd))
-        self.trilinear_interpolate(pol_sum, abs_sum,
-            gl1, gm0, gchan0, ld*(1-md)*(1-chd))
-        self.trilinear_interpolate(pol_sum, abs_sum,
-            gl0, gm1, gchan0, (1-ld)*md*(1-chd))
-        self.trilinear_interpolate(pol_sum, abs_sum,
-            gl1, gm1, gchan0, ld*md*(1-chd))
-
-        self.trilinear_interpolate(pol_sum, abs_sum,
-            gl0, gm0, gchan1, (1-ld)*(1-md)*chd)
-        self.trilinear_interpolate(pol_sum, abs_sum,
-            gl1, gm0, gchan1, ld*(1-md)*chd)
-        self.trilinear_interpolate(pol_sum, abs_sum,
-            gl0, gm1, gchan1, (1-ld)*md*chd)
-        self.trilinear_interpolate(pol_sum, abs_sum,
-            gl1, gm1, gchan1, ld*md*chd)
+        corners, abs_corners = self.gather_beam_corners(offsets, corrs)
+        weights = list(self.corner_weights(ld, md, chd))
+
+        pol_sum = self.interpolate_corners(corners, weights)
+        abs_sum = self.interpolate_corners(abs_corners, weights)
+        del corners, abs_corners
 
         # Normalise the polarisation
         norm = 1.0/np.abs(pol_sum)
@@ -515,40 +1416,165 @@ class CPUSolver(MontblancNumpySolver):
 
         return pol_sum
 
-    @staticmethod
-    def jones_multiply(A, B, hermitian=None, jones_shape=None):
-        if hermitian is None:
-            hermitian = False
+    def compute_E_beam_lm_gradient(self):
+        """
+        Computes the gradient of the E beam with respect to the
+        l and m coordinates of each source, by differentiating
+        the trilinear interpolation and polarisation normalisation
+        performed in compute_E_beam_cube. Coordinates clipped to
+        the edges of the beam cube have zero gradient. Analytic
+        beam models are differentiated in closed form.
+
+        If the E term is homogeneous across antennas, or evaluated
+        on a subset of the timesteps, so is its gradient. If
+        sources are clustered, each source takes the gradient
+        at its cluster centre, which approximates the change
+        in the E term as the source moves.
+
+        Returns a tuple of two (nsrc,ntime,na,nchan,4) matrices
+        of complex scalars, the derivatives with respect to l and m.
+        """
+        if self.homogeneous_beam():
+            return tuple(self._broadcast_antennas(dE) for dE in
+                self._antenna_sub_solver().compute_E_beam_lm_gradient())
 
-        if jones_shape is None:
-            jones_shape = '1x4'
+        if self._beam_clustering != Options.BEAM_CLUSTERING_NONE:
+            centres, labels = self.beam_clusters()
+            subslvr = self._cluster_sub_solver(centres)
 
-        if type(hermitian) != type(True):
-            raise ValueError('hermitian must be True or False')
+            return tuple(np.take(dE, labels, axis=0)
+                for dE in subslvr.compute_E_beam_lm_gradient())
 
-        if hermitian:
-            result = np.einsum("...ij,...kj->...ik",
-                A.reshape(-1,2,2), B.reshape(-1,2,2).conj())
-        else:
-            result = np.einsum("...ij,...jk->...ik",
-                A.reshape(-1,2,2), B.reshape(-1,2,2))
+        samples = self.beam_time_samples()
 
-        if jones_shape == '1x4':
-            return result.reshape(-1, 4)
-        elif jones_shape == '2x2':
-            return result
-        else:
-            raise ValueError("jones_shape must be '1x4' or '2x2'.")
+        if samples is not None:
+            ntime = self.dim_local_size('ntime')
+            subslvr = self._beam_time_sub_solver(samples)
 
-    def compute_ekb_sqrt_jones_per_ant(self):
-        """
-        Computes the per antenna jones matrices, the product
-        of E x K x B_sqrt
+            return tuple(sample_interpolate(dE, 1, samples, ntime)
+                for dE in subslvr.compute_E_beam_lm_gradient())
 
-        Returns a (nsrc,ntime,na,nchan,4) matrix of complex scalars.
-        """
-        nsrc, ntime, na, nchan = self.dim_local_size('nsrc', 'ntime', 'na', 'nchan')
-        N = nsrc*ntime*na*nchan
+        nsrc, ntime, na, nchan, beam_lw, beam_mh, beam_nud = (
+            self.dim_local_size('nsrc', 'ntime', 'na', 'nchan',
+                'beam_lw', 'beam_mh', 'beam_nud'))
+
+        sint = np.sin(self.parallactic_angles)[np.newaxis,:,:,np.newaxis]
+        cost = np.cos(self.parallactic_angles)[np.newaxis,:,:,np.newaxis]
+
+        l0 = self.lm[:,0][:,np.newaxis,np.newaxis,np.newaxis]
+        m0 = self.lm[:,1][:,np.newaxis,np.newaxis,np.newaxis]
+        ld, md = self.point_errors[:,:,:,0], self.point_errors[:,:,:,1]
+        a = self.antenna_scaling[:,:,0][np.newaxis,np.newaxis,:,:]
+        b = self.antenna_scaling[:,:,1][np.newaxis,np.newaxis,:,:]
+
+        l = (l0*cost - m0*sint + ld[np.newaxis,:,:,:])*a
+        m = (l0*sint + m0*cost + md[np.newaxis,:,:,:])*b
+
+        assert l.shape == (nsrc, ntime, na, nchan)
+        assert m.shape == (nsrc, ntime, na, nchan)
+
+        # Derivatives of the beam with respect to the grid positions
+        # (vl, vm), and of the grid positions with respect to l and m
+        if self._beam_model != Options.BEAM_MODEL_CUBE:
+            # Analytic beams are differentiated in closed form
+            _, d_beam_dl, d_beam_dm = self._analytic_beam(l, m)
+            dE_dvl = self._diagonal_beam(d_beam_dl)
+            dE_dvm = self._diagonal_beam(d_beam_dm)
+            dvl = dvm = np.ones(shape=l.shape, dtype=self.ft)
+        else:
+            # Compute grid positions, and their derivatives
+            # with respect to l and m, which are zero if clipped
+            l_scale = (beam_lw-1) / (self.beam_ul-self.beam_ll)
+            vl = l_scale * (l-self.beam_ll)
+            dvl = np.where(np.logical_and(vl > 0, vl < beam_lw-1), l_scale, 0)
+            vl = np.clip(vl, 0.0, beam_lw-1)
+
+            m_scale = (beam_mh-1) / (self.beam_um-self.beam_lm)
+            vm = m_scale * (m-self.beam_lm)
+            dvm = np.where(np.logical_and(vm > 0, vm < beam_mh-1), m_scale, 0)
+            vm = np.clip(vm, 0.0, beam_mh-1)
+
+            vchan = ((beam_nud-1)*(self.frequency - self.beam_lfreq) /
+                (self.beam_ufreq - self.beam_lfreq))
+            vchan = np.clip(vchan, 0.0, beam_nud-1)
+
+            # Interpolate with the trilinear weights of each corner,
+            # and their derivatives with respect to the l and m
+            # grid positions, (d/dld)(1-ld) = -1 and (d/dld)ld = 1
+            offsets, ld, md, chd = self.beam_corners(vl, vm, vchan)
+            corners, abs_corners = self.gather_beam_corners(offsets)
+
+            pol_sums, abs_sums = [], []
+
+            for dl, dm in ((False, False), (True, False), (False, True)):
+                weights = list(self.corner_weights(ld, md, chd, dl, dm))
+                pol_sums.append(self.interpolate_corners(corners, weights))
+                abs_sums.append(self.interpolate_corners(abs_corners, weights))
+
+            del corners, abs_corners
+
+            pol_sum, dl_pol_sum, dm_pol_sum = pol_sums
+            abs_sum, dl_abs_sum, dm_abs_sum = abs_sums
+
+            # Differentiate the normalised polarisation
+            # E = P*A/|P|, where d|P| = Re(conj(P)*dP)/|P|
+            pol_abs = np.abs(pol_sum)
+            norm = np.ones_like(pol_abs)
+            np.divide(1.0, pol_abs, out=norm, where=pol_abs > 0)
+
+            def _norm_gradient(d_pol_sum, d_abs_sum):
+                d_pol_abs = (pol_sum.conj()*d_pol_sum).real*norm
+                return ((d_pol_sum*abs_sum + pol_sum*d_abs_sum)*norm
+                    - pol_sum*abs_sum*d_pol_abs*norm**2)
+
+            dE_dvl = _norm_gradient(dl_pol_sum, dl_abs_sum)
+            dE_dvm = _norm_gradient(dm_pol_sum, dm_abs_sum)
+
+        # Chain rule through the rotation and scaling of l and m
+        dvl_dl, dvl_dm = dvl*cost*a, -dvl*sint*a
+        dvm_dl, dvm_dm = dvm*sint*b, dvm*cost*b
+
+        dE_dl = (dE_dvl*dvl_dl[:,:,:,:,np.newaxis] +
+            dE_dvm*dvm_dl[:,:,:,:,np.newaxis])
+        dE_dm = (dE_dvl*dvl_dm[:,:,:,:,np.newaxis] +
+            dE_dvm*dvm_dm[:,:,:,:,np.newaxis])
+
+        return dE_dl, dE_dm
+
+    @staticmethod
+    def jones_multiply(A, B, hermitian=None, jones_shape=None):
+        if hermitian is None:
+            hermitian = False
+
+        if jones_shape is None:
+            jones_shape = '1x4'
+
+        if type(hermitian) != type(True):
+            raise ValueError('hermitian must be True or False')
+
+        if hermitian:
+            result = np.einsum("...ij,...kj->...ik",
+                A.reshape(-1,2,2), B.reshape(-1,2,2).conj())
+        else:
+            result = np.einsum("...ij,...jk->...ik",
+                A.reshape(-1,2,2), B.reshape(-1,2,2))
+
+        if jones_shape == '1x4':
+            return result.reshape(-1, 4)
+        elif jones_shape == '2x2':
+            return result
+        else:
+            raise ValueError("jones_shape must be '1x4' or '2x2'.")
+
+    def compute_ekb_sqrt_jones_per_ant(self):
+        """
+        Computes the per antenna jones matrices, the product
+        of E x K x B_sqrt
+
+        Returns a (nsrc,ntime,na,nchan,4) matrix of complex scalars.
+        """
+        nsrc, ntime, na, nchan = self.dim_local_size('nsrc', 'ntime', 'na', 'nchan')
+        jones_shape = (nsrc, ntime, na, nchan, 2, 2)
 
         E_beam = self.compute_E_beam()
         kb_sqrt = self.compute_kb_sqrt_jones_per_ant()
@@ -556,7 +1582,10 @@ class CPUSolver(MontblancNumpySolver):
         assert E_beam.shape == (nsrc, ntime, na, nchan, 4)
         assert kb_sqrt.shape == (nsrc, ntime, na, nchan, 4)
 
-        result = CPUSolver.jones_multiply(E_beam, kb_sqrt)
+        # Multiply 2x2 views, so that an E term
+        # broadcast across antennas isn't copied
+        result = np.matmul(E_beam.reshape(jones_shape),
+            kb_sqrt.reshape(jones_shape))
         return result.reshape(nsrc, ntime, na, nchan, 4)
 
     def compute_ekb_jones_per_bl(self, ekb_sqrt=None):
@@ -633,14 +1662,382 @@ class CPUSolver(MontblancNumpySolver):
 
         return vis
 
+    def compute_ekb_vis_gemm(self, ekb_sqrt=None):
+        """
+        Computes the complex visibilities based on the
+        scalar EK term and the 2x2 B term, by expressing the
+        sum over point sources as a block Gram matrix product.
+
+        For each timestep and channel, the per antenna EKB square
+        root terms of the point sources form a (2*na, 2*npsrc)
+        matrix J of 2x2 blocks. J.J^H is then a (2*na, 2*na)
+        matrix whose (p, q) block is the sum over sources of
+        J_p.J_q^H. This is computed with batched complex matrix
+        multiplies, after which the antenna pairs of each
+        baseline are selected.
+
+        Gaussian and sersic sources have per-baseline shape terms
+        that do not factorise in this way, and are summed by
+        compute_ekb_jones_per_bl and compute_ekb_vis.
+
+        Returns a (ntime,nbl,nchan,4) matrix of complex scalars.
+        """
+        nsrc, npsrc, ntime, na, nbl, nchan = self.dim_local_size(
+            'nsrc', 'npsrc', 'ntime', 'na', 'nbl', 'nchan')
+
+        if ekb_sqrt is None:
+            ekb_sqrt = self.compute_ekb_sqrt_jones_per_ant()
+
+        assert ekb_sqrt.shape == (nsrc, ntime, na, nchan, 4)
+
+        vis = np.zeros(shape=(ntime, nbl, nchan, 4), dtype=self.ct)
+
+        if npsrc > 0:
+            # (npsrc, ntime, na, nchan, 2, 2) to
+            # (ntime, nchan, na, 2, npsrc, 2) to
+            # (ntime, nchan, 2*na, 2*npsrc)
+            J = (ekb_sqrt[:npsrc].reshape(npsrc, ntime, na, nchan, 2, 2)
+                .transpose(1, 3, 2, 4, 0, 5)
+                .reshape(ntime, nchan, 2*na, 2*npsrc))
+
+            JJH = np.matmul(J, J.conj().transpose(0, 1, 3, 2))
+
+            # (ntime, nchan, na, 2, na, 2) to
+            # (ntime, na, na, nchan, 2, 2)
+            JJH = (JJH.reshape(ntime, nchan, na, 2, na, 2)
+                .transpose(0, 2, 4, 1, 3, 5))
+
+            # Select the antenna pairs of each baseline
+            (time_idx, ant0), (_, ant1) = self.ap_idx()
+            vis += JJH[time_idx, ant0, ant1].reshape(ntime, nbl, nchan, 4)
+
+        if nsrc > npsrc:
+            # Sum the extended sources on a sub-solver
+            subslvr = self._sub_solver(self._source_slice(npsrc, nsrc),
+                ignore=['B_sqrt', 'jones', 'model_vis', 'chi_sqrd_result'])
+            vis += subslvr.compute_ekb_vis(subslvr.compute_ekb_jones_per_bl(
+                ekb_sqrt[npsrc:]))
+
+        return vis
+
+    def sum_coherencies(self, ekb_sqrt=None):
+        """
+        Computes the complex visibilities based on the
+        scalar EK term and the 2x2 B term, using the
+        configured coherency engine.
+
+        Returns a (ntime,nbl,nchan,4) matrix of complex scalars.
+        """
+        if self._sparse_flags:
+            return self.compute_ekb_vis_sparse(ekb_sqrt)
+
+        if ekb_sqrt is None:
+            corrs = self.diagonal_correlations()
+
+            if corrs is not None:
+                return self.compute_ekb_vis_diagonal(corrs)
+
+            ekb_sqrt = self.compute_ekb_sqrt_jones_per_ant()
+
+        if self._coherency_engine == Options.COHERENCY_ENGINE_GEMM:
+            return self.compute_ekb_vis_gemm(ekb_sqrt)
+
+        return self.compute_ekb_vis(self.compute_ekb_jones_per_bl(ekb_sqrt))
+
+    def unflagged_samples(self):
+        """
+        Returns a (time, baseline, channel) tuple of index arrays
+        of the samples with at least one unflagged correlation.
+        The indices are computed once, and again only if
+        the flag array has since been marked dirty.
+        """
+        versions = self.array_version('flag')
+
+        if self._unflagged_samples_versions != versions:
+            self._unflagged_samples = np.nonzero(
+                np.logical_not(self.flag.all(axis=3)))
+            self._unflagged_samples_versions = versions
+
+        return self._unflagged_samples
+
+    def compute_shape_samples(self, u, v, frequency):
+        """
+        Computes the shape terms of the gaussian and sersic sources
+        at the supplied baseline u and v coordinates and frequencies
+        of S samples.
+
+        Returns a (ngsrc + nssrc, S) matrix of floating point scalars.
+        """
+        ngsrc, nssrc = self.dim_local_size('ngsrc', 'nssrc')
+        shape = np.empty(shape=(ngsrc + nssrc, u.size), dtype=self.ft)
+
+        if ngsrc > 0:
+            el, em, R = (a[:,np.newaxis] for a in self.gauss_shape)
+
+            shape[:ngsrc] = ne.evaluate('exp(-((u*em - v*el)*scale_uv*R)**2 '
+                '- ((u*el + v*em)*scale_uv)**2)', {
+                    'u': u, 'v': v, 'el': el, 'em': em, 'R': R,
+                    'scale_uv': self.gauss_scale*frequency })
+
+        if nssrc > 0:
+            e1, e2, R = (a[:,np.newaxis] for a in self.sersic_shape)
+
+            den = ne.evaluate('1 + ((u*(1 + e1) + v*e2)*scale_uv*R)**2 '
+                '+ ((u*e2 + v*(1 - e1))*scale_uv*R)**2', {
+                    'u': u, 'v': v, 'e1': e1, 'e2': e2,
+                    'R': R/(1 - e1*e1 - e2*e2),
+                    'scale_uv': self.two_pi_over_c*frequency })
+
+            shape[ngsrc:] = ne.evaluate('1/(den*sqrt(den))', {'den': den})
+
+        return shape
+
+    def compute_ekb_sqrt_jones_of_samples(self, times, chans):
+        """
+        Computes the per antenna jones matrices, the product of
+        E x K x B_sqrt, for the timesteps and channels with the
+        supplied indices only. These are computed on a sub-solver
+        over the selected timesteps and channels.
+
+        Returns a (nsrc,len(times),na,len(chans),4) matrix
+        of complex scalars.
+        """
+        ntime, nchan = self.dim_local_size('ntime', 'nchan')
+
+        if len(times) == ntime and len(chans) == nchan:
+            return self.compute_ekb_sqrt_jones_per_ant()
+
+        # Per baseline arrays aren't needed on the sub-solver
+        ignore = RESULT_ARRAYS | VISIBILITY_DATA_ARRAYS | set(['G_term'])
+        supplied = {}
+
+        for name, ary in self.arrays().iteritems():
+            if name in ignore or name in self._ignored_arrays:
+                continue
+
+            schema = ary['shape']
+            ary = getattr(self, name)
+
+            for dim, idx in ((Options.NTIME, times), (Options.NCHAN, chans)):
+                if dim in schema:
+                    ary = np.take(ary, idx, axis=schema.index(dim))
+
+            supplied[name] = ary
+
+        subslvr = self._sub_solver({
+            Options.NTIME: slice(0, len(times), 1),
+            Options.NCHAN: slice(0, len(chans), 1) },
+            ignore=ignore, supplied=supplied,
+            view=('samples', tuple(times), tuple(chans)))
+
+        # The selected timesteps needn't be evenly spaced,
+        # so the E term is evaluated on each of them
+        subslvr._beam_time_factor = subslvr._beam_max_rotation = None
+
+        return subslvr.compute_ekb_sqrt_jones_per_ant()
+
+    def compute_ekb_vis_sparse(self, ekb_sqrt=None):
+        """
+        Computes the complex visibilities based on the
+        scalar EK term and the 2x2 B term, summing coherencies
+        over sources only for samples with unflagged correlations.
+        Visibilities of fully flagged samples are zero.
+
+        If ekb_sqrt is not supplied, per antenna terms are only
+        computed for timesteps and channels with unflagged samples,
+        so that flagged scans and channel ranges cost nothing.
+
+        Returns a (ntime,nbl,nchan,4) matrix of complex scalars.
+        """
+        nsrc, npsrc, ntime, nbl, nchan = self.dim_local_size(
+            'nsrc', 'npsrc', 'ntime', 'nbl', 'nchan')
+
+        vis = np.zeros(shape=(ntime, nbl, nchan, 4), dtype=self.ct)
+        t, bl, ch = self.unflagged_samples()
+
+        if t.size == 0 or nsrc == 0:
+            return vis
+
+        # Index per antenna terms by position within the
+        # timesteps and channels for which they are computed
+        if ekb_sqrt is None:
+            times, ekb_t = np.unique(t, return_inverse=True)
+            chans, ekb_ch = np.unique(ch, return_inverse=True)
+            ekb_sqrt = self.compute_ekb_sqrt_jones_of_samples(times, chans)
+        else:
+            ekb_t, ekb_ch = t, ch
+
+        p, q = self.antenna1[t, bl], self.antenna2[t, bl]
+
+        # (nsrc, S, 4) per sample jones matrices
+        jones = self.jones_multiply(ekb_sqrt[:, ekb_t, p, ekb_ch],
+            ekb_sqrt[:, ekb_t, q, ekb_ch], hermitian=True).reshape(nsrc, -1, 4)
+
+        # Multiply in gaussian and sersic shape terms
+        if nsrc > npsrc:
+            u = self.uvw[t, q, 0] - self.uvw[t, p, 0]
+            v = self.uvw[t, q, 1] - self.uvw[t, p, 1]
+            jones[npsrc:] *= self.compute_shape_samples(u, v,
+                self.frequency[ch])[:, :, np.newaxis]
+
+        vis[t, bl, ch] = jones.sum(axis=0)
+
+        return vis
+
+    def diagonal_correlations(self):
+        """
+        Returns the indices of the correlations needed to sum
+        coherencies over sources, in the polarisation mode produced
+        by polarisation_mode. [0, 3] (XX and YY) suffice if the sky
+        is unpolarised and the beam is diagonal, and [0] if the beam
+        is also scalar, as analytic beams are. None is returned
+        if all four correlations are needed.
+        """
+        return POLARISATION_MODE_CORRELATIONS[self.polarisation_mode()]
+
+    def polarisation_mode(self):
+        """
+        Returns the configured polarisation mode, or in the auto
+        mode, the smallest exact mode detected from the stokes
+        parameters and beam cube. Detection is repeated if
+        these arrays have since been marked dirty.
+        """
+        if self._polarisation_mode != Options.POLARISATION_MODE_AUTO:
+            return self._polarisation_mode
+
+        names = ['stokes']
+
+        if self._beam_model == Options.BEAM_MODEL_CUBE:
+            names.append('E_beam')
+
+        return self._detected_polarisation_mode.get(
+            tuple(self.array_version(n) for n in names),
+            self._detect_polarisation_mode)
+
+    def _detect_polarisation_mode(self):
+        """
+        Detects the smallest exact polarisation mode
+        from the stokes parameters and beam cube.
+        """
+        if np.any(self.stokes[:,:,1:]):
+            return Options.POLARISATION_MODE_FULL
+
+        if self._beam_model != Options.BEAM_MODEL_CUBE:
+            return Options.POLARISATION_MODE_SCALAR
+
+        E = self.E_beam
+
+        if np.any(E[:,:,:,1:3]):
+            return Options.POLARISATION_MODE_FULL
+
+        return (Options.POLARISATION_MODE_SCALAR
+            if np.array_equal(E[:,:,:,0], E[:,:,:,3])
+            else Options.POLARISATION_MODE_DIAGONAL)
+
+    def compute_ekb_vis_diagonal(self, corrs):
+        """
+        Computes the complex visibilities based on the
+        scalar EK term and the 2x2 B term, for an unpolarised
+        sky and a diagonal beam. Only the diagonal correlations
+        with the supplied indices are computed, as complex
+        scalars. A single correlation is broadcast to XX and YY.
+        Off-diagonal correlations are zero.
+
+        Returns a (ntime,nbl,nchan,4) matrix of complex scalars.
+        """
+        nsrc, npsrc, ngsrc, nssrc, ntime, na, nbl, nchan = self.dim_local_size(
+            'nsrc', 'npsrc', 'ngsrc', 'nssrc', 'ntime', 'na', 'nbl', 'nchan')
+        ncorr = len(corrs)
+
+        # The square root of an unpolarised brightness
+        # matrix is a scalar multiple of the identity
+        b_sqrt = self.compute_b_sqrt_jones()[:,:,np.newaxis,:,0]
+        k = self.compute_k_jones_scalar_per_ant()
+        E = self.compute_E_beam(corrs=corrs)
+
+        ekb_sqrt = ne.evaluate('E*kb', {'E': E,
+            'kb': (k*b_sqrt)[:,:,:,:,np.newaxis]})
+        assert ekb_sqrt.shape == (nsrc, ntime, na, nchan, ncorr)
+
+        ant0, ant1 = self.ap_idx(src=True, chan=True)
+        jones = ne.evaluate('p*conj(q)',
+            {'p': ekb_sqrt[ant0], 'q': ekb_sqrt[ant1]})
+        assert jones.shape == (nsrc, ntime, nbl, nchan, ncorr)
+
+        # Multiply in Gaussian Shape Terms
+        if ngsrc > 0:
+            jones[npsrc:npsrc+ngsrc] *= self.compute_gaussian_shape()[
+                :,:,:,:,np.newaxis]
+
+        # Multiply in Sersic Shape Terms
+        if nssrc > 0:
+            jones[npsrc+ngsrc:] *= self.compute_sersic_shape()[
+                :,:,:,:,np.newaxis]
+
+        vis = np.zeros(shape=(ntime, nbl, nchan, 4), dtype=self.ct)
+
+        if nsrc > 0:
+            vis[:,:,:,[0, 3]] = jones.sum(axis=0)
+
+        return vis
+
+    def compute_ekb_vis_by_source_batch(self, src_batch_size=None):
+        """
+        Computes the complex visibilities based on the
+        scalar EK term and the 2x2 B term, accumulating
+        the contribution of each batch of src_batch_size
+        sources into a single visibility array.
+
+        Peak memory usage depends on the batch size, rather than
+        on the total number of sources. If src_batch_size is None,
+        the configured source batch size is used.
+
+        Returns a (ntime,nbl,nchan,4) matrix of complex scalars.
+        """
+        ntime, nbl, nchan = self.dim_local_size('ntime', 'nbl', 'nchan')
+
+        if src_batch_size is None:
+            src_batch_size = self._source_batch_size
+
+        vis = np.zeros(shape=(ntime, nbl, nchan, 4), dtype=self.ct)
+
+        # Result arrays aren't needed on the sub-solvers
+        ignore = ['B_sqrt', 'jones', 'model_vis', 'chi_sqrd_result']
+
+        for cpu_slice in self._gen_source_slices(src_batch_size):
+            subslvr = self._sub_solver(cpu_slice, ignore=ignore)
+            vis += subslvr.sum_coherencies()
+
+        return vis
+
+    def polarisation_indices(self):
+        """
+        Returns the indices of the (XX, XY, YX, YY) correlations
+        held in the npol visibility arrays. XX and YY are
+        held if npol is 2, and XX alone if npol is 1.
+        """
+        return POLARISATION_INDICES[self.dim_local_size(Options.NPOL)]
+
+    def select_polarisations(self, vis):
+        """
+        Selects the correlations held in the visibility
+        arrays from the last dimension of vis, which
+        holds all four correlations.
+        """
+        if self.dim_local_size(Options.NPOL) == 4:
+            return vis
+
+        return vis[...,self.polarisation_indices()]
+
     def compute_gekb_vis(self, ekb_vis=None):
         """
         Computes the complex visibilities based on the
         scalar EK term and the 2x2 B term.
 
-        Returns a (ntime,nbl,nchan,4) matrix of complex scalars.
+        Returns a (ntime,nbl,nchan,npol) matrix of complex scalars.
         """
-        nsrc, ntime, nbl, nchan = self.dim_local_size('nsrc', 'ntime', 'nbl', 'nchan')
+        nsrc, ntime, nbl, nchan, npol = self.dim_local_size('nsrc',
+            'ntime', 'nbl', 'nchan', 'npol')
 
         if ekb_vis is None:
             ekb_vis = self.compute_ekb_vis()
@@ -659,7 +2056,8 @@ class CPUSolver(MontblancNumpySolver):
         result = (self.jones_multiply(g_term_p, ekb_vis)
             .reshape(ntime, nbl, nchan, 4))
 
-        result = (self.jones_multiply(result, g_term_q, hermitian=True)
+        result = self.select_polarisations(
+            self.jones_multiply(result, g_term_q, hermitian=True)
             .reshape(ntime, nbl, nchan, 4))
 
         # Output residuals if requested, otherwise return
@@ -669,7 +2067,7 @@ class CPUSolver(MontblancNumpySolver):
                 'mvis': result,
                 'ovis': self.observed_vis,
                 'flag' : self.flag })
-            assert result.shape == (ntime, nbl, nchan, 4)
+            assert result.shape == (ntime, nbl, nchan, npol)
         else:
             result[self.flag > 0] = 0
 
@@ -682,7 +2080,8 @@ class CPUSolver(MontblancNumpySolver):
 
         Returns a (ntime,nbl,nchan) matrix of floating point scalars.
         """
-        ntime, nbl, nchan = self.dim_local_size('ntime', 'nbl', 'nchan')
+        ntime, nbl, nchan, npol = self.dim_local_size('ntime', 'nbl',
+            'nchan', 'npol')
 
         if vis is None:
             vis = self.compute_gekb_vis()
@@ -693,7 +2092,7 @@ class CPUSolver(MontblancNumpySolver):
                 'mvis': vis,
                 'ovis': self.observed_vis,
                 'flag' : self.flag })
-            assert d.shape == (ntime, nbl, nchan, 4)
+            assert d.shape == (ntime, nbl, nchan, npol)
         else:
             d = vis
 
@@ -721,6 +2120,30 @@ class CPUSolver(MontblancNumpySolver):
 
         return chi_sqrd_terms
 
+    def compute_chi_sqrd_sum(self, vis=None):
+        """
+        Computes the sum of the chi squared terms in a single
+        reduction, without materialising the residuals or
+        the (ntime,nbl,nchan) matrix of chi squared terms.
+
+        vis should contain model visibilities, not residuals.
+
+        Returns a floating point scalar.
+        """
+        if vis is None:
+            vis = self.compute_gekb_vis()
+
+        expr = '(real(ovis - mvis)**2 + imag(ovis - mvis)**2)'
+
+        if self.use_weight_vector() is True:
+            expr = expr + '*wv'
+
+        return ne.evaluate('sum(where(flag > 0, 0, {e}))'.format(e=expr), {
+            'mvis': vis,
+            'ovis': self.observed_vis,
+            'flag': self.flag,
+            'wv': self.weight_vector }).item()
+
     def compute_chi_sqrd(self, chi_sqrd_terms=None):
         """ Computes the floating point chi squared value. """
 
@@ -736,14 +2159,1052 @@ class CPUSolver(MontblancNumpySolver):
         return (term_sum if self.use_weight_vector() is True
             else term_sum / self.sigma_sqrd)
 
-    def solve(self):
-        """ Solve the RIME """
+    def compute_X2_gradient(self):
+        """
+        Computes the analytic gradient of the chi-squared value
+        with respect to the lm, stokes, alpha, gauss_shape and
+        sersic_shape arrays, reusing the K, B and E terms of the
+        forward pass (which are cached if a term cache is configured).
+
+        With F = K.E the per antenna jones matrices without the
+        brightness, the coherencies are V = S.F_p.B.F_q^H for
+        shape terms S. The residuals D are propagated back through
+        the G terms to A = G_p^H.D.G_q, whereupon
+            dX2 = -2 Re <A, dV>
+        is accumulated over baselines for each source parameter.
+
+        Returns a dictionary of gradients keyed on array name,
+        each with the shape of the corresponding array.
+        """
+        nsrc, npsrc, ngsrc, nssrc, ntime, na, nbl, nchan = (
+            self.dim_local_size('nsrc', 'npsrc', 'ngsrc', 'nssrc',
+                'ntime', 'na', 'nbl', 'nchan'))
+
+        def _jones(x):
+            return x.reshape(x.shape[:-1] + (2, 2))
+
+        def _herm(x):
+            return x.conj().swapaxes(-1, -2)
+
+        # Forward pass
+        K = self.compute_k_jones_scalar_per_ant()
+        E = _jones(self.compute_E_beam())
+        B = _jones(self.compute_b_jones())
+        F = K[:,:,:,:,np.newaxis,np.newaxis]*E
+
+        src_ant0, src_ant1 = self.ap_idx(src=True, chan=True)
+        F_p, F_q = F[src_ant0], F[src_ant1]
+        B_bl = B[:,:,np.newaxis,:,:,:]
+
+        # Unshaped coherencies and shape terms of each source
+        C = np.matmul(np.matmul(F_p, B_bl), _herm(F_q))
+        S = np.ones(shape=(nsrc, ntime, nbl, nchan), dtype=self.ft)
+
+        if ngsrc > 0:
+            S[npsrc:npsrc+ngsrc] = self.compute_gaussian_shape()
+
+        if nssrc > 0:
+            S[npsrc+ngsrc:] = self.compute_sersic_shape()
+
+        V = np.einsum('stbc,stbcij->tbcij', S, C)
+
+        ant0, ant1 = self.ap_idx(chan=True)
+        G_p, G_q = _jones(self.G_term[ant0]), _jones(self.G_term[ant1])
+
+        # Weighted residuals, propagated back through the G terms
+        model_vis = np.matmul(np.matmul(G_p, V), _herm(G_q))
+        D = ne.evaluate('(ovis - mvis)*where(flag > 0, 0, 1)', {
+            'mvis': self.select_polarisations(
+                model_vis.reshape(ntime, nbl, nchan, 4)),
+            'ovis': self.observed_vis,
+            'flag': self.flag })
+
+        if self.use_weight_vector() is True:
+            D *= self.weight_vector
+            scale = -2.0
+        else:
+            scale = -2.0 / self.sigma_sqrd
+
+        # Correlations absent from the visibility
+        # arrays contribute no residual
+        if D.shape[3] != 4:
+            D4 = np.zeros(shape=(ntime, nbl, nchan, 4), dtype=D.dtype)
+            D4[:,:,:,self.polarisation_indices()] = D
+            D = D4
+
+        A = np.matmul(np.matmul(_herm(G_p), _jones(D)), G_q)
+        A_src = A[np.newaxis]
+
+        # B is linear in the stokes parameters and (f/rf)**alpha,
+        # <A, S.F_p.dB.F_q^H> = <S.F_p^H.A.F_q, dB>
+        H = np.einsum('stbc,stbcij->stcij', S,
+            np.matmul(np.matmul(_herm(F_p), A_src), F_q))
+        H = H.reshape(nsrc, ntime, nchan, 4).conj()
+
+        power = (self.frequency/self.ref_frequency)[np.newaxis,np.newaxis,:] \
+            ** self.alpha[:,:,np.newaxis]
+
+        stokes_grad = np.empty(shape=(nsrc, ntime, 4), dtype=self.ft)
+        stokes_grad[:,:,0] = (power*(H[:,:,:,0] + H[:,:,:,3])).real.sum(axis=2)
+        stokes_grad[:,:,1] = (power*(H[:,:,:,0] - H[:,:,:,3])).real.sum(axis=2)
+        stokes_grad[:,:,2] = (power*(H[:,:,:,1] + H[:,:,:,2])).real.sum(axis=2)
+        stokes_grad[:,:,3] = (power*1j*(H[:,:,:,1] - H[:,:,:,2])).real.sum(axis=2)
+
+        log_ratio = np.log(self.frequency/self.ref_frequency)
+        alpha_grad = (log_ratio[np.newaxis,np.newaxis,:]*
+            (H*B.reshape(nsrc, ntime, nchan, 4)).sum(axis=3)).real.sum(axis=2)
+
+        # <A, S.(dF_p.B.F_q^H + F_p.B.dF_q^H)> = <Fbar_p, dF_p> + <Fbar_q, dF_q>
+        # Scatter the per baseline adjoints onto the antennas
+        F_bar = np.zeros(shape=F.shape, dtype=self.ct)
+        S_bl = S[:,:,:,:,np.newaxis,np.newaxis]
+        np.add.at(F_bar, tuple(src_ant0),
+            S_bl*np.matmul(np.matmul(A_src, F_q), B_bl))
+        np.add.at(F_bar, tuple(src_ant1),
+            S_bl*np.matmul(np.matmul(_herm(A_src), F_p), B_bl))
+        F_bar = F_bar.conj()
+
+        # Derivatives of K and E with respect to l and m
+        l, m = self.lm[:,0], self.lm[:,1]
+        u, v, w = self.uvw[:,:,0], self.uvw[:,:,1], self.uvw[:,:,2]
+        rn = 1.0/np.sqrt(1. - l**2 - m**2)
+        dphase_dl = u[np.newaxis] - np.outer(l*rn, w).reshape(nsrc, ntime, na)
+        dphase_dm = v[np.newaxis] - np.outer(m*rn, w).reshape(nsrc, ntime, na)
+        dK = -2*np.pi*1j*self.frequency[np.newaxis,np.newaxis,np.newaxis,:] \
+            / montblanc.constants.C * K
+        dE_dl, dE_dm = self.compute_E_beam_lm_gradient()
+
+        lm_grad = np.empty(shape=(nsrc, 2), dtype=self.ft)
+
+        for i, (dphase, dE) in enumerate(((dphase_dl, dE_dl),
+                (dphase_dm, dE_dm))):
+            dF = ((dK*dphase[:,:,:,np.newaxis])[:,:,:,:,np.newaxis,np.newaxis]*E
+                + K[:,:,:,:,np.newaxis,np.newaxis]*_jones(dE))
+            lm_grad[:,i] = (F_bar*dF).real.reshape(nsrc, -1).sum(axis=1)
+
+        # Shape terms multiply the unshaped coherencies, <A, dS.C>
+        AC = (A_src.conj()*C).sum(axis=(4,5)).real
+
+        ant0, ant1 = self.ap_idx()
+        u = self.uvw[:,:,0][ant1] - self.uvw[:,:,0][ant0]
+        v = self.uvw[:,:,1][ant1] - self.uvw[:,:,1][ant0]
+        u, v = u[np.newaxis,:,:,np.newaxis], v[np.newaxis,:,:,np.newaxis]
+        f = self.frequency[np.newaxis,np.newaxis,np.newaxis,:]
+
+        gauss_shape_grad = np.empty(shape=(3, ngsrc), dtype=self.ft)
+
+        if ngsrc > 0:
+            gs = slice(npsrc, npsrc+ngsrc)
+            el, em, R = (x[:,np.newaxis,np.newaxis,np.newaxis]
+                for x in self.gauss_shape)
+            scale_uv = (self.gauss_scale*f)**2
+            u1 = u*em - v*el
+            v1 = u*el + v*em
+            # S = exp(-scale_uv*((u1*R)**2 + v1**2))
+            dS = -2*scale_uv*S[gs]*AC[gs]
+            gauss_shape_grad[0] = (dS*(-R**2*u1*v + v1*u)).reshape(ngsrc, -1).sum(axis=1)
+            gauss_shape_grad[1] = (dS*(R**2*u1*u + v1*v)).reshape(ngsrc, -1).sum(axis=1)
+            gauss_shape_grad[2] = (dS*R*u1**2).reshape(ngsrc, -1).sum(axis=1)
+
+        sersic_shape_grad = np.empty(shape=(3, nssrc), dtype=self.ft)
+
+        if nssrc > 0:
+            ss = slice(npsrc+ngsrc, nsrc)
+            e1, e2, R = (x[:,np.newaxis,np.newaxis,np.newaxis]
+                for x in self.sersic_shape)
+            scale_uv = (self.two_pi_over_c*f)**2
+            q = 1 - e1**2 - e2**2
+            Rq = R/q
+            u1 = u*(1+e1) + v*e2
+            v1 = u*e2 + v*(1-e1)
+            uv = u1**2 + v1**2
+            # S = den**-1.5, den = 1 + scale_uv*Rq**2*uv
+            den = 1 + scale_uv*Rq**2*uv
+            dS = -1.5*S[ss]/den*scale_uv*AC[ss]
+            sersic_shape_grad[0] = (dS*(2*Rq*(Rq*2*e1/q)*uv
+                + Rq**2*2*(u1*u - v1*v))).reshape(nssrc, -1).sum(axis=1)
+            sersic_shape_grad[1] = (dS*(2*Rq*(Rq*2*e2/q)*uv
+                + Rq**2*2*(u1*v + v1*u))).reshape(nssrc, -1).sum(axis=1)
+            sersic_shape_grad[2] = (dS*2*Rq/q*uv).reshape(nssrc, -1).sum(axis=1)
+
+        return {
+            'lm': scale*lm_grad,
+            'stokes': scale*stokes_grad,
+            'alpha': scale*alpha_grad,
+            'gauss_shape': scale*gauss_shape_grad,
+            'sersic_shape': scale*sersic_shape_grad,
+        }
+
+    def compute_chi_sqrd_batch(self, ekb_vis):
+        """
+        Computes the chi-squared values of a batch of visibilities
+        summed over all sources, one for each of nparam parameter
+        sets. The G term, observed visibilities, flags and weights
+        are broadcast over the parameter sets, so that they
+        are read once for the entire batch.
+
+        Returns a (nparam,) array of floating point scalars.
+        """
+        ntime, nbl, nchan = self.dim_local_size('ntime', 'nbl', 'nchan')
+        nparam = ekb_vis.shape[0]
+
+        assert ekb_vis.shape == (nparam, ntime, nbl, nchan, 4)
+
+        # G_p x V x G_q^H, as batched 2x2 matrix products
+        ant0, ant1 = self.ap_idx(chan=True)
+        g_term_p = self.G_term[ant0].reshape(ntime, nbl, nchan, 2, 2)
+        g_term_q = self.G_term[ant1].reshape(ntime, nbl, nchan, 2, 2)
+
+        model_vis = np.matmul(np.matmul(g_term_p,
+            ekb_vis.reshape(nparam, ntime, nbl, nchan, 2, 2)),
+            g_term_q.conj().swapaxes(-1, -2))
+
+        d = ne.evaluate('(ovis - mvis)*where(flag > 0, 0, 1)', {
+            'mvis': self.select_polarisations(
+                model_vis.reshape(nparam, ntime, nbl, nchan, 4)),
+            'ovis': self.observed_vis,
+            'flag': self.flag })
+
+        if self.use_weight_vector() is True:
+            terms = ne.evaluate('(real(d)**2 + imag(d)**2)*wv',
+                { 'd': d, 'wv': self.weight_vector })
+        else:
+            terms = ne.evaluate('real(d)**2 + imag(d)**2', { 'd': d })
+
+        term_sum = terms.reshape(nparam, -1).sum(axis=1)
+
+        return (term_sum if self.use_weight_vector() is True
+            else term_sum / self.sigma_sqrd)
+
+    def compute_X2_batch(self, lm=None, stokes=None, alpha=None,
+            gauss_shape=None, sersic_shape=None):
+        """
+        Computes the chi-squared values of nparam sets of source
+        parameters against this solver's observation. This
+        solver's own arrays are used for any parameters that
+        are not supplied, and are not modified.
+
+        Arguments
+        ---------
+            lm : ndarray
+                (nparam, nsrc, 2) array of lm coordinates.
+            stokes : ndarray
+                (nparam, nsrc, ntime, 4) array of stokes parameters.
+            alpha : ndarray
+                (nparam, nsrc, ntime) array of spectral indices.
+            gauss_shape : ndarray
+                (nparam, 3, ngsrc) array of gaussian shape parameters.
+            sersic_shape : ndarray
+                (nparam, 3, nssrc) array of sersic shape parameters.
+
+        Returns a (nparam,) array of floating point scalars.
+        """
+        ntime, nbl, nchan = self.dim_local_size('ntime', 'nbl', 'nchan')
+
+        params = { name: np.asarray(value, dtype=getattr(self, name).dtype)
+            for name, value in (('lm', lm), ('stokes', stokes),
+                ('alpha', alpha), ('gauss_shape', gauss_shape),
+                ('sersic_shape', sersic_shape))
+            if value is not None }
+
+        if len(params) == 0:
+            raise ValueError('No parameter sets were supplied.')
+
+        nparams = set(a.shape[0] for a in params.itervalues())
+
+        if len(nparams) != 1:
+            raise ValueError("The leading 'nparam' dimension of the "
+                "supplied parameter arrays differ in size '{n}'".format(
+                    n=sorted(nparams)))
+
+        nparam = nparams.pop()
+        X2 = np.empty(shape=(nparam,), dtype=self.ft)
+
+        # Visibilities of a block of parameter sets are held at
+        # once, bounding memory usage independently of nparam
+        ekb_vis = np.empty(shape=(min(nparam, X2_BATCH_BLOCK_SIZE),
+            ntime, nbl, nchan, 4), dtype=self.ct)
+
+        # Result arrays aren't needed on the sub-solvers
+        ignore = ['B_sqrt', 'jones', 'model_vis', 'chi_sqrd_result']
+
+        for start in xrange(0, nparam, X2_BATCH_BLOCK_SIZE):
+            end = min(start + X2_BATCH_BLOCK_SIZE, nparam)
+
+            for p in xrange(start, end):
+                subslvr = self._sub_solver({}, ignore=ignore,
+                    supplied={ n: a[p] for n, a in params.iteritems() })
+                ekb_vis[p - start] = subslvr._compute_ekb_vis()
+
+            X2[start:end] = self.compute_chi_sqrd_batch(
+                ekb_vis[:end - start])
+
+        return X2
+
+    def _solve_vis_numba(self, parallel=True):
+        """
+        Computes the model visibilities and chi-squared terms
+        on this solver's arrays with the fused numba kernel.
+        If parallel is False, the kernel runs on the calling thread.
+
+        Returns the sum of the chi-squared terms.
+        """
+        from montblanc.impl.rime.v4.cpu.numba_rime import (
+            solve_rime, solve_rime_serial)
+
+        npsrc, ngsrc, ntime = self.dim_local_size('npsrc', 'ngsrc', 'ntime')
+        kernel = solve_rime if parallel else solve_rime_serial
+
+        # Empty placeholders stand in for the
+        # result arrays if they aren't stored
+        if self.outputs_visibilities():
+            model_vis, chi_sqrd_result = self.model_vis, self.chi_sqrd_result
+        else:
+            model_vis = np.empty((0, 0, 0, 0), dtype=self.ct)
+            chi_sqrd_result = np.empty((0, 0, 0), dtype=self.ft)
+
+        # Chi-squared sums of each timestep
+        chi_sqrd_sums = np.empty(ntime, dtype=self.ft)
+
+        # Correlations held in the visibility arrays
+        pols = np.array(self.polarisation_indices(), dtype=np.intp)
+
+        kernel(self.uvw, self.antenna1, self.antenna2,
+            self.frequency, self.ref_frequency,
+            self.parallactic_angles, self.point_errors,
+            self.antenna_scaling, self.E_beam, self.G_term,
+            self.lm, self.stokes, self.alpha,
+            self.gauss_shape, self.sersic_shape,
+            self.flag, self.weight_vector, self.observed_vis,
+            model_vis, chi_sqrd_result, chi_sqrd_sums, pols,
+            npsrc, ngsrc, montblanc.constants.C,
+            self.gauss_scale, self.two_pi_over_c,
+            self.beam_ll, self.beam_lm, self.beam_lfreq,
+            self.beam_ul, self.beam_um, self.beam_ufreq,
+            self.use_weight_vector(), self.outputs_residuals(),
+            self.outputs_visibilities())
+
+        return chi_sqrd_sums.sum()
+
+    def _solve_vis(self, parallel=True):
+        """
+        Computes the model visibilities and chi-squared terms
+        on this solver's arrays. parallel is False if the
+        caller is already parallelising over visibility tiles.
+
+        Returns the sum of the chi-squared terms.
+        """
+        if self._numba_solvable():
+            return self._solve_vis_numba(parallel)
+
+        ekb_vis = self._compute_ekb_vis()
+        self._set_ekb_vis(ekb_vis)
+
+        return self._solve_model_vis(ekb_vis)
+
+    def _numba_solvable(self):
+        """
+        Returns True if this solver's visibilities are solved
+        by the fused numba kernel, rather than numexpr.
+        """
+        return (self._cpu_backend == Options.CPU_BACKEND_NUMBA and
+            self._bda_tolerance is None and not self._sparse_flags and
+            self._beam_model == Options.BEAM_MODEL_CUBE and
+            self.beam_time_factor() == 1)
+
+    def _compute_ekb_vis(self):
+        """
+        Computes the visibilities summed over all sources,
+        before application of the G term.
+
+        Returns a (ntime,nbl,nchan,4) matrix of complex scalars.
+        """
+        if self._bda_tolerance is not None:
+            return self.compute_ekb_vis_bda()
+        elif self._source_streaming:
+            return self.compute_ekb_vis_by_source_batch()
+        elif ('jones' in self._ignored_arrays or
+                self.diagonal_correlations() is not None):
+            return self.sum_coherencies()
+        else:
+            self.jones[:] = self.compute_ekb_sqrt_jones_per_ant()
+            return self.sum_coherencies(self.jones)
+
+    def _set_ekb_vis(self, ekb_vis):
+        """
+        Retains the visibilities summed over all sources for
+        incremental updates, along with the versions of the
+        arrays from which they were computed.
+        """
+        self._ekb_vis = ekb_vis
+        self._ekb_vis_versions = self._array_versions.copy()
+
+    def _solve_model_vis(self, ekb_vis):
+        """
+        Computes the model visibilities and chi-squared terms
+        from the visibilities summed over all sources. Only their
+        sum is computed if the solver outputs no visibilities.
+
+        Returns the sum of the chi-squared terms.
+        """
+        if not self.outputs_visibilities():
+            return self.compute_chi_sqrd_sum_chunked(ekb_vis)
+
+        self.model_vis[:] = self.compute_gekb_vis(ekb_vis)
 
-        self.jones[:] = self.compute_ekb_sqrt_jones_per_ant()
-        
-        self.vis[:] = self.compute_gekb_vis()
-        
         self.chi_sqrd_result[:] = self.compute_chi_sqrd_sum_terms(
-            self.vis)
-        
-        self.set_X2(self.compute_chi_sqrd(self.chi_sqrd_result))
\ No newline at end of file
+            self.model_vis)
+
+        return ne.evaluate('sum(terms)', {'terms': self.chi_sqrd_result})
+
+    def compute_chi_sqrd_sum_chunked(self, ekb_vis, chunk_ntime=None):
+        """
+        Computes the sum of the chi squared terms from the
+        visibilities summed over all sources, applying the G term
+        to chunks of chunk_ntime timesteps and reducing each chunk
+        in turn, so that model visibilities are only held for a
+        single chunk. If chunk_ntime is None, chunks hold at most
+        X2_SUM_CHUNK_BYTES of model visibilities.
+
+        Returns a floating point scalar.
+        """
+        ntime = self.dim_local_size('ntime')
+
+        if chunk_ntime is None:
+            chunk_ntime = max(1,
+                ntime*X2_SUM_CHUNK_BYTES // max(ekb_vis.nbytes, 1))
+
+        if chunk_ntime >= ntime:
+            return self.compute_chi_sqrd_sum(self.compute_gekb_vis(ekb_vis))
+
+        X2_sum = 0.0
+
+        for cpu_slice in self._gen_vis_slices({ Options.NTIME: chunk_ntime }):
+            subslvr = self._sub_solver(cpu_slice, ignore=RESULT_ARRAYS)
+            X2_sum += subslvr.compute_chi_sqrd_sum(subslvr.compute_gekb_vis(
+                ekb_vis[cpu_slice[Options.NTIME]]))
+
+        return X2_sum
+
+    def _gen_source_index_slices(self, indices):
+        """
+        Iterate over runs of consecutive source indices, returning
+        a dictionary of slices keyed on the following dimensions:
+            nsrc, npsrc, ngsrc, nssrc, ...
+        """
+        indices = np.unique(indices)
+
+        if indices.size == 0:
+            return
+
+        # Split where successive indices are not consecutive
+        splits = np.flatnonzero(np.diff(indices) != 1) + 1
+
+        for run in np.split(indices, splits):
+            yield self._source_slice(run[0], run[-1] + 1)
+
+    def compute_ekb_vis_of_sources(self, indices):
+        """
+        Computes the contribution of the sources at
+        the supplied indices to the complex visibilities.
+
+        Returns a (ntime,nbl,nchan,4) matrix of complex scalars.
+        """
+        ntime, nbl, nchan = self.dim_local_size('ntime', 'nbl', 'nchan')
+
+        vis = np.zeros(shape=(ntime, nbl, nchan, 4), dtype=self.ct)
+
+        # Result arrays aren't needed on the sub-solvers
+        ignore = ['B_sqrt', 'jones', 'model_vis', 'chi_sqrd_result']
+
+        for cpu_slice in self._gen_source_index_slices(indices):
+            subslvr = self._sub_solver(cpu_slice, ignore=ignore)
+            vis += subslvr.sum_coherencies()
+
+        return vis
+
+    def update_sources(self, indices, lm=None, stokes=None,
+            alpha=None, shape=None):
+        """
+        Updates the parameters of the sources at the supplied
+        indices, then updates the model visibilities, chi-squared
+        terms and X2 by subtracting the previous contribution
+        of these sources and adding their new contribution.
+        The cost of this is proportional to the number of
+        updated sources, rather than the total number of sources.
+
+        The visibilities summed over all sources are retained
+        from the last solve() or update_sources() call. They are
+        recomputed in full if any array has since been marked
+        dirty. A fixed set of sources can therefore be evaluated
+        once, with a small set of active sources varied thereafter.
+        Call solve() periodically to discard accumulated
+        rounding errors. Sources can't be updated with
+        baseline-dependent averaging.
+
+        Arguments
+        ---------
+            indices : list or ndarray
+                Unique indices of the sources to update.
+            lm : ndarray
+                (len(indices), 2) array of new lm coordinates.
+            stokes : ndarray
+                (len(indices), ntime, 4) array of new stokes parameters.
+            alpha : ndarray
+                (len(indices), ntime) array of new spectral indices.
+            shape : ndarray
+                (3, len(indices)) array of new gaussian or sersic
+                shape parameters. Columns of point sources are ignored.
+        """
+        npsrc, ngsrc = self.dim_local_size('npsrc', 'ngsrc')
+        indices = np.asarray(indices, dtype=np.intp)
+
+        # The averaged visibilities of the sources can't be
+        # separated from those of the other sources
+        if self._bda_tolerance is not None:
+            raise ValueError('Sources cannot be updated with '
+                'baseline-dependent averaging.')
+
+        if np.unique(indices).size != indices.size:
+            raise ValueError('Source indices must be unique.')
+
+        # (Re)compute the visibilities summed over all sources
+        # if any array has been modified since they were computed
+        if (self._ekb_vis is None or
+                self._ekb_vis_versions != self._array_versions):
+            self._set_ekb_vis(self._compute_ekb_vis())
+
+        ekb_vis = self._ekb_vis
+
+        # Subtract the previous contribution of the sources
+        ekb_vis -= self.compute_ekb_vis_of_sources(indices)
+
+        # Write the new source parameters
+        modified = []
+
+        for name, value in (('lm', lm), ('stokes', stokes),
+                ('alpha', alpha)):
+            if value is not None:
+                getattr(self, name)[indices] = value
+                modified.append(name)
+
+        if shape is not None:
+            shape = np.asarray(shape)
+            gauss = np.logical_and(indices >= npsrc,
+                indices < npsrc + ngsrc)
+            sersic = indices >= npsrc + ngsrc
+
+            self.gauss_shape[:,indices[gauss] - npsrc] = shape[:,gauss]
+            self.sersic_shape[:,indices[sersic] - npsrc - ngsrc] = (
+                shape[:,sersic])
+            modified.extend(['gauss_shape', 'sersic_shape'])
+
+        self.mark_dirty(*modified)
+
+        # Add the new contribution of the sources
+        ekb_vis += self.compute_ekb_vis_of_sources(indices)
+        self._set_ekb_vis(ekb_vis)
+
+        self._set_X2_sum(self._solve_model_vis(ekb_vis))
+
+    def _solve_vis_tile(self, cpu_slice):
+        """
+        Solves the visibility tile described by cpu_slice.
+        The sub-solver's model_vis and chi_sqrd_result arrays
+        are views of this solver's arrays, so results are written
+        directly into the (disjoint) tile of each array.
+
+        Returns the sum of the tile's chi-squared terms.
+        """
+        subslvr = self._sub_solver(cpu_slice)
+        return subslvr._solve_vis(parallel=False)
+
+    def _solve_vis_tiles(self, X2_sum_bound=None):
+        """
+        Solves tiles of the visibility space. Tiles solved by the
+        numba kernel, which releases the GIL, are solved concurrently
+        on a pool of threads. numexpr serialises evaluations behind a
+        global lock, so tiles solved with numexpr are solved in turn,
+        each parallelised over numexpr's own threads.
+
+        If X2_sum_bound is supplied, tiles that have not yet
+        started are abandoned once the partial sum of
+        the chi-squared terms exceeds it.
+
+        Returns a (X2_sum, cut_short) tuple containing the sum of
+        the chi-squared terms and whether any tiles were abandoned.
+        """
+        tiles = list(self._gen_vis_slices(self._vis_tile_shape))
+
+        if not self._numba_solvable():
+            return self._solve_vis_tiles_in_turn(tiles, X2_sum_bound)
+
+        X2_sum = self.ft(0.0)
+        nsummed = 0
+
+        self._derive_terms()
+
+        with cf.ThreadPoolExecutor(self._cpu_threads) as ex:
+            futures = [ex.submit(self._solve_vis_tile, cpu_slice)
+                for cpu_slice in tiles]
+
+            for f in cf.as_completed(futures):
+                X2_sum += f.result()
+                nsummed += 1
+
+                if X2_sum_bound is not None and X2_sum > X2_sum_bound:
+                    break
+
+            cut_short = nsummed < len(futures)
+
+            # Abandon tiles that have not yet started. Running
+            # tiles complete before the executor shuts down.
+            if cut_short:
+                for f in futures:
+                    f.cancel()
+
+        return X2_sum, cut_short
+
+    def _solve_vis_tiles_in_turn(self, tiles, X2_sum_bound=None):
+        """
+        Solves the visibility tiles described by the cpu slices in
+        tiles in turn, stopping once the partial sum of the
+        chi-squared terms exceeds X2_sum_bound, if supplied.
+
+        Returns a (X2_sum, cut_short) tuple containing the sum of
+        the chi-squared terms and whether any tiles were not solved.
+        """
+        X2_sum = self.ft(0.0)
+
+        for i, cpu_slice in enumerate(tiles):
+            X2_sum += self._sub_solver(cpu_slice)._solve_vis()
+
+            if X2_sum_bound is not None and X2_sum > X2_sum_bound:
+                return X2_sum, i + 1 < len(tiles)
+
+        return X2_sum, False
+
+    def _solve_vis_chunks(self, X2_sum_bound):
+        """
+        Solves chunks of timesteps in turn, stopping once
+        the partial sum of the chi-squared terms exceeds
+        X2_sum_bound.
+
+        Returns a (X2_sum, cut_short) tuple containing the sum of the
+        chi-squared terms and whether any chunks were not solved.
+        """
+        ntime = self.dim_local_size('ntime')
+        chunk_shape = { Options.NTIME: max(1,
+            (ntime + X2_BOUND_TIME_CHUNKS - 1) // X2_BOUND_TIME_CHUNKS) }
+
+        X2_sum = self.ft(0.0)
+
+        for cpu_slice in self._gen_vis_slices(chunk_shape):
+            X2_sum += self._sub_solver(cpu_slice)._solve_vis()
+
+            if X2_sum > X2_sum_bound:
+                return X2_sum, cpu_slice[Options.NTIME].stop < ntime
+
+        return X2_sum, False
+
+    def solve(self, x2_bound=None):
+        """
+        Solve the RIME
+
+        If x2_bound is supplied, chunks of the visibility space
+        are solved in turn, and solving stops as soon as the
+        partial chi-squared value exceeds x2_bound. The partial
+        value only grows as chunks are added, so comparing X2
+        against the bound remains exact for accept/reject
+        decisions. If the evaluation is cut short, X2 holds the
+        partial value and the model visibilities and chi-squared
+        terms of the unsolved chunks are not updated.
+
+        Returns True if the evaluation was cut short.
+        """
+
+        # Visibilities summed over all sources are only
+        # retained by a solve of the whole visibility space
+        self._ekb_vis = None
+        cut_short = False
+
+        if x2_bound is None:
+            X2_sum_bound = None
+        elif self.use_weight_vector():
+            X2_sum_bound = x2_bound
+        else:
+            X2_sum_bound = x2_bound*self.sigma_sqrd
+
+        if self._vis_tile_shape is not None:
+            X2_sum, cut_short = self._solve_vis_tiles(X2_sum_bound)
+        elif X2_sum_bound is not None:
+            X2_sum, cut_short = self._solve_vis_chunks(X2_sum_bound)
+        else:
+            X2_sum = self._solve_vis()
+
+        self._set_X2_sum(X2_sum)
+
+        return cut_short
+
+    def estimate_X2(self, sample_fraction, seed=None, tile_shape=None):
+        """
+        Computes an unbiased stochastic estimate of the chi-squared
+        value from a random subset of tiles of the visibility space,
+        sampled uniformly without replacement. Only the sampled tiles
+        are solved, so the cost scales with the sample size.
+
+        The sum of the chi-squared terms of the sampled tiles is scaled
+        by the ratio of the total and sampled number of tiles. The
+        variance of the estimate is estimated from the spread of the
+        tile sums, with the finite population correction. The estimate
+        is also assigned to X2. Model visibilities and chi-squared
+        terms are only updated within the sampled tiles.
+
+        Arguments
+        ---------
+            sample_fraction : float
+                Fraction of the tiles to sample, in (0, 1].
+            seed : int or None
+                Seed of the random number generator sampling the tiles.
+            tile_shape : dict or None
+                Shape of the sampled tiles, keyed on the ntime, nbl
+                and nchan dimensions. Missing dimensions are not tiled.
+                Defaults to the visibility tile shape of this solver,
+                or to single timesteps if this is not configured.
+
+        Returns a (X2, variance) tuple of floating point scalars.
+        """
+        if not 0 < sample_fraction <= 1:
+            raise ValueError("sample_fraction '{f}' is not "
+                "in (0, 1].".format(f=sample_fraction))
+
+        if tile_shape is None:
+            tile_shape = self._vis_tile_shape
+
+        if tile_shape is None:
+            tile_shape = { Options.NTIME: 1 }
+
+        tiles = list(self._gen_vis_slices(tile_shape))
+        ntiles = len(tiles)
+        nsample = max(1, int(np.ceil(sample_fraction*ntiles)))
+
+        rs = np.random.RandomState(seed)
+        sample = np.sort(rs.choice(ntiles, nsample, replace=False))
+
+        # Visibilities summed over all sources are only
+        # retained by a solve of the whole visibility space
+        self._ekb_vis = None
+
+        tile_sums = np.array([self._sub_solver(tiles[i])._solve_vis()
+            for i in sample], dtype=np.float64)
+
+        X2_sum = ntiles*tile_sums.mean()
+
+        if nsample > 1:
+            X2_sum_var = (ntiles**2*(1.0 - float(nsample)/ntiles)*
+                tile_sums.var(ddof=1)/nsample)
+        else:
+            X2_sum_var = 0.0 if nsample == ntiles else np.inf
+
+        self._set_X2_sum(self.ft(X2_sum))
+
+        # Scale the variance as _set_X2_sum scales X2
+        if not self.use_weight_vector():
+            X2_sum_var /= self.sigma_sqrd**2
+
+        return self.X2, X2_sum_var
+
+    def _average_visibility_data(self, time_factor, chan_factor):
+        """
+        Averages the observed visibilities over blocks of timesteps
+        and channels, weighted by the weight vector (if used)
+        and excluding flagged visibilities. The weights of
+        each block are summed, and blocks without unflagged
+        visibilities are flagged.
+
+        Returns a dictionary of averaged observed_vis,
+        weight_vector and flag arrays.
+        """
+        weight = (self.weight_vector if self.use_weight_vector()
+            else np.ones_like(self.weight_vector))
+        weight = np.where(self.flag > 0, 0, weight).astype(self.ft)
+        weighted_vis = weight*self.observed_vis
+
+        for axis, factor in ((0, time_factor), (2, chan_factor)):
+            weight = block_sum(weight, axis, factor)
+            weighted_vis = block_sum(weighted_vis, axis, factor)
+
+        flag = weight == 0
+        vis = weighted_vis/np.where(flag, 1, weight)
+
+        return {
+            'observed_vis': vis.astype(self.ct),
+            'weight_vector': weight,
+            'flag': flag.astype(np.uint8) }
+
+    def _average_array(self, name, time_factor, chan_factor, ary=None):
+        """
+        Averages the named array, or ary in its place, over blocks
+        of timesteps and channels. The first element of each
+        block of integer arrays is taken, and angles are
+        averaged on the unit circle.
+        """
+        if ary is None:
+            ary = getattr(self, name)
+
+        schema = self.arrays()[name]['shape']
+
+        if name in ANGLE_ARRAYS:
+            reduce_block = block_angle_mean
+        elif ary.dtype.kind in 'iu':
+            reduce_block = block_first
+        else:
+            reduce_block = block_mean
+
+        for dim, factor in ((Options.NTIME, time_factor),
+                (Options.NCHAN, chan_factor)):
+            if dim in schema:
+                ary = reduce_block(ary, schema.index(dim), factor)
+
+        return ary
+
+    def resolution_level(self, time_factor, chan_factor):
+        """
+        Returns a solver over this solver's problem, with the
+        observed visibilities, weights, flags, uvw coordinates
+        and other time and channel dependent arrays averaged
+        over blocks of time_factor timesteps and chan_factor
+        channels.
+
+        The solver is built on the first call and cached. Arrays
+        are averaged again on later calls if their version has
+        changed (see mark_dirty), while source parameters and
+        properties are always transferred, since they are
+        typically modified in place between solves.
+        The solver only produces a chi-squared value.
+        """
+        from montblanc.src_types import SOURCE_VAR_TYPES
+
+        key = (time_factor, chan_factor)
+        ntime, nchan = self.dim_local_size('ntime', 'nchan')
+        src_dims = set(['nsrc'] + SOURCE_VAR_TYPES.values())
+
+        names = [n for n in self.arrays().iterkeys()
+            if n not in RESULT_ARRAYS and n not in self._ignored_arrays]
+
+        if key in self._resolution_levels:
+            level_slvr, versions = self._resolution_levels[key]
+            stale = [n for n in names if versions[n] != self._array_versions[n]
+                or src_dims.intersection(self.arrays()[n]['shape'])]
+        else:
+            level_slvr, stale = None, names
+
+        averaged = {}
+
+        if VISIBILITY_DATA_ARRAYS.intersection(stale):
+            averaged.update(self._average_visibility_data(*key))
+
+        averaged.update({ n: self._average_array(n, *key)
+            for n in stale if n not in VISIBILITY_DATA_ARRAYS })
+
+        if level_slvr is None:
+            level_cfg = self._slvr_cfg.copy()
+            level_cfg[Options.NTIME] = averaged_size(ntime, time_factor)
+            level_cfg[Options.NCHAN] = averaged_size(nchan, chan_factor)
+            level_cfg[Options.DATA_SOURCE] = Options.DATA_SOURCE_EMPTY
+            level_cfg[Options.WEIGHT_VECTOR] = True
+            level_cfg[Options.VISIBILITY_OUTPUT] = Options.VISIBILITY_OUTPUT_NONE
+            level_cfg[Options.TERM_CACHE_SIZE] = 0
+            level_cfg['array_cfg'] = {
+                'ignore': list(self._ignored_arrays),
+                'supplied': averaged }
+
+            level_slvr = CPUSolver(level_cfg)
+        else:
+            for name, ary in averaged.iteritems():
+                getattr(level_slvr, name)[:] = ary
+
+            level_slvr.mark_dirty(*averaged.keys())
+
+        for p in self.properties().itervalues():
+            setattr(level_slvr, p.name, getattr(self, p.name))
+
+        self._resolution_levels[key] = (level_slvr,
+            self._array_versions.copy())
+
+        return level_slvr
+
+    def build_resolution_levels(self, levels):
+        """
+        Builds and caches solvers over averaged data for each of the
+        (time_factor, chan_factor) averaging factors in levels.
+        """
+        for time_factor, chan_factor in levels:
+            self.resolution_level(time_factor, chan_factor)
+
+    def compute_X2_at_level(self, time_factor, chan_factor):
+        """
+        Computes the chi-squared value on data averaged over blocks
+        of time_factor timesteps and chan_factor channels. The cost
+        is reduced by roughly the product of the factors.
+
+        The model is predicted at the averaged uvw coordinates and
+        frequencies, and compared against the averaged visibilities,
+        weighted by the summed weights of each block. This
+        approximates the full resolution chi-squared value, less
+        the scatter of the data within each block, as long as the
+        model does not decorrelate significantly within a block.
+
+        Returns a floating point scalar.
+        """
+        level_slvr = self.resolution_level(time_factor, chan_factor)
+        level_slvr.solve()
+
+        return (level_slvr.X2 if self.use_weight_vector()
+            else level_slvr.X2/self.sigma_sqrd)
+
+    def bda_factors(self):
+        """
+        Computes the time and channel averaging factors of each
+        baseline for baseline-dependent averaging.
+
+        The phase of a source's contribution to a visibility changes
+        by at most 2*pi*f/C*|(l, m, n-1)|*|d(uvw)| between samples.
+        Factors are chosen so that the phase changes by at most
+        sqrt(4*tol/3) over a block, in both time and frequency.
+        The error of linear interpolation of a unit phasor between
+        (and extrapolation beyond) block centres is then at most
+        tol/2 in each dimension, giving a total relative error in
+        each source's contribution of at most tol. Amplitude
+        terms, such as the beam, are assumed to vary slowly
+        over a block.
+
+        Returns a (time_factors, chan_factors) tuple of (nbl,) arrays.
+        """
+        ntime, nbl, nchan = self.dim_local_size('ntime', 'nbl', 'nchan')
+        max_phase = np.sqrt(4.0*self._bda_tolerance/3.0)
+        two_pi_over_c = 2*np.pi/montblanc.constants.C
+
+        # Largest offset of any source from the phase centre
+        l, m = self.lm[:,0], self.lm[:,1]
+        n = np.sqrt(1.0 - l**2 - m**2) - 1.0
+        r_max = np.sqrt(l**2 + m**2 + n**2).max() if l.size > 0 else 0.0
+
+        # uvw coordinates of each baseline
+        t = np.arange(ntime)[:,np.newaxis]
+        bl_uvw = self.uvw[t,self.antenna2] - self.uvw[t,self.antenna1]
+        assert bl_uvw.shape == (ntime, nbl, 3)
+
+        # Largest change in the uvw coordinates of each
+        # baseline between timesteps, and largest uvw length
+        duvw = (np.linalg.norm(np.diff(bl_uvw, axis=0), axis=2).max(axis=0)
+            if ntime > 1 else np.zeros(nbl))
+        uvw_length = np.linalg.norm(bl_uvw, axis=2).max(axis=0)
+        dfreq = (np.abs(np.diff(self.frequency)).max()
+            if nchan > 1 else 0.0)
+
+        time_factors = _bda_factor(two_pi_over_c*self.frequency.max()*
+            r_max*duvw, ntime, max_phase)
+        chan_factors = _bda_factor(two_pi_over_c*dfreq*
+            r_max*uvw_length, nchan, max_phase)
+
+        return time_factors, chan_factors
+
+    def _bda_sub_solver(self, bl, time_factor, chan_factor):
+        """
+        Returns a CPUSolver over the baselines with indices bl, and
+        the antennas of these baselines, with arrays averaged over
+        blocks of time_factor timesteps and chan_factor channels.
+        The sub-solver only holds the arrays needed to compute
+        visibilities before application of the G term.
+        """
+        ntime, nchan = self.dim_local_size('ntime', 'nchan')
+
+        ignore = (set(self._ignored_arrays) | RESULT_ARRAYS |
+            VISIBILITY_DATA_ARRAYS | set(['G_term']))
+        supplied = {}
+
+        # Antennas of the baselines, and antenna
+        # indices of the baselines in the sub-solver
+        ant_pairs = { n: getattr(self, n)[:,bl]
+            for n in ('antenna1', 'antenna2') }
+        ants = np.unique(np.concatenate(ant_pairs.values(), axis=None))
+
+        for name, ary in self.arrays().iteritems():
+            if name in ignore:
+                continue
+
+            schema = ary['shape']
+
+            if name in ant_pairs:
+                ary = np.searchsorted(ants, ant_pairs[name]).astype(
+                    ant_pairs[name].dtype)
+            else:
+                ary = getattr(self, name)
+
+            if Options.NA in schema:
+                ary = np.take(ary, ants, axis=schema.index(Options.NA))
+
+            supplied[name] = self._average_array(name,
+                time_factor, chan_factor, ary=ary)
+
+        sub_cfg = self._slvr_cfg.copy()
+        sub_cfg[Options.NTIME] = averaged_size(ntime, time_factor)
+        sub_cfg[Options.NA] = len(ants)
+        sub_cfg[Options.NBL] = len(bl)
+        sub_cfg[Options.NCHAN] = averaged_size(nchan, chan_factor)
+        sub_cfg[Options.DATA_SOURCE] = Options.DATA_SOURCE_EMPTY
+        sub_cfg[Options.VISIBILITY_TILE_SHAPE] = None
+        sub_cfg[Options.TERM_CACHE_SIZE] = 0
+        sub_cfg[Options.BDA_TOLERANCE] = None
+        sub_cfg['array_cfg'] = { 'ignore': list(ignore), 'supplied': supplied }
+
+        subslvr = CPUSolver(sub_cfg)
+        self._share_term_cache(subslvr, {},
+            ('bda', tuple(bl), tuple(ants), time_factor, chan_factor),
+            frozenset(supplied))
+
+        # Arrays averaged from this solver's arrays
+        # preserve the terms derived from them
+        self._share_derived_terms(subslvr, {})
+
+        for p in self.properties().itervalues():
+            setattr(subslvr, p.name, getattr(self, p.name))
+
+        return subslvr
+
+    def compute_ekb_vis_bda(self):
+        """
+        Computes the visibilities summed over all sources, before
+        application of the G term, with baseline-dependent averaging.
+        Baselines are grouped by their averaging factors (see
+        bda_factors), and each group is evaluated on blocks of
+        timesteps and channels, then linearly interpolated
+        back onto the full resolution grid.
+
+        Returns a (ntime,nbl,nchan,4) matrix of complex scalars.
+        """
+        ntime, nbl, nchan = self.dim_local_size('ntime', 'nbl', 'nchan')
+
+        time_factors, chan_factors = self.bda_factors()
+        ekb_vis = np.empty(shape=(ntime, nbl, nchan, 4), dtype=self.ct)
+
+        for time_factor, chan_factor in set(zip(time_factors, chan_factors)):
+            bl = np.flatnonzero(np.logical_and(time_factors == time_factor,
+                chan_factors == chan_factor))
+
+            subslvr = self._bda_sub_solver(bl, time_factor, chan_factor)
+            vis = block_interpolate(subslvr._compute_ekb_vis(),
+                0, time_factor, ntime)
+            ekb_vis[:,bl] = block_interpolate(vis, 2, chan_factor, nchan)
+
+        return ekb_vis
+
+    def _set_X2_sum(self, X2_sum):
+        """ Sets X2 from the sum of the chi-squared terms """
+        # Set the chi-squared value possibly
+        # taking the weight vector into account
+        if self.use_weight_vector():
+            self.set_X2(X2_sum)
+        else:
+            self.set_X2(X2_sum/self.sigma_sqrd)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015 Simon Perkins
+#
+# This file is part of montblanc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+import ctypes
+import itertools
+import multiprocessing
+
+import numexpr as ne
+import numpy as np
+
+import montblanc
+
+from montblanc.config import RimeSolverConfig as Options
+from montblanc.impl.rime.v4.cpu.CPUSolver import CPUSolver
+
+# Solver inherited by worker processes when they are forked
+_worker_slvr = None
+
+def _worker_init():
+    """ Initialise a worker process """
+    # Parallelism is obtained over processes
+    ne.set_num_threads(1)
+
+def _worker_solve_vis_tile(args):
+    """
+    Solve a visibility tile on the solver inherited by
+    this worker process, after updating its properties
+    and array versions
+    """
+    cpu_slice, props, versions = args
+
+    for name, value in props.iteritems():
+        setattr(_worker_slvr, name, value)
+
+    # Terms cached on array versions are invalidated by arrays
+    # marked dirty on the parent since the worker was forked
+    _worker_slvr._array_versions = versions
+
+    return _worker_slvr._solve_vis_tile(cpu_slice)
+
+class MultiprocessCPUSolver(CPUSolver):
+    """
+    CPU solver that solves tiles of the visibility space on a
+    pool of worker processes, sidestepping the GIL and
+    numexpr's global thread pool.
+
+    The solver's arrays are allocated in shared memory before the
+    workers are forked, so workers read inputs and write the
+    model visibilities and chi-squared terms of their tile
+    without any array pickling. Only the tile slices, the
+    solver properties and the array versions are sent to the
+    workers, which keep their cached terms in step with
+    the arrays modified by the parent. Arrays supplied
+    through the solver configuration are not placed in shared
+    memory and should not be modified after initialise().
+    """
+    def __init__(self, slvr_cfg):
+        slvr_cfg = slvr_cfg.copy()
+
+        nprocs = slvr_cfg.get(Options.CPU_PROCESSES)
+
+        if nprocs is None:
+            nprocs = multiprocessing.cpu_count()
+
+        # Divide timesteps evenly between the processes
+        # if no visibility tiling is specified
+        if slvr_cfg.get(Options.VISIBILITY_TILE_SHAPE) is None:
+            ntime = slvr_cfg[Options.NTIME]
+            slvr_cfg[Options.VISIBILITY_TILE_SHAPE] = {
+                Options.NTIME: max(1, (ntime + nprocs - 1) // nprocs) }
+
+        super(MultiprocessCPUSolver, self).__init__(slvr_cfg)
+
+        self._cpu_processes = nprocs
+        self._pool = None
+
+    def array_factory(self, shape, dtype):
+        """ Creates arrays in shared memory """
+        dtype = np.dtype(dtype)
+        count = int(np.product(shape))
+        shared_buffer = multiprocessing.RawArray(ctypes.c_char,
+            max(count*dtype.itemsize, 1))
+
+        return np.frombuffer(shared_buffer, dtype=dtype,
+            count=count).reshape(shape)
+
+    def initialise(self):
+        """ Fork the worker processes """
+        global _worker_slvr
+
+        if self._pool is not None:
+            return
+
+        montblanc.log.info('Creating {n} worker process(es).'.format(
+            n=self._cpu_processes))
+
+        _worker_slvr = self
+
+        try:
+            self._pool = multiprocessing.Pool(self._cpu_processes,
+                initializer=_worker_init)
+        finally:
+            _worker_slvr = None
+
+    def shutdown(self):
+        """ Stop the worker processes """
+        if self._pool is None:
+            return
+
+        self._pool.close()
+        self._pool.join()
+        self._pool = None
+
+    def _solve_vis_tiles(self, X2_sum_bound=None):
+        """
+        Solves tiles of the visibility space on the worker processes.
+        If X2_sum_bound is supplied, tiles are solved in waves of
+        one tile per process, stopping after the wave in which
+        the partial sum of the chi-squared terms exceeds it.
+
+        Returns a (X2_sum, cut_short) tuple containing the sum of
+        the chi-squared terms and whether any tiles were not solved.
+        """
+        if self._pool is None:
+            self.initialise()
+
+        # Properties and array versions are not held in
+        # shared memory, send them along with each tile
+        props = { p.name: getattr(self, p.name)
+            for p in self.properties().itervalues() }
+        versions = self._array_versions.copy()
+
+        tiles = ((cpu_slice, props, versions)
+            for cpu_slice in self._gen_vis_slices(self._vis_tile_shape))
+
+        X2_sum = self.ft(0.0)
+
+        if X2_sum_bound is None:
+            for X2 in self._pool.imap_unordered(
+                    _worker_solve_vis_tile, tiles):
+                X2_sum += X2
+
+            return X2_sum, False
+
+        # Workers write into shared memory, so every submitted
+        # tile must complete before returning
+        while True:
+            wave = list(itertools.islice(tiles, self._cpu_processes))
+
+            if len(wave) == 0:
+                return X2_sum, False
+
+            X2_sum += sum(self._pool.map(_worker_solve_vis_tile, wave))
+
+            if X2_sum > X2_sum_bound:
+                return X2_sum, next(tiles, None) is not None
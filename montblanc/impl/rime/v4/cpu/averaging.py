@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015 Simon Perkins
+#
+# This file is part of montblanc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""
+Block averaging of solver arrays along their dimensions.
+Blocks of factor consecutive elements are reduced to a single
+element. The last block is shorter if factor does not divide
+the size of the dimension. Reduced arrays are interpolated
+back onto the full dimension.
+"""
+
+import numpy as np
+
+def averaged_size(size, factor):
+    """ Size of a dimension of the given size after averaging """
+    return (size + factor - 1) // factor
+
+def block_starts(size, factor):
+    """ Start indices of the blocks of a dimension """
+    return np.arange(0, size, factor)
+
+def block_counts(size, factor):
+    """ Number of elements in each block of a dimension """
+    return np.diff(np.append(block_starts(size, factor), size))
+
+def block_sum(ary, axis, factor):
+    """ Sums blocks of ary along axis """
+    if factor == 1:
+        return ary
+
+    return np.add.reduceat(ary, block_starts(ary.shape[axis], factor),
+        axis=axis)
+
+def block_mean(ary, axis, factor):
+    """ Averages blocks of ary along axis """
+    if factor == 1:
+        return ary
+
+    shape = [1]*ary.ndim
+    shape[axis] = -1
+    counts = block_counts(ary.shape[axis], factor).reshape(shape)
+
+    return (block_sum(ary, axis, factor)/counts).astype(ary.dtype)
+
+def block_angle_mean(ary, axis, factor):
+    """
+    Averages blocks of the angles in ary along axis on the unit
+    circle, so that blocks straddling the wrap at +-pi average
+    to an angle near the wrap, rather than near zero.
+    """
+    if factor == 1:
+        return ary
+
+    return np.angle(block_sum(np.exp(1j*ary), axis, factor)).astype(ary.dtype)
+
+def block_first(ary, axis, factor):
+    """ Takes the first element of blocks of ary along axis """
+    if factor == 1:
+        return ary
+
+    return np.take(ary, block_starts(ary.shape[axis], factor), axis=axis)
+
+def block_interpolate(ary, axis, factor, size):
+    """
+    Expands blocks of ary along axis back onto a dimension of the
+    given size, interpolating linearly between the centres of
+    the blocks and extrapolating linearly beyond the first
+    and last centres. A single block is repeated.
+    """
+    if factor == 1:
+        return ary
+
+    nblocks = ary.shape[axis]
+
+    if nblocks == 1:
+        return np.repeat(ary, size, axis=axis)
+
+    centres = (block_starts(size, factor) +
+        (block_counts(size, factor) - 1)/2.0)
+    x = np.arange(size)
+
+    lower = np.clip(np.searchsorted(centres, x) - 1, 0, nblocks - 2)
+    w = (x - centres[lower])/(centres[lower + 1] - centres[lower])
+
+    shape = [1]*ary.ndim
+    shape[axis] = -1
+    w = w.reshape(shape)
+
+    return ((1 - w)*np.take(ary, lower, axis=axis) +
+        w*np.take(ary, lower + 1, axis=axis)).astype(ary.dtype)
+
+def sample_interpolate(ary, axis, samples, size):
+    """
+    Expands ary, holding values at the increasing indices samples
+    along axis, onto a dimension of the given size, interpolating
+    linearly between samples. samples should include the first
+    and last indices of the dimension.
+    """
+    if len(samples) == size:
+        return ary
+
+    x = np.arange(size)
+    lower = np.clip(np.searchsorted(samples, x, side='right') - 1,
+        0, len(samples) - 2)
+    w = ((x - samples[lower]) /
+        (samples[lower + 1] - samples[lower]).astype(np.float64))
+
+    shape = [1]*ary.ndim
+    shape[axis] = -1
+    w = w.reshape(shape)
+
+    return ((1 - w)*np.take(ary, lower, axis=axis) +
+        w*np.take(ary, lower + 1, axis=axis)).astype(ary.dtype)
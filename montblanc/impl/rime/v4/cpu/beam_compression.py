@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015 Simon Perkins
+#
+# This file is part of montblanc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Compressed storage of the beam cube. The complex values and
+amplitudes of a (beam_lw, beam_mh, beam_nud, npol) cube are
+held either as reduced precision real and imaginary planes,
+or as a low-rank decomposition over the frequency dimension.
+
+Each representation loads the values at the flat corner
+offsets produced by CPUSolver.beam_corners, upcasting them
+to the precision of the original cube.
+"""
+
+import numpy as np
+
+from montblanc.config import RimeSolverConfig as Options
+
+def corr_offsets(offsets, npol, corrs):
+    """
+    Returns the offsets of the correlations with indices corrs
+    of the corners at the flat corner offsets, within the
+    cube flattened over the correlations as well, so that
+    the correlations are loaded without copying the cube.
+
+    Returns an offsets.shape + (len(corrs),) array.
+    """
+    return (offsets[...,np.newaxis]*npol
+        + np.asarray(corrs, dtype=offsets.dtype))
+
+class CastBeam(object):
+    """
+    Stores the real and imaginary planes, and the
+    amplitudes, of the beam cube in a reduced precision
+    floating point dtype.
+    """
+    def __init__(self, E_beam, E_beam_abs, dtype):
+        self._ct, self._ft = E_beam.dtype, E_beam_abs.dtype
+        npol = E_beam.shape[3]
+
+        E_flat = E_beam.reshape(-1, npol)
+        self._planes = np.stack([E_flat.real, E_flat.imag],
+            axis=-1).astype(dtype)
+        self._abs = E_beam_abs.reshape(-1, npol).astype(dtype)
+
+    @property
+    def nbytes(self):
+        """ Number of bytes held by the compressed cube """
+        return self._planes.nbytes + self._abs.nbytes
+
+    def gather(self, offsets, corrs=None):
+        """
+        Loads the complex values and amplitudes of the beam cube
+        at the flat corner offsets, for the correlations with
+        indices corrs, or all correlations if corrs is None.
+
+        Returns a tuple of offsets.shape + (ncorr,) complex
+        values and amplitudes.
+        """
+        planes, amplitudes = self._planes, self._abs
+
+        if corrs is not None:
+            offsets = corr_offsets(offsets, planes.shape[1], corrs)
+            planes = planes.reshape(-1, 2)
+            amplitudes = amplitudes.ravel()
+
+        corners = np.take(planes, offsets, axis=0).astype(self._ft)
+        values = np.empty(shape=corners.shape[:-1], dtype=self._ct)
+        values.real, values.imag = corners[...,0], corners[...,1]
+
+        return values, np.take(amplitudes, offsets, axis=0).astype(self._ft)
+
+class LowRankBeam(object):
+    """
+    Stores the complex values and amplitudes of the beam cube
+    as truncated singular value decompositions of the
+    (beam_nud, beam_lw*beam_mh*npol) matrices formed by
+    the frequency planes of the cube. The planes needed
+    by each gather are reconstructed, at a cost
+    proportional to the rank. The spatial factors are held
+    by correlation, so that the planes of each correlation
+    are reconstructed from a contiguous block.
+    """
+    def __init__(self, E_beam, E_beam_abs, rank):
+        beam_lw, beam_mh, beam_nud, npol = E_beam.shape
+        self._beam_nud = beam_nud
+
+        def _factorise(cube):
+            M = cube.transpose(2, 0, 1, 3).reshape(beam_nud, -1)
+            u, s, vh = np.linalg.svd(M, full_matrices=False)
+            r = min(rank, len(s))
+
+            # Singular values are folded into the frequency weights.
+            # Spatial factors are (npol, beam_lw*beam_mh, r).
+            return ((u[:,:r]*s[:r]).astype(cube.dtype),
+                np.ascontiguousarray(vh[:r].reshape(r, -1, npol)
+                    .transpose(2, 1, 0), dtype=cube.dtype))
+
+        self._weights, self._basis = _factorise(E_beam)
+        self._abs_weights, self._abs_basis = _factorise(E_beam_abs)
+
+    @property
+    def rank(self):
+        """ Rank of the decomposition of the complex values """
+        return self._weights.shape[1]
+
+    @property
+    def nbytes(self):
+        """ Number of bytes held by the compressed cube """
+        return sum(a.nbytes for a in (self._weights, self._basis,
+            self._abs_weights, self._abs_basis))
+
+    def _reconstruct(self, weights, basis, corrs, spatial,
+            planes, plane_idx):
+        """
+        Reconstructs the frequency planes of the cube with indices
+        planes, for the correlations with indices corrs, and loads
+        them at the spatial offsets within the (beam_lw*beam_mh)
+        plane and the indices plane_idx into planes.
+        """
+        plane_weights = weights[planes].T
+        idx = spatial*len(planes) + plane_idx
+        result = np.empty(shape=idx.shape + (len(corrs),),
+            dtype=basis.dtype)
+
+        for i, corr in enumerate(corrs):
+            # (beam_lw*beam_mh, nplanes) reconstructed planes
+            cube = np.dot(basis[corr], plane_weights)
+            result[...,i] = np.take(cube, idx)
+
+        return result
+
+    def gather(self, offsets, corrs=None):
+        """
+        Reconstructs the complex values and amplitudes of the
+        beam cube at the flat corner offsets, for the correlations
+        with indices corrs, or all correlations if corrs is None.
+
+        Returns a tuple of offsets.shape + (ncorr,) complex
+        values and amplitudes.
+        """
+        if corrs is None:
+            corrs = range(self._basis.shape[0])
+
+        # Only the frequency planes surrounding
+        # the channels are reconstructed
+        spatial, chans = np.divmod(offsets, self._beam_nud)
+        planes, plane_idx = np.unique(chans.ravel(), return_inverse=True)
+        plane_idx = plane_idx.reshape(chans.shape)
+
+        return (self._reconstruct(self._weights, self._basis,
+                corrs, spatial, planes, plane_idx),
+            self._reconstruct(self._abs_weights, self._abs_basis,
+                corrs, spatial, planes, plane_idx))
+
+# Compressed beam cube representations, keyed on their configuration
+# value. Each is constructed from the beam cube, its amplitudes and
+# the rank of low-rank decompositions.
+BEAM_COMPRESSIONS = {
+    Options.BEAM_COMPRESSION_COMPLEX64: lambda E, E_abs, rank:
+        CastBeam(E, E_abs, np.float32),
+    Options.BEAM_COMPRESSION_FLOAT16: lambda E, E_abs, rank:
+        CastBeam(E, E_abs, np.float16),
+    Options.BEAM_COMPRESSION_SVD: LowRankBeam,
+}
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015 Simon Perkins
+#
+# This file is part of montblanc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Analytic primary beam models. Each model is scalar and
+circularly symmetric, and is evaluated in closed form at
+rho, the distance of a source from the pointing centre
+scaled by frequency.
+
+Each model returns a tuple of the beam at rho, and its
+derivative with respect to rho. clip is the value of rho
+beyond which a model is held constant, if it is clipped.
+"""
+
+import numpy as np
+
+from montblanc.config import RimeSolverConfig as Options
+
+def cos3_beam(rho, clip):
+    """ cos(min(rho, clip))**3 """
+    clipped = rho >= clip
+    rho = np.minimum(rho, clip)
+    cos_rho = np.cos(rho)
+
+    return (cos_rho**3,
+        np.where(clipped, 0, -3*cos_rho**2*np.sin(rho)))
+
+def gaussian_beam(rho, clip):
+    """ exp(-rho**2), which is not clipped """
+    beam = np.exp(-rho**2)
+
+    return beam, -2*rho*beam
+
+def airy_beam(rho, clip):
+    """ 2*J1(rho)/rho, which is not clipped """
+    from scipy.special import jv
+
+    # Avoid division by zero at the pointing centre,
+    # where the beam is 1 and its derivative 0
+    centre = rho == 0
+    rho = np.where(centre, 1, rho)
+
+    return (np.where(centre, 1, 2*jv(1, rho)/rho),
+        np.where(centre, 0, -2*jv(2, rho)/rho))
+
+# Analytic beam models, keyed on their configuration value
+BEAM_MODELS = {
+    Options.BEAM_MODEL_COS3: cos3_beam,
+    Options.BEAM_MODEL_GAUSSIAN: gaussian_beam,
+    Options.BEAM_MODEL_AIRY: airy_beam,
+}
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015 Simon Perkins
+#
+# This file is part of montblanc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Clustering of sources by their (l, m) coordinates, so that
+direction-dependent terms can be evaluated once per cluster
+centre rather than once per source.
+
+Each method takes a (nsrc, 2) array of lm coordinates and a
+tolerance, the largest distance in lm of a source from its
+cluster centre, and returns a tuple (centres, labels) of the
+(nclusters, 2) cluster centres and the (nsrc,) cluster
+index of each source.
+"""
+
+import numpy as np
+
+from montblanc.config import RimeSolverConfig as Options
+
+def grid_clusters(lm, tolerance):
+    """
+    Clusters sources into the cells of a regular grid in lm,
+    whose diagonal is twice the tolerance. The centres are
+    the centres of the occupied cells, so each source is
+    assigned the same centre, whatever the other sources.
+    """
+    width = tolerance*np.sqrt(2)
+    cells = np.floor(lm/width).astype(np.int64)
+
+    if len(cells) == 0:
+        return np.empty(shape=(0, 2), dtype=lm.dtype), np.empty(0, np.intp)
+
+    cells, labels = np.unique(cells, axis=0, return_inverse=True)
+
+    return (((cells + 0.5)*width).astype(lm.dtype),
+        labels.reshape(-1).astype(np.intp))
+
+def _nearest_centres(lm, centres, chunk_size=4096):
+    """
+    Returns the index of the centre nearest to each source,
+    comparing chunks of sources against all centres to
+    bound memory usage.
+    """
+    labels = np.empty(len(lm), dtype=np.intp)
+    sqr_centres = (centres**2).sum(axis=1)
+
+    for s in range(0, len(lm), chunk_size):
+        chunk = lm[s:s+chunk_size]
+        # |x - c|**2, less the constant |x|**2
+        dist = sqr_centres[np.newaxis,:] - 2*np.dot(chunk, centres.T)
+        labels[s:s+chunk_size] = dist.argmin(axis=1)
+
+    return labels
+
+def kmeans_clusters(lm, tolerance, iterations=10):
+    """
+    Clusters sources with Lloyd's k-means algorithm, starting
+    from the clusters of grid_clusters. Centres move to the
+    mean of their sources, which reduces the typical distance
+    of a source from its centre. Sources that end up further
+    than the tolerance from their centre are placed in
+    clusters of their own.
+    """
+    centres, labels = grid_clusters(lm, tolerance)
+
+    if len(lm) == 0:
+        return centres, labels
+
+    for i in range(iterations):
+        # Move centres to the mean of their sources,
+        # discarding clusters without sources
+        counts = np.bincount(labels, minlength=len(centres))
+        occupied = counts > 0
+        centres = np.stack([np.bincount(labels, weights=lm[:,c],
+            minlength=len(centres)) for c in range(2)], axis=1)
+        centres = centres[occupied] / counts[occupied,np.newaxis]
+
+        # Reassign sources to their nearest centre
+        new_labels = _nearest_centres(lm, centres)
+
+        if np.array_equal(new_labels, labels):
+            break
+
+        labels = new_labels
+
+    far = np.sqrt(((lm - centres[labels])**2).sum(axis=1)) > tolerance
+    labels[far] = len(centres) + np.arange(np.count_nonzero(far))
+    centres = np.concatenate([centres, lm[far]])
+
+    # Remove clusters left without sources
+    occupied, labels = np.unique(labels, return_inverse=True)
+
+    return (centres[occupied].astype(lm.dtype),
+        labels.reshape(-1).astype(np.intp))
+
+# Source clustering methods, keyed on their configuration value
+SOURCE_CLUSTERINGS = {
+    Options.BEAM_CLUSTERING_GRID: grid_clusters,
+    Options.BEAM_CLUSTERING_KMEANS: kmeans_clusters,
+}
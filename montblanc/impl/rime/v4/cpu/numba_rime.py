@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015 Simon Perkins
+#
+# This file is part of montblanc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""
+Fused RIME kernel for the v4 CPU solver, JIT compiled with numba.
+
+The entire per-visibility pipeline (phase, brightness square root,
+beam interpolation, source sum, G term application and chi-squared
+terms) is evaluated in a single loop nest. For each timestep and
+channel, the per antenna jones matrices of every source are held in a
+small (na, nsrc, 4) buffer, rather than in (nsrc, ntime, na, nchan, 4)
+and (nsrc, ntime, nbl, nchan, 4) temporaries.
+"""
+
+import cmath
+import math
+
+import numba
+import numpy as np
+
+@numba.njit(nogil=True)
+def _b_sqrt(stokes, alpha, freq, ref_freq, out):
+    """
+    Computes the square root of the brightness matrix
+    of a single source, timestep and channel into out.
+    Mirrors CPUSolver.compute_b_sqrt_jones.
+    """
+    I, Q, U, V = stokes[0], stokes[1], stokes[2], stokes[3]
+    power = (freq/ref_freq)**alpha
+
+    b0 = (I + Q)*power
+    b1 = complex(U, V)*power
+    b2 = complex(U, -V)*power
+    b3 = (I - Q)*power
+
+    trace = b0 + b3
+    det = b0*b3 - (b1*b2).real
+
+    s = math.sqrt(det)
+    t = math.sqrt(trace + 2*s)
+
+    # Avoid infs and nans from divide by zero
+    if s == 0.0 and t == 0.0:
+        t = 1.0
+
+    out[0] = (b0 + s)/t
+    out[1] = b1/t
+    out[2] = b2/t
+    out[3] = (b3 + s)/t
+
+@numba.njit(nogil=True)
+def _e_beam(E_beam, l, m, vchan, out):
+    """
+    Trilinearly interpolates the beam cube at grid position
+    (l, m, vchan) into out. Mirrors CPUSolver.compute_E_beam.
+    l and m are grid coordinates, clipped to the cube extents.
+    """
+    beam_lw, beam_mh, beam_nud = (E_beam.shape[0],
+        E_beam.shape[1], E_beam.shape[2])
+
+    gl0 = math.floor(l)
+    gl1 = min(gl0 + 1.0, beam_lw - 1)
+    ld = l - gl0
+
+    gm0 = math.floor(m)
+    gm1 = min(gm0 + 1.0, beam_mh - 1)
+    md = m - gm0
+
+    gc0 = math.floor(vchan)
+    gc1 = min(gc0 + 1.0, beam_nud - 1)
+    chd = vchan - gc0
+
+    for p in range(4):
+        pol_sum = 0j
+        abs_sum = 0.0
+
+        for gl, wl in ((gl0, 1.0 - ld), (gl1, ld)):
+            for gm, wm in ((gm0, 1.0 - md), (gm1, md)):
+                for gc, wc in ((gc0, 1.0 - chd), (gc1, chd)):
+                    w = wl*wm*wc
+                    value = E_beam[int(gl), int(gm), int(gc), p]
+                    pol_sum += w*value
+                    abs_sum += w*abs(value)
+
+        # Normalise the polarisation
+        pol_abs = abs(pol_sum)
+        out[p] = pol_sum*abs_sum/pol_abs if pol_abs != 0.0 else pol_sum
+
+@numba.njit(nogil=True)
+def _clip(value, lower, upper):
+    return min(max(value, lower), upper)
+
+def _solve_rime(uvw, antenna1, antenna2, frequency, ref_frequency,
+        parallactic_angles, point_errors, antenna_scaling, E_beam,
+        G_term, lm, stokes, alpha, gauss_shape, sersic_shape,
+        flag, weight_vector, observed_vis,
+        model_vis, chi_sqrd_result, chi_sqrd_sums, pols,
+        npsrc, ngsrc, lightspeed, gauss_scale, two_pi_over_c,
+        beam_ll, beam_lm, beam_lfreq, beam_ul, beam_um, beam_ufreq,
+        use_weight_vector, output_residuals, output_vis):
+    """
+    Computes model visibilities (or residuals) into model_vis and
+    chi-squared terms into chi_sqrd_result, if output_vis is True.
+    The sum of the chi-squared terms of each timestep is written
+    into chi_sqrd_sums. pols holds the indices of the correlations
+    held in the visibility arrays. Timesteps are distributed
+    over threads by the parallel variant.
+    """
+    nsrc = lm.shape[0]
+    ntime, na = uvw.shape[0], uvw.shape[1]
+    nbl = antenna1.shape[1]
+    nchan = frequency.shape[0]
+    beam_lw, beam_mh, beam_nud = (E_beam.shape[0],
+        E_beam.shape[1], E_beam.shape[2])
+
+    for t in numba.prange(ntime):
+        # Per antenna jones matrices of each source
+        # for the current timestep and channel
+        jones = np.empty((na, nsrc, 4), dtype=model_vis.dtype)
+        b_sqrt = np.empty(4, dtype=model_vis.dtype)
+        e_beam = np.empty(4, dtype=model_vis.dtype)
+        time_chi_sqrd = 0.0
+
+        for ch in range(nchan):
+            f = frequency[ch]
+            vchan = _clip((beam_nud - 1)*(f - beam_lfreq) /
+                (beam_ufreq - beam_lfreq), 0.0, beam_nud - 1)
+
+            for src in range(nsrc):
+                l0, m0 = lm[src, 0], lm[src, 1]
+                n0 = math.sqrt(1.0 - l0**2 - m0**2) - 1.0
+
+                _b_sqrt(stokes[src, t], alpha[src, t], f,
+                    ref_frequency[ch], b_sqrt)
+
+                for a in range(na):
+                    # K term
+                    phase = (l0*uvw[t, a, 0] + m0*uvw[t, a, 1] +
+                        n0*uvw[t, a, 2])
+                    K = cmath.exp(-2j*math.pi*phase*f/lightspeed)
+
+                    # E term, rotated by the parallactic angle,
+                    # offset by pointing errors and antenna scaling
+                    sint = math.sin(parallactic_angles[t, a])
+                    cost = math.cos(parallactic_angles[t, a])
+                    l = l0*cost - m0*sint + point_errors[t, a, ch, 0]
+                    m = l0*sint + m0*cost + point_errors[t, a, ch, 1]
+                    l *= antenna_scaling[a, ch, 0]
+                    m *= antenna_scaling[a, ch, 1]
+
+                    vl = _clip((beam_lw - 1)*(l - beam_ll) /
+                        (beam_ul - beam_ll), 0.0, beam_lw - 1)
+                    vm = _clip((beam_mh - 1)*(m - beam_lm) /
+                        (beam_um - beam_lm), 0.0, beam_mh - 1)
+
+                    _e_beam(E_beam, vl, vm, vchan, e_beam)
+
+                    # E x K x B_sqrt
+                    jones[a, src, 0] = K*(e_beam[0]*b_sqrt[0] +
+                        e_beam[1]*b_sqrt[2])
+                    jones[a, src, 1] = K*(e_beam[0]*b_sqrt[1] +
+                        e_beam[1]*b_sqrt[3])
+                    jones[a, src, 2] = K*(e_beam[2]*b_sqrt[0] +
+                        e_beam[3]*b_sqrt[2])
+                    jones[a, src, 3] = K*(e_beam[2]*b_sqrt[1] +
+                        e_beam[3]*b_sqrt[3])
+
+            for bl in range(nbl):
+                p, q = antenna1[t, bl], antenna2[t, bl]
+
+                u = uvw[t, q, 0] - uvw[t, p, 0]
+                v = uvw[t, q, 1] - uvw[t, p, 1]
+
+                v0 = v1 = v2 = v3 = 0j
+
+                # Sum J_p.J_q^H over sources,
+                # multiplying in shape terms
+                for src in range(nsrc):
+                    if src < npsrc:
+                        shape = 1.0
+                    elif src < npsrc + ngsrc:
+                        g = src - npsrc
+                        el, em, R = (gauss_shape[0, g],
+                            gauss_shape[1, g], gauss_shape[2, g])
+                        scale_uv = gauss_scale*f
+                        u1 = (u*em - v*el)*scale_uv*R
+                        v1_ = (u*el + v*em)*scale_uv
+                        shape = math.exp(-(u1**2 + v1_**2))
+                    else:
+                        s = src - npsrc - ngsrc
+                        e1, e2, R = (sersic_shape[0, s],
+                            sersic_shape[1, s], sersic_shape[2, s])
+                        scale_uv = two_pi_over_c*f
+                        R = R/(1.0 - e1*e1 - e2*e2)
+                        u1 = (u*(1.0 + e1) + v*e2)*scale_uv*R
+                        v1_ = (u*e2 + v*(1.0 - e1))*scale_uv*R
+                        den = 1.0 + u1**2 + v1_**2
+                        shape = 1.0/(den*math.sqrt(den))
+
+                    a0, a1, a2, a3 = (jones[p, src, 0], jones[p, src, 1],
+                        jones[p, src, 2], jones[p, src, 3])
+                    b0, b1, b2, b3 = (jones[q, src, 0].conjugate(),
+                        jones[q, src, 1].conjugate(),
+                        jones[q, src, 2].conjugate(),
+                        jones[q, src, 3].conjugate())
+
+                    v0 += shape*(a0*b0 + a1*b1)
+                    v1 += shape*(a0*b2 + a1*b3)
+                    v2 += shape*(a2*b0 + a3*b1)
+                    v3 += shape*(a2*b2 + a3*b3)
+
+                # G_p x V
+                g0, g1, g2, g3 = (G_term[t, p, ch, 0], G_term[t, p, ch, 1],
+                    G_term[t, p, ch, 2], G_term[t, p, ch, 3])
+                r0 = g0*v0 + g1*v2
+                r1 = g0*v1 + g1*v3
+                r2 = g2*v0 + g3*v2
+                r3 = g2*v1 + g3*v3
+
+                # (G_p x V) x G_q^H
+                g0, g1, g2, g3 = (G_term[t, q, ch, 0].conjugate(),
+                    G_term[t, q, ch, 1].conjugate(),
+                    G_term[t, q, ch, 2].conjugate(),
+                    G_term[t, q, ch, 3].conjugate())
+                vis = (r0*g0 + r1*g1, r0*g2 + r1*g3,
+                    r2*g0 + r3*g1, r2*g2 + r3*g3)
+
+                chi_sqrd = 0.0
+
+                for c in range(pols.shape[0]):
+                    if flag[t, bl, ch, c] > 0:
+                        if output_vis:
+                            model_vis[t, bl, ch, c] = 0
+                        continue
+
+                    corr_vis = vis[pols[c]]
+                    residual = observed_vis[t, bl, ch, c] - corr_vis
+
+                    if output_vis:
+                        model_vis[t, bl, ch, c] = (residual
+                            if output_residuals else corr_vis)
+
+                    term = residual.real**2 + residual.imag**2
+
+                    if use_weight_vector:
+                        term *= weight_vector[t, bl, ch, c]
+
+                    chi_sqrd += term
+
+                if output_vis:
+                    chi_sqrd_result[t, bl, ch] = chi_sqrd
+
+                time_chi_sqrd += chi_sqrd
+
+        chi_sqrd_sums[t] = time_chi_sqrd
+
+# Kernel parallelised over timesteps
+solve_rime = numba.njit(parallel=True)(_solve_rime)
+# Serial kernel, releasing the GIL, for use
+# when parallelism is obtained over visibility tiles
+solve_rime_serial = numba.njit(nogil=True)(_solve_rime)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015 Simon Perkins
+#
+# This file is part of montblanc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import functools
+import threading
+
+class TermCache(object):
+    """
+    Least recently used cache of intermediate RIME terms,
+    bounded by the total number of bytes held by the terms.
+    """
+    def __init__(self, max_bytes):
+        self._max_bytes = max_bytes
+        self._nbytes = 0
+        self._hits = 0
+        self._terms = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        """ Number of bytes held by cached terms """
+        return self._nbytes
+
+    @property
+    def hits(self):
+        """ Number of terms returned from the cache """
+        return self._hits
+
+    def get(self, key):
+        """ Returns the term cached under key, or None """
+        with self._lock:
+            value = self._terms.pop(key, None)
+
+            # Move the term to the most recently used position
+            if value is not None:
+                self._terms[key] = value
+                self._hits += 1
+
+            return value
+
+    def put(self, key, value):
+        """
+        Caches value under key, evicting least recently used
+        terms until the cache fits within its memory cap.
+        Terms larger than the cap are not cached.
+        """
+        if value.nbytes > self._max_bytes:
+            return
+
+        with self._lock:
+            old_value = self._terms.pop(key, None)
+
+            if old_value is not None:
+                self._nbytes -= old_value.nbytes
+
+            while self._nbytes + value.nbytes > self._max_bytes:
+                _, evicted = self._terms.popitem(last=False)
+                self._nbytes -= evicted.nbytes
+
+            self._terms[key] = value
+            self._nbytes += value.nbytes
+
+    def clear(self):
+        """ Empties the cache """
+        with self._lock:
+            self._terms.clear()
+            self._nbytes = 0
+
+def cached_term(arrays, properties=()):
+    """
+    Decorates a solver method computing an intermediate term
+    so that its result is memoised in the solver's term cache.
+    The cache key is formed from the solver's term view, the
+    versions of the input arrays and the values of the input
+    properties. Sub-solvers sharing a cache have distinct views.
+
+    The term is only cached if the method is called without
+    arguments, and if the solver has a term cache. Cached
+    terms are read-only, since they are shared between calls.
+    """
+    def decorator(method):
+        name = method.__name__
+
+        @functools.wraps(method)
+        def wrapper(slvr, *args, **kwargs):
+            cache = slvr.term_cache()
+
+            if (cache is None or args or
+                    any(v is not None for v in kwargs.itervalues())):
+                return method(slvr, *args, **kwargs)
+
+            key = ((name, slvr.term_view())
+                + tuple(slvr.array_version(a) for a in arrays)
+                + tuple(getattr(slvr, p) for p in properties))
+
+            value = cache.get(key)
+
+            if value is None:
+                value = method(slvr)
+                value.flags.writeable = False
+                cache.put(key, value)
+
+            return value
+
+        return wrapper
+
+    return decorator
@@ -56,8 +56,8 @@ class MeasurementSetLoader(montblanc.impl.common.loaders.MeasurementSetLoader):
         tf = self.tables['freq']
         tfi = self.tables['field']
 
-        ntime, na, nbl, nbands, nchan = solver.dim_global_size(
-            'ntime', 'na', 'nbl', 'nbands', 'nchan')
+        ntime, na, nbl, nbands, nchan, npol = solver.dim_global_size(
+            'ntime', 'na', 'nbl', 'nbands', 'nchan', 'npol')
 
         # Transfer frequencies
         freqs = (tf.getcol(CHAN_FREQ)
@@ -140,7 +140,7 @@ class MeasurementSetLoader(montblanc.impl.common.loaders.MeasurementSetLoader):
                 'into the {ovis} array'.format(
                     lp=self.LOG_PREFIX, ovis='observed_vis'))
             # Obtain visibilities stored in the DATA column
-            # This comes in as (ntime*nbl,nchan,4)
+            # This comes in as (ntime*nbl,nchan,npol)
             vis_data = (tm.getcol(DATA).reshape(solver.observed_vis.shape)
                 .astype(solver.ct))
             solver.transfer_observed_vis(np.ascontiguousarray(vis_data))
@@ -239,9 +239,9 @@ class MeasurementSetLoader(montblanc.impl.common.loaders.MeasurementSetLoader):
             else:
                 raise Exception, 'init_weights used incorrectly!'
 
-            assert weight_vector.shape == (ntime*nbl*nbands, chans_per_band, 4)
+            assert weight_vector.shape == (ntime*nbl*nbands, chans_per_band, npol)
 
-            weight_vector = weight_vector.reshape(ntime,nbl,nchan,4) \
+            weight_vector = weight_vector.reshape(ntime,nbl,nchan,npol) \
                 .astype(solver.ft)
 
             solver.transfer_weight_vector(np.ascontiguousarray(weight_vector))
@@ -90,6 +90,9 @@ class CompositeRimeSolver(MontblancNumpySolver):
         # Create thread local storage
         self.thread_local = threading.local()
 
+        # Starts of the fully flagged visibility chunks
+        self._flagged_chunks = mbu.DerivedTerm()
+
         self.register_default_dimensions()
 
         # Configure the dimensions of the beam cube
@@ -338,6 +341,21 @@ class CompositeRimeSolver(MontblancNumpySolver):
 
                     yield (cpu_slice.copy(), gpu_slice.copy())
 
+    def _flagged_vis_chunks(self):
+        """
+        Computes a summary of the flag occupancy of the chunks of
+        the visibility space produced by _gen_vis_slices. The
+        summary is reused by solves until the flags are
+        transferred or marked dirty.
+
+        Returns the set of (time, baseline, channel) chunk starts
+        of chunks in which all visibilities are flagged.
+        """
+        return self._flagged_chunks.get((self.array_version('flag'),),
+            lambda: mbu.flagged_chunk_starts(self.flag,
+                (cpu_slice for cpu_slice, gpu_slice
+                    in self._gen_vis_slices())))
+
     def _thread_gen_sub_solvers(self):
         # Loop infinitely over the sub-solvers.
         while True:
@@ -1024,8 +1042,22 @@ class CompositeRimeSolver(MontblancNumpySolver):
 
             self.initialised = True
 
-    def solve(self):
-        """ Solve the RIME """
+    def solve(self, x2_bound=None):
+        """
+        Solve the RIME
+
+        If x2_bound is supplied, no further chunks of the
+        visibility space are submitted once the partial
+        chi-squared value exceeds x2_bound. Chunks already
+        in flight are still accumulated. The partial value
+        only grows as chunks are added, so comparing X2
+        against the bound remains exact for accept/reject
+        decisions. If the evaluation is cut short, X2 holds the
+        partial value and the model visibilities of the unsolved
+        chunks are not updated.
+
+        Returns True if the evaluation was cut short.
+        """
         if not self.initialised:
             self.initialise()
 
@@ -1111,6 +1143,15 @@ class CompositeRimeSolver(MontblancNumpySolver):
 
         # Running sum of the chi-squared values returned in futures
         X2_sum = self.ft(0.0)
+        cut_short = False
+
+        # Bound on the running sum of the chi-squared values
+        if x2_bound is None:
+            X2_sum_bound = None
+        elif self.use_weight_vector():
+            X2_sum_bound = x2_bound
+        else:
+            X2_sum_bound = x2_bound*self.sigma_sqrd
 
         # Sets of return value futures for each executor
         value_futures = [set() for ex in self.enqueue_executors]
@@ -1130,9 +1171,44 @@ class CompositeRimeSolver(MontblancNumpySolver):
         else:
             vis_write = _overwrite
 
+        # Chunks in which all visibilities are flagged contribute
+        # nothing to the chi-squared value and produce zeroed
+        # model visibilities, so they are not solved
+        flagged_chunks = self._flagged_vis_chunks()
+
+        montblanc.log.debug('Skipping {n} fully flagged chunks'.format(
+            n=len(flagged_chunks)))
+
         # Iterate over the visibility space, i.e. slices over
         # the CPU and GPU arrays
         for cpu_slice_map, gpu_slice_map in self._gen_vis_slices():
+            if (cpu_slice_map[Options.NTIME].start,
+                    cpu_slice_map[Options.NBL].start,
+                    cpu_slice_map[Options.NCHAN].start) in flagged_chunks:
+                # Zero model visibilities unless accumulating them
+                if vis_write is _overwrite:
+                    self.model_vis[tuple(cpu_slice_map[s]
+                        if s in cpu_slice_map else ALL_SLICE
+                        for s in model_vis_sshape)] = 0
+
+                continue
+
+            if X2_sum_bound is not None:
+                # Accumulate any completed chunks, and stop
+                # submitting chunks once the bound is exceeded
+                for f in [f for f in itertools.chain(*value_futures)
+                        if f.done()]:
+                    for s in value_futures:
+                        s.discard(f)
+
+                    X2, pinned_model_vis, model_vis_idx = f.result()
+                    X2_sum += X2
+                    vis_write(self.model_vis[model_vis_idx], pinned_model_vis[:])
+
+                if X2_sum > X2_sum_bound:
+                    cut_short = True
+                    break
+
             # Attempt to submit work to an executor
             # Poor man's load balancer
             submitted = False
@@ -1214,6 +1290,8 @@ class CompositeRimeSolver(MontblancNumpySolver):
         else:
             self.set_X2(X2_sum/self.sigma_sqrd)
 
+        return cut_short
+
     def shutdown(self):
         """ Shutdown the solver """
         def _shutdown_func():
@@ -51,6 +51,11 @@ class RimeSolver(MontblancCUDASolver):
 
         self.register_default_dimensions()
 
+        # The GPU kernels assume four correlations
+        if self.dim_local_size(Options.NPOL) != 4:
+            raise ValueError("The GPU solvers only support "
+                "'{n}' = 4 polarisations.".format(n=Options.NPOL))
+
         # Configure the dimensions of the beam cube
         self.register_dimension('beam_lw',
             slvr_cfg[Options.E_BEAM_WIDTH],
@@ -108,6 +108,7 @@ class SolverConfig(object):
     # Number of polarisations
     NPOL = 'npol'
     DEFAULT_NPOL = 4
+    VALID_NPOL = [1, 2, 4]
     NPOL_DESCRIPTION = 'Polarisations'
 
     # Number of sources
@@ -216,6 +217,7 @@ class SolverConfig(object):
         NPOL: {
             DESCRIPTION: NPOL_DESCRIPTION,
             DEFAULT: DEFAULT_NPOL,
+            VALID: VALID_NPOL,
             REQUIRED: True },
 
         DTYPE: {
@@ -288,6 +290,7 @@ class SolverConfig(object):
         p.add_argument('--{v}'.format(v=self.NPOL),
             required=False,
             type=int,
+            choices=self.VALID_NPOL,
             help=self.NPOL_DESCRIPTION,
             default=self.DEFAULT_NPOL)
 
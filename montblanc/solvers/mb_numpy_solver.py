@@ -18,6 +18,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program; if not, see <http://www.gnu.org/licenses/>.
 
+import types
+
 import numpy as np
 
 import hypercube as hc
@@ -33,6 +35,17 @@ class MontblancNumpySolver(RIMESolver):
     def __init__(self, slvr_cfg):
         super(MontblancNumpySolver, self).__init__(slvr_cfg=slvr_cfg)
 
+        # Version counters of the solver's arrays
+        self._array_versions = {}
+
+    def array_factory(self, shape, dtype):
+        """
+        Creates the array of the supplied shape and dtype
+        backing a registered array. Override this to allocate
+        arrays in some other kind of memory.
+        """
+        return np.empty(shape=shape, dtype=dtype)
+
     def create_arrays(self, ignore=None, supplied=None):
         """
         Create any necessary arrays on the solver. 
@@ -61,7 +74,7 @@ class MontblancNumpySolver(RIMESolver):
         # Create local arrays on the cube
         create_local_arrays_on_cube(self, create_arrays,
             array_stitch=generic_stitch,
-            array_factory=np.empty)
+            array_factory=self.array_factory)
 
         self._validate_supplied_arrays(reified_arrays, supplied)
 
@@ -83,4 +96,50 @@ class MontblancNumpySolver(RIMESolver):
                 pass
             else:
                 self.init_array(name, cpu_ary,
-                    array.get(Options.DATA_SOURCE_DEFAULT, None))    
\ No newline at end of file
+                    array.get(Options.DATA_SOURCE_DEFAULT, None))    
+
+        # Version and create transfer methods
+        # for the created and supplied arrays
+        for name in create_arrays.keys() + supplied.keys():
+            self._array_versions[name] = 0
+            self.create_transfer_method(name)
+
+    def create_transfer_method(self, name):
+        """
+        Creates a transfer_<name> method on the solver, which
+        copies a numpy array into the named array and marks
+        it as dirty.
+        """
+        def transfer(self, npary):
+            getattr(self, name)[:] = npary
+            self.mark_dirty(name)
+
+        transfer_method = types.MethodType(transfer, self)
+        setattr(self, self.transfer_method_name(name), transfer_method)
+        # Create a docstring!
+        getattr(transfer_method, '__func__').__doc__ = \
+        """
+        Transfers the npary numpy array to the %s array.
+        npary and %s must be the same shape and type.
+        """ % (name,name)
+
+    def transfer_method_name(self, name):
+        """ Constructs a transfer method name, given the array name """
+        return 'transfer_' + name
+
+    def mark_dirty(self, *names):
+        """
+        Indicates that the named arrays have been modified,
+        invalidating any terms computed from them. Call this
+        after writing to an array in place, rather than
+        through its transfer method.
+        """
+        for name in names:
+            self._array_versions[name] += 1
+
+    def array_version(self, name):
+        """
+        Returns the version of the named array, which is
+        incremented each time the array is marked dirty.
+        """
+        return self._array_versions[name]
@@ -85,6 +85,10 @@ class RIMESolver(HyperCube):
     def outputs_residuals(self):
         return self._visibility_output == Options.VISIBILITY_OUTPUT_RESIDUALS
 
+    def outputs_visibilities(self):
+        """ Does this solver output model visibilities or residuals? """
+        return self._visibility_output != Options.VISIBILITY_OUTPUT_NONE
+
     def is_autocorrelated(self):
         """ Does this solver handle autocorrelations? """
         return self._is_auto_correlated == True
@@ -20,6 +20,7 @@
 
 import itertools
 import logging
+import threading
 import unittest
 import numpy as np
 import random
@@ -35,7 +36,8 @@ from montblanc.impl.rime.v4.gpu.RimeBSqrt import RimeBSqrt
 from montblanc.impl.rime.v4.gpu.RimeSumCoherencies import RimeSumCoherencies
 from montblanc.impl.rime.v4.gpu.MatrixTranspose import MatrixTranspose
 
-from montblanc.impl.rime.v4.cpu.CPUSolver import CPUSolver
+from montblanc.impl.rime.v4.cpu.CPUSolver import (CPUSolver,
+    X2_BATCH_BLOCK_SIZE)
 
 from montblanc.solvers import copy_solver
 from montblanc.pipeline import Pipeline
@@ -528,6 +530,1359 @@ class TestRimeV4(unittest.TestCase):
         for Am, Bm, Cm in zip(AM, BM, C):
             assert np.allclose(Am*Bm.H, Cm)
 
+    def test_source_batched_vis(self):
+        """
+        Confirm that accumulating visibilities over batches
+        of sources produces the same visibilities as
+        summing over all sources at once.
+        """
+
+        slvr_cfg = montblanc.rime_solver_cfg(na=14, ntime=10, nchan=16,
+            sources=montblanc.sources(point=10, gaussian=10, sersic=10),
+            dtype=Options.DTYPE_DOUBLE,
+            data_source=Options.DATA_SOURCE_TEST,
+            pipeline=Pipeline([]))
+
+        with CPUSolver(slvr_cfg) as cpu_slvr:
+            cpu_slvr.set_beam_ll(-1)
+            cpu_slvr.set_beam_lm(-1)
+            cpu_slvr.set_beam_ul(1)
+            cpu_slvr.set_beam_um(1)
+
+            ekb_vis = cpu_slvr.compute_ekb_vis()
+
+            # Batches that do and don't straddle source types
+            for src_batch_size in [1, 7, 10, 30, 100]:
+                batched_vis = cpu_slvr.compute_ekb_vis_by_source_batch(
+                    src_batch_size)
+                self.assertTrue(np.allclose(ekb_vis, batched_vis))
+
+    def test_gemm_coherencies(self):
+        """
+        Confirm that summing coherencies with a Gram matrix
+        product produces the same visibilities as gathering
+        per-baseline jones matrices.
+        """
+
+        for sources in [montblanc.sources(point=20),
+                montblanc.sources(point=10, gaussian=10, sersic=10)]:
+            slvr_cfg = montblanc.rime_solver_cfg(na=14, ntime=10, nchan=16,
+                sources=sources,
+                dtype=Options.DTYPE_DOUBLE,
+                data_source=Options.DATA_SOURCE_TEST,
+                pipeline=Pipeline([]))
+
+            with CPUSolver(slvr_cfg) as cpu_slvr:
+                ekb_sqrt = cpu_slvr.compute_ekb_sqrt_jones_per_ant()
+                ekb_vis = cpu_slvr.compute_ekb_vis(
+                    cpu_slvr.compute_ekb_jones_per_bl(ekb_sqrt))
+                gemm_vis = cpu_slvr.compute_ekb_vis_gemm(ekb_sqrt)
+
+                self.assertTrue(np.allclose(ekb_vis, gemm_vis))
+
+    def test_tiled_solve(self):
+        """
+        Confirm that solving tiles of the visibility space
+        produces the same model visibilities,
+        chi-squared terms and chi-squared value as solving
+        the visibility space as a whole.
+        """
+
+        slvr_cfg = montblanc.rime_solver_cfg(na=14, ntime=10, nchan=16,
+            sources=montblanc.sources(point=10, gaussian=10, sersic=10),
+            dtype=Options.DTYPE_DOUBLE,
+            weight_vector=True,
+            data_source=Options.DATA_SOURCE_TEST,
+            pipeline=Pipeline([]))
+
+        tiled_slvr_cfg = slvr_cfg.copy()
+        tiled_slvr_cfg[Options.VISIBILITY_TILE_SHAPE] = {
+            'ntime': 3, 'nbl': 20, 'nchan': 5 }
+        tiled_slvr_cfg[Options.CPU_THREADS] = 4
+
+        with CPUSolver(slvr_cfg) as cpu_slvr, \
+            CPUSolver(tiled_slvr_cfg) as tiled_slvr:
+
+            for name in cpu_slvr.arrays().iterkeys():
+                if name not in tiled_slvr._ignored_arrays:
+                    getattr(tiled_slvr, name)[:] = getattr(cpu_slvr, name)
+
+            cpu_slvr.solve()
+            tiled_slvr.solve()
+
+            self.assertTrue(np.allclose(cpu_slvr.model_vis,
+                tiled_slvr.model_vis))
+            self.assertTrue(np.allclose(cpu_slvr.chi_sqrd_result,
+                tiled_slvr.chi_sqrd_result))
+            self.assertTrue(np.allclose(cpu_slvr.X2, tiled_slvr.X2))
+
+    def test_tiled_solve_scaling(self):
+        """
+        Confirm that tiles solved by the numba kernel, which
+        releases the GIL, are solved concurrently, by timing
+        a tiled solve on one thread and on several threads.
+        """
+        import multiprocessing
+
+        try:
+            import numba
+        except ImportError:
+            raise unittest.SkipTest('numba is not installed')
+
+        nthreads = min(multiprocessing.cpu_count(), 4)
+
+        if nthreads < 2:
+            raise unittest.SkipTest('scaling needs at least two CPUs')
+
+        slvr_cfg = montblanc.rime_solver_cfg(na=27, ntime=40, nchan=32,
+            sources=montblanc.sources(point=50, gaussian=50, sersic=20),
+            dtype=Options.DTYPE_DOUBLE,
+            data_source=Options.DATA_SOURCE_TEST,
+            cpu_backend=Options.CPU_BACKEND_NUMBA,
+            vis_tile_shape={ 'ntime': 5 },
+            cpu_threads=1,
+            pipeline=Pipeline([]))
+
+        threaded_slvr_cfg = slvr_cfg.copy()
+        threaded_slvr_cfg[Options.CPU_THREADS] = nthreads
+
+        def _best_solve_time(slvr):
+            # The first solve compiles the kernel
+            slvr.solve()
+            times = []
+
+            for i in xrange(3):
+                start = time.time()
+                slvr.solve()
+                times.append(time.time() - start)
+
+            return min(times)
+
+        with CPUSolver(slvr_cfg) as serial_slvr, \
+            CPUSolver(threaded_slvr_cfg) as threaded_slvr:
+
+            for name in serial_slvr.arrays().iterkeys():
+                if name not in threaded_slvr._ignored_arrays:
+                    getattr(threaded_slvr, name)[:] = getattr(
+                        serial_slvr, name)
+
+            serial_time = _best_solve_time(serial_slvr)
+            threaded_time = _best_solve_time(threaded_slvr)
+
+            montblanc.log.info('Tiled numba solve on 1 thread: {s:.3f}s, '
+                'on {n} threads: {t:.3f}s'.format(
+                    s=serial_time, n=nthreads, t=threaded_time))
+
+            self.assertTrue(np.allclose(serial_slvr.X2, threaded_slvr.X2))
+
+            # Creating each tile's sub-solver holds the GIL,
+            # so expect a speedup well short of nthreads
+            self.assertLess(threaded_time, 0.8*serial_time)
+
+    def test_multiprocess_solve(self):
+        """
+        Confirm that solving visibility tiles on worker processes
+        produces the same model visibilities and chi-squared
+        value as the single process CPU solver, including after
+        the shared arrays are modified once the workers are forked.
+        """
+        from montblanc.impl.rime.v4.cpu.MultiprocessCPUSolver import (
+            MultiprocessCPUSolver)
+
+        slvr_cfg = montblanc.rime_solver_cfg(na=14, ntime=10, nchan=16,
+            sources=montblanc.sources(point=10, gaussian=10, sersic=10),
+            dtype=Options.DTYPE_DOUBLE,
+            data_source=Options.DATA_SOURCE_TEST,
+            cpu_processes=3,
+            pipeline=Pipeline([]))
+
+        with CPUSolver(slvr_cfg) as cpu_slvr, \
+            MultiprocessCPUSolver(slvr_cfg) as mp_slvr:
+
+            for name in cpu_slvr.arrays().iterkeys():
+                if name not in mp_slvr._ignored_arrays:
+                    getattr(mp_slvr, name)[:] = getattr(cpu_slvr, name)
+
+            for sigma_sqrd in [1.0, 2.0]:
+                cpu_slvr.set_sigma_sqrd(sigma_sqrd)
+                mp_slvr.set_sigma_sqrd(sigma_sqrd)
+                cpu_slvr.lm[:] *= sigma_sqrd
+                mp_slvr.lm[:] = cpu_slvr.lm
+
+                cpu_slvr.solve()
+                mp_slvr.solve()
+
+                self.assertTrue(np.allclose(cpu_slvr.model_vis,
+                    mp_slvr.model_vis))
+                self.assertTrue(np.allclose(cpu_slvr.X2, mp_slvr.X2))
+
+        # Terms derived by the workers follow arrays
+        # marked dirty after the workers are forked
+        with CPUSolver(slvr_cfg) as cpu_slvr, \
+            MultiprocessCPUSolver(slvr_cfg) as mp_slvr:
+
+            for name in cpu_slvr.arrays().iterkeys():
+                if name not in mp_slvr._ignored_arrays:
+                    getattr(mp_slvr, name)[:] = getattr(cpu_slvr, name)
+
+            mp_slvr.initialise()
+            mp_slvr.solve()
+
+            for name in ('E_beam', 'point_errors'):
+                getattr(cpu_slvr, name)[:] *= 1.5
+                getattr(mp_slvr, name)[:] = getattr(cpu_slvr, name)
+                mp_slvr.mark_dirty(name)
+
+                cpu_slvr.solve()
+                mp_slvr.solve()
+
+                self.assertTrue(np.allclose(cpu_slvr.model_vis,
+                    mp_slvr.model_vis))
+                self.assertTrue(np.allclose(cpu_slvr.X2, mp_slvr.X2))
+
+    def test_channel_recurrence(self):
+        """
+        Confirm that K and gaussian shape terms computed by
+        recurrence over evenly spaced channels match those
+        computed directly, with multiple bands of channels.
+        """
+
+        slvr_cfg = montblanc.rime_solver_cfg(na=14, ntime=10, nchan=100,
+            sources=montblanc.sources(point=10, gaussian=10),
+            dtype=Options.DTYPE_DOUBLE,
+            data_source=Options.DATA_SOURCE_TEST,
+            pipeline=Pipeline([]))
+
+        with CPUSolver(slvr_cfg) as cpu_slvr:
+            cpu_slvr.frequency[:] = np.concatenate([
+                np.linspace(1.0e9, 1.1e9, 40),
+                np.linspace(1.3e9, 1.5e9, 57),
+                [1.6e9, 1.61e9, 1.65e9]])
+
+            self.assertEqual(len(cpu_slvr._channel_bands()), 4)
+
+            f = cpu_slvr.frequency
+
+            # Compute the K term directly
+            l, m = cpu_slvr.lm[:,0], cpu_slvr.lm[:,1]
+            n = np.sqrt(1. - l**2 - m**2) - 1.
+            u, v, w = (cpu_slvr.uvw[:,:,0], cpu_slvr.uvw[:,:,1],
+                cpu_slvr.uvw[:,:,2])
+            phase = (n[:,None,None]*w + m[:,None,None]*v
+                + l[:,None,None]*u)
+            K = np.exp(-2*np.pi*1j*phase[:,:,:,None]*f
+                / montblanc.constants.C)
+
+            self.assertTrue(np.allclose(K,
+                cpu_slvr.compute_k_jones_scalar_per_ant()))
+
+            # Compute the gaussian shape term directly
+            ant0, ant1 = cpu_slvr.ap_idx()
+            u = cpu_slvr.uvw[:,:,0][ant1] - cpu_slvr.uvw[:,:,0][ant0]
+            v = cpu_slvr.uvw[:,:,1][ant1] - cpu_slvr.uvw[:,:,1][ant0]
+            el, em, R = [x[:,None,None] for x in cpu_slvr.gauss_shape]
+            scale_uv = cpu_slvr.gauss_scale*f
+            u1 = (u*em - v*el)[:,:,:,None]*scale_uv
+            v1 = (u*el + v*em)[:,:,:,None]*scale_uv
+            shape = np.exp(-((u1*R[:,:,:,None])**2 + v1**2))
+
+            self.assertTrue(np.allclose(shape,
+                cpu_slvr.compute_gaussian_shape()))
+
+    def test_term_cache(self):
+        """
+        Confirm that cached terms are reused when their input
+        arrays are unchanged, and recomputed when they are
+        transferred or marked dirty.
+        """
+
+        slvr_cfg = montblanc.rime_solver_cfg(na=14, ntime=10, nchan=16,
+            sources=montblanc.sources(point=10, gaussian=10, sersic=10),
+            dtype=Options.DTYPE_DOUBLE,
+            data_source=Options.DATA_SOURCE_TEST,
+            pipeline=Pipeline([]))
+
+        cached_slvr_cfg = slvr_cfg.copy()
+        cached_slvr_cfg[Options.TERM_CACHE_SIZE] = 64
+
+        with CPUSolver(slvr_cfg) as cpu_slvr, \
+            CPUSolver(cached_slvr_cfg) as cached_slvr:
+
+            for name in cpu_slvr.arrays().iterkeys():
+                getattr(cached_slvr, name)[:] = getattr(cpu_slvr, name)
+
+            cached_slvr.solve()
+
+            K = cached_slvr.compute_k_jones_scalar_per_ant()
+            E = cached_slvr.compute_E_beam()
+            B_sqrt = cached_slvr.compute_b_sqrt_jones()
+
+            # Changing the brightness only recomputes B_sqrt
+            stokes = cpu_slvr.stokes.copy()
+            stokes[:,:,0] *= 2
+            cpu_slvr.stokes[:] = stokes
+            cached_slvr.transfer_stokes(stokes)
+
+            self.assertIs(K, cached_slvr.compute_k_jones_scalar_per_ant())
+            self.assertIs(E, cached_slvr.compute_E_beam())
+            self.assertIsNot(B_sqrt, cached_slvr.compute_b_sqrt_jones())
+
+            cpu_slvr.solve()
+            cached_slvr.solve()
+
+            self.assertTrue(np.allclose(cpu_slvr.model_vis,
+                cached_slvr.model_vis))
+            self.assertTrue(np.allclose(cpu_slvr.X2, cached_slvr.X2))
+
+            # Changing the source positions in place
+            # recomputes the phase and beam terms
+            cpu_slvr.lm[:] *= 0.5
+            cached_slvr.lm[:] *= 0.5
+            cached_slvr.mark_dirty('lm')
+
+            self.assertIsNot(K, cached_slvr.compute_k_jones_scalar_per_ant())
+            self.assertIsNot(E, cached_slvr.compute_E_beam())
+
+            cpu_slvr.solve()
+            cached_slvr.solve()
+
+            self.assertTrue(np.allclose(cpu_slvr.model_vis,
+                cached_slvr.model_vis))
+            self.assertTrue(np.allclose(cpu_slvr.X2, cached_slvr.X2))
+            self.assertTrue(cached_slvr.term_cache().nbytes <= 64*1024**2)
+
+    def test_sub_solver_term_cache(self):
+        """
+        Confirm that the sub-solvers of the tiled, source streaming,
+        sparse flag and baseline-dependent averaging modes cache their
+        terms in the term cache of their solver, reusing them on later
+        solves until the solver's arrays are marked dirty.
+        """
+        for name, value in (
+                (Options.VISIBILITY_TILE_SHAPE, { 'ntime': 3, 'nbl': 10 }),
+                (Options.SOURCE_STREAMING, True),
+                (Options.SPARSE_FLAGS, True),
+                (Options.BDA_TOLERANCE, 1e-2)):
+            slvr_cfg = montblanc.rime_solver_cfg(na=7, ntime=10, nchan=8,
+                sources=montblanc.sources(point=5, gaussian=5, sersic=5),
+                dtype=Options.DTYPE_DOUBLE,
+                data_source=Options.DATA_SOURCE_TEST,
+                source_batch_size=4,
+                pipeline=Pipeline([]))
+            slvr_cfg[name] = value
+
+            cached_slvr_cfg = slvr_cfg.copy()
+            cached_slvr_cfg[Options.TERM_CACHE_SIZE] = 64
+
+            with CPUSolver(slvr_cfg) as cpu_slvr, \
+                CPUSolver(cached_slvr_cfg) as cached_slvr:
+
+                # Sparse flags solve the unflagged timesteps on a sub-solver
+                cpu_slvr.flag[3] = 1
+
+                for ary_name in cpu_slvr.arrays().iterkeys():
+                    if ary_name not in cached_slvr._ignored_arrays:
+                        getattr(cached_slvr, ary_name)[:] = getattr(
+                            cpu_slvr, ary_name)
+
+                cache = cached_slvr.term_cache()
+                cached_slvr.solve()
+                hits, nbytes = cache.hits, cache.nbytes
+
+                # Sub-solvers of the second solve only hit the cache
+                cached_slvr.solve()
+                self.assertTrue(cache.hits > hits,
+                    '{n} terms not reused'.format(n=name))
+                self.assertEqual(cache.nbytes, nbytes)
+
+                cpu_slvr.solve()
+
+                self.assertTrue(np.allclose(cpu_slvr.model_vis,
+                    cached_slvr.model_vis))
+                self.assertTrue(np.allclose(cpu_slvr.X2, cached_slvr.X2))
+
+                # Terms of sub-solvers follow the solver's dirty arrays
+                cpu_slvr.lm[:] *= 0.5
+                cached_slvr.lm[:] *= 0.5
+                cached_slvr.mark_dirty('lm')
+
+                cpu_slvr.solve()
+                cached_slvr.solve()
+
+                self.assertTrue(np.allclose(cpu_slvr.model_vis,
+                    cached_slvr.model_vis))
+                self.assertTrue(np.allclose(cpu_slvr.X2, cached_slvr.X2))
+
+    def test_update_sources(self):
+        """
+        Confirm that incrementally updating a subset of sources
+        produces the same model visibilities and chi-squared
+        value as solving for all sources.
+        """
+
+        slvr_cfg = montblanc.rime_solver_cfg(na=14, ntime=10, nchan=16,
+            sources=montblanc.sources(point=10, gaussian=10, sersic=10),
+            dtype=Options.DTYPE_DOUBLE,
+            data_source=Options.DATA_SOURCE_TEST,
+            pipeline=Pipeline([]))
+
+        with CPUSolver(slvr_cfg) as cpu_slvr, \
+            CPUSolver(slvr_cfg) as inc_slvr:
+
+            for name in cpu_slvr.arrays().iterkeys():
+                getattr(inc_slvr, name)[:] = getattr(cpu_slvr, name)
+
+            inc_slvr.solve()
+
+            # Sources straddling each source type
+            for indices in [[3], [8, 9, 10, 25], [0, 15, 29]]:
+                n = len(indices)
+                lm = (np.random.random(size=(n, 2)) - 0.5)*1e-1
+                alpha = np.random.random(size=(n, 10))*0.1
+                shape = np.random.random(size=(3, n))*1e-6
+
+                inc_slvr.update_sources(indices, lm=lm,
+                    alpha=alpha, shape=shape)
+
+                cpu_slvr.lm[indices] = lm
+                cpu_slvr.alpha[indices] = alpha
+                cpu_slvr.gauss_shape[:] = inc_slvr.gauss_shape
+                cpu_slvr.sersic_shape[:] = inc_slvr.sersic_shape
+                cpu_slvr.solve()
+
+                self.assertTrue(np.allclose(cpu_slvr.model_vis,
+                    inc_slvr.model_vis))
+                self.assertTrue(np.allclose(cpu_slvr.chi_sqrd_result,
+                    inc_slvr.chi_sqrd_result))
+                self.assertTrue(np.allclose(cpu_slvr.X2, inc_slvr.X2))
+
+        # Averaged visibilities can't be updated source by source
+        bda_slvr_cfg = slvr_cfg.copy()
+        bda_slvr_cfg[Options.BDA_TOLERANCE] = 1e-2
+
+        with CPUSolver(bda_slvr_cfg) as bda_slvr:
+            bda_slvr.solve()
+
+            with self.assertRaises(ValueError):
+                bda_slvr.update_sources([3], lm=np.zeros((1, 2)))
+
+    def test_X2_batch(self):
+        """
+        Confirm that the batched chi-squared values of several
+        parameter sets, computed in blocks, match those
+        of sequential solves.
+        """
+
+        for weight_vector in [False, True]:
+            slvr_cfg = montblanc.rime_solver_cfg(na=14, ntime=10, nchan=16,
+                sources=montblanc.sources(point=10, gaussian=10, sersic=10),
+                dtype=Options.DTYPE_DOUBLE,
+                weight_vector=weight_vector,
+                data_source=Options.DATA_SOURCE_TEST,
+                pipeline=Pipeline([]))
+
+            with CPUSolver(slvr_cfg) as cpu_slvr:
+                cpu_slvr.set_sigma_sqrd(2.0)
+                cpu_slvr.flag[:] = np.random.random(
+                    size=cpu_slvr.flag.shape) < 0.1
+
+                # Parameter sets spanning several blocks
+                nparam = X2_BATCH_BLOCK_SIZE + 2
+                lm = cpu_slvr.lm + (np.random.random(
+                    size=(nparam,) + cpu_slvr.lm.shape) - 0.5)*1e-2
+                alpha = cpu_slvr.alpha*np.random.random(
+                    size=(nparam,) + cpu_slvr.alpha.shape)
+
+                X2 = cpu_slvr.compute_X2_batch(lm=lm, alpha=alpha)
+                self.assertEqual(X2.shape, (nparam,))
+
+                for p in xrange(nparam):
+                    cpu_slvr.lm[:] = lm[p]
+                    cpu_slvr.alpha[:] = alpha[p]
+                    cpu_slvr.solve()
+
+                    self.assertTrue(np.allclose(cpu_slvr.X2, X2[p]))
+
+    def test_X2_gradient(self):
+        """
+        Confirm that the analytic gradient of the chi-squared
+        value matches central finite differences.
+        """
+
+        slvr_cfg = montblanc.rime_solver_cfg(na=5, ntime=3, nchan=4,
+            sources=montblanc.sources(point=2, gaussian=2, sersic=2),
+            dtype=Options.DTYPE_DOUBLE,
+            data_source=Options.DATA_SOURCE_TEST,
+            pipeline=Pipeline([]))
+
+        with CPUSolver(slvr_cfg) as cpu_slvr:
+            cpu_slvr.set_beam_ll(-1)
+            cpu_slvr.set_beam_lm(-1)
+            cpu_slvr.set_beam_ul(1)
+            cpu_slvr.set_beam_um(1)
+            cpu_slvr.set_sigma_sqrd(2.0)
+
+            # Shapes small enough that sources aren't resolved out
+            cpu_slvr.gauss_shape[:] = (np.random.random(
+                size=cpu_slvr.gauss_shape.shape)*[[1e-3], [1e-3], [1]])
+            cpu_slvr.sersic_shape[:] = (np.random.random(
+                size=cpu_slvr.sersic_shape.shape)*[[0.3], [0.3], [1e-5]])
+            cpu_slvr.observed_vis[:] *= 3
+
+            gradient = cpu_slvr.compute_X2_gradient()
+
+            for name in ['lm', 'stokes', 'alpha',
+                    'gauss_shape', 'sersic_shape']:
+                ary = getattr(cpu_slvr, name)
+                fd_gradient = np.empty_like(gradient[name])
+
+                for idx in np.ndindex(ary.shape):
+                    x = ary[idx]
+                    h = 1e-6*max(abs(x), 1e-3)
+
+                    ary[idx] = x + h
+                    cpu_slvr.solve()
+                    X2_plus = cpu_slvr.X2
+
+                    ary[idx] = x - h
+                    cpu_slvr.solve()
+                    X2_minus = cpu_slvr.X2
+
+                    ary[idx] = x
+                    fd_gradient[idx] = (X2_plus - X2_minus) / (2*h)
+
+                self.assertEqual(gradient[name].shape, ary.shape)
+                self.assertTrue(np.allclose(gradient[name], fd_gradient,
+                    rtol=1e-4, atol=1e-4*np.abs(fd_gradient).max()),
+                    '{n} gradient mismatch'.format(n=name))
+
+    def test_chi_sqrd_only_solve(self):
+        """
+        Confirm that a solver outputting no visibilities produces
+        the same chi-squared value as one outputting model
+        visibilities, without allocating the result arrays,
+        including when reducing chunks of timesteps in turn.
+        """
+        backends = [Options.CPU_BACKEND_NUMEXPR]
+
+        try:
+            import numba
+            backends.append(Options.CPU_BACKEND_NUMBA)
+        except ImportError:
+            pass
+
+        for backend, tile_shape, weight_vector in itertools.product(
+                backends, [None, { 'ntime': 3, 'nbl': 20 }],
+                [True, False]):
+            slvr_cfg = montblanc.rime_solver_cfg(na=14, ntime=10, nchan=16,
+                sources=montblanc.sources(point=10, gaussian=10, sersic=10),
+                dtype=Options.DTYPE_DOUBLE,
+                weight_vector=weight_vector,
+                data_source=Options.DATA_SOURCE_TEST,
+                pipeline=Pipeline([]))
+
+            X2_slvr_cfg = slvr_cfg.copy()
+            X2_slvr_cfg[Options.VISIBILITY_OUTPUT] = (
+                Options.VISIBILITY_OUTPUT_NONE)
+            X2_slvr_cfg[Options.CPU_BACKEND] = backend
+            X2_slvr_cfg[Options.VISIBILITY_TILE_SHAPE] = tile_shape
+
+            with CPUSolver(slvr_cfg) as cpu_slvr, \
+                CPUSolver(X2_slvr_cfg) as X2_slvr:
+
+                for name in ['model_vis', 'chi_sqrd_result']:
+                    self.assertIn(name, X2_slvr._ignored_arrays)
+
+                cpu_slvr.flag[:] = np.random.random(
+                    size=cpu_slvr.flag.shape) < 0.1
+                cpu_slvr.set_sigma_sqrd(2.0)
+                X2_slvr.set_sigma_sqrd(2.0)
+
+                for name in cpu_slvr.arrays().iterkeys():
+                    if name not in X2_slvr._ignored_arrays:
+                        getattr(X2_slvr, name)[:] = getattr(cpu_slvr, name)
+
+                cpu_slvr.solve()
+                X2_slvr.solve()
+
+                self.assertTrue(np.allclose(cpu_slvr.X2, X2_slvr.X2))
+
+                # Reducing chunks of timesteps in turn
+                ekb_vis = X2_slvr._compute_ekb_vis()
+                self.assertTrue(np.allclose(
+                    X2_slvr.compute_chi_sqrd_sum_chunked(ekb_vis,
+                        chunk_ntime=3),
+                    X2_slvr.compute_chi_sqrd_sum(
+                        X2_slvr.compute_gekb_vis(ekb_vis))))
+
+    def test_X2_bound(self):
+        """
+        Confirm that solving with a chi-squared bound stops
+        early once the partial chi-squared value exceeds the
+        bound, and otherwise produces the full chi-squared value.
+        """
+        for tile_shape in [None, { 'ntime': 2, 'nbl': 20 }]:
+            slvr_cfg = montblanc.rime_solver_cfg(na=14, ntime=10, nchan=16,
+                sources=montblanc.sources(point=10, gaussian=10, sersic=10),
+                dtype=Options.DTYPE_DOUBLE,
+                vis_tile_shape=tile_shape,
+                cpu_threads=1,
+                data_source=Options.DATA_SOURCE_TEST,
+                pipeline=Pipeline([]))
+
+            with CPUSolver(slvr_cfg) as cpu_slvr:
+                self.assertFalse(cpu_slvr.solve())
+                X2 = cpu_slvr.X2
+
+                # The bound is exceeded long before the full solve
+                self.assertTrue(cpu_slvr.solve(x2_bound=X2/10))
+                self.assertTrue(X2/10 < cpu_slvr.X2 < X2)
+
+                # The bound is never exceeded
+                self.assertFalse(cpu_slvr.solve(x2_bound=X2*2))
+                self.assertTrue(np.allclose(cpu_slvr.X2, X2))
+
+    def test_X2_estimate(self):
+        """
+        Confirm that the stochastic chi-squared estimate is exact
+        when all tiles are sampled, and that the mean of estimates
+        over many samples agrees with the chi-squared value.
+        """
+        slvr_cfg = montblanc.rime_solver_cfg(na=7, ntime=20, nchan=8,
+            sources=montblanc.sources(point=5, gaussian=5, sersic=5),
+            dtype=Options.DTYPE_DOUBLE,
+            data_source=Options.DATA_SOURCE_TEST,
+            pipeline=Pipeline([]))
+
+        with CPUSolver(slvr_cfg) as cpu_slvr:
+            cpu_slvr.set_sigma_sqrd(2.0)
+            cpu_slvr.solve()
+            X2 = cpu_slvr.X2
+
+            X2_est, X2_var = cpu_slvr.estimate_X2(1.0)
+            self.assertTrue(np.allclose(X2_est, X2))
+            self.assertEqual(X2_var, 0.0)
+
+            estimates, variances = zip(*[cpu_slvr.estimate_X2(0.25, seed=s)
+                for s in range(100)])
+
+            # Estimates from a subset of tiles have non-zero variance
+            self.assertTrue(all(v > 0 for v in variances))
+            self.assertTrue(abs(np.mean(estimates) - X2) <
+                5*np.sqrt(np.mean(variances)/len(estimates)))
+
+    def test_resolution_levels(self):
+        """
+        Confirm that the chi-squared value at the full resolution
+        level matches the solver's chi-squared value, that averaged
+        levels have reduced dimensions, that levels are updated
+        when the solver's arrays are modified, and that angles
+        are averaged across their wrap.
+        """
+        for weight_vector in [True, False]:
+            slvr_cfg = montblanc.rime_solver_cfg(na=7, ntime=10, nchan=16,
+                sources=montblanc.sources(point=5, gaussian=5, sersic=5),
+                dtype=Options.DTYPE_DOUBLE,
+                weight_vector=weight_vector,
+                data_source=Options.DATA_SOURCE_TEST,
+                pipeline=Pipeline([]))
+
+            with CPUSolver(slvr_cfg) as cpu_slvr:
+                cpu_slvr.set_sigma_sqrd(2.0)
+                cpu_slvr.flag[:] = np.random.random(
+                    size=cpu_slvr.flag.shape) < 0.1
+                cpu_slvr.build_resolution_levels([(1, 1), (4, 4)])
+
+                cpu_slvr.solve()
+                self.assertTrue(np.allclose(cpu_slvr.X2,
+                    cpu_slvr.compute_X2_at_level(1, 1)))
+
+                level_slvr = cpu_slvr.resolution_level(4, 4)
+                self.assertEqual(level_slvr.dim_local_size('ntime', 'nchan'),
+                    [3, 4])
+
+                X2 = cpu_slvr.compute_X2_at_level(4, 4)
+                self.assertTrue(X2 > 0)
+
+                # Modified source parameters are transferred
+                cpu_slvr.lm[:] += 1e-3
+                self.assertNotEqual(cpu_slvr.compute_X2_at_level(4, 4), X2)
+
+                # Modified data arrays are averaged again
+                cpu_slvr.lm[:] -= 1e-3
+                cpu_slvr.transfer_observed_vis(2*cpu_slvr.observed_vis)
+                self.assertNotEqual(cpu_slvr.compute_X2_at_level(4, 4), X2)
+
+                cpu_slvr.solve()
+                self.assertTrue(np.allclose(cpu_slvr.X2,
+                    cpu_slvr.compute_X2_at_level(1, 1)))
+
+                # Parallactic angles straddling the wrap at +-pi
+                # average to the wrap, rather than to zero
+                pa = np.empty_like(cpu_slvr.parallactic_angles)
+                pa[0::2], pa[1::2] = np.pi - 1e-2, -np.pi + 1e-2
+                cpu_slvr.transfer_parallactic_angles(pa)
+
+                level_pa = cpu_slvr.resolution_level(4, 4).parallactic_angles
+                self.assertTrue(np.allclose(np.abs(level_pa), np.pi))
+
+    def test_bda_solve(self):
+        """
+        Confirm that model visibilities predicted with
+        baseline-dependent averaging are within the error
+        bound of the exact model visibilities, and that
+        angles are averaged across their wrap.
+        """
+        na, ntime, nchan, npsrc = 7, 16, 8, 5
+        tolerance = 1e-2
+
+        slvr_cfg = montblanc.rime_solver_cfg(na=na, ntime=ntime, nchan=nchan,
+            sources=montblanc.sources(point=npsrc, gaussian=0, sersic=0),
+            dtype=Options.DTYPE_DOUBLE,
+            data_source=Options.DATA_SOURCE_DEFAULT,
+            pipeline=Pipeline([]))
+
+        bda_slvr_cfg = slvr_cfg.copy()
+        bda_slvr_cfg[Options.BDA_TOLERANCE] = tolerance
+
+        # Antennas at a range of distances, rotating slowly
+        radius = np.logspace(1, 3, na)
+        angle = (np.random.random(na)*2*np.pi +
+            np.arange(ntime)[:,np.newaxis]*1e-3)
+        lm = (np.random.random(size=(npsrc, 2)) - 0.5)*1e-2
+
+        with CPUSolver(slvr_cfg) as cpu_slvr, \
+            CPUSolver(bda_slvr_cfg) as bda_slvr:
+
+            for slvr in (cpu_slvr, bda_slvr):
+                slvr.uvw[:,:,0] = radius*np.cos(angle)
+                slvr.uvw[:,:,1] = radius*np.sin(angle)
+                slvr.uvw[:,:,2] = radius*1e-2
+                slvr.lm[:] = lm
+                slvr.alpha[:] = 0
+                slvr.solve()
+
+            time_factors, chan_factors = bda_slvr.bda_factors()
+            self.assertTrue(np.any(time_factors > 1))
+            self.assertTrue(np.any(time_factors == 1))
+
+            # Each unpolarised unit source contributes an error
+            # of at most the tolerance to each visibility
+            self.assertTrue(np.abs(cpu_slvr.model_vis -
+                bda_slvr.model_vis).max() <= tolerance*npsrc)
+            self.assertTrue(np.allclose(cpu_slvr.X2, bda_slvr.X2,
+                rtol=tolerance))
+
+            # Parallactic angles of the averaged sub-solvers
+            # are averaged across the wrap at +-pi
+            bda_slvr.parallactic_angles[0::2] = np.pi - 1e-2
+            bda_slvr.parallactic_angles[1::2] = -np.pi + 1e-2
+            subslvr = bda_slvr._bda_sub_solver(np.arange(3), 4, 1)
+            self.assertTrue(np.allclose(
+                np.abs(subslvr.parallactic_angles), np.pi))
+
+    def test_sparse_flags(self):
+        """
+        Confirm that summing coherencies only over unflagged
+        samples produces the same model visibilities, residuals
+        and chi-squared value as summing over all samples.
+        """
+        for vis_output in [Options.VISIBILITY_OUTPUT_MODEL,
+                Options.VISIBILITY_OUTPUT_RESIDUALS]:
+            slvr_cfg = montblanc.rime_solver_cfg(na=14, ntime=10, nchan=16,
+                sources=montblanc.sources(point=10, gaussian=10, sersic=10),
+                dtype=Options.DTYPE_DOUBLE,
+                weight_vector=True,
+                vis_output=vis_output,
+                data_source=Options.DATA_SOURCE_TEST,
+                pipeline=Pipeline([]))
+
+            sparse_slvr_cfg = slvr_cfg.copy()
+            sparse_slvr_cfg[Options.SPARSE_FLAGS] = True
+
+            with CPUSolver(slvr_cfg) as cpu_slvr, \
+                CPUSolver(sparse_slvr_cfg) as sparse_slvr:
+
+                # Flag half of the samples, some correlations,
+                # a timestep and a range of channels
+                cpu_slvr.flag[:] = np.random.random(
+                    size=cpu_slvr.flag.shape[:3] + (1,)) < 0.5
+                cpu_slvr.flag[...,1] = np.random.random(
+                    size=cpu_slvr.flag.shape[:3]) < 0.5
+                cpu_slvr.flag[3] = 1
+                cpu_slvr.flag[:,:,5:9] = 1
+
+                for name in cpu_slvr.arrays().iterkeys():
+                    if name not in sparse_slvr._ignored_arrays:
+                        getattr(sparse_slvr, name)[:] = getattr(cpu_slvr, name)
+
+                cpu_slvr.solve()
+                sparse_slvr.solve()
+
+                self.assertTrue(np.allclose(cpu_slvr.model_vis,
+                    sparse_slvr.model_vis))
+                self.assertTrue(np.allclose(cpu_slvr.X2, sparse_slvr.X2))
+
+    def test_diagonal_correlations(self):
+        """
+        Confirm that summing coherencies over the diagonal
+        correlations only, for an unpolarised sky and diagonal
+        or scalar beams, produces the same model visibilities
+        and chi-squared value as summing all four correlations.
+        """
+        for scalar, tile_shape in itertools.product([False, True],
+                [None, { 'ntime': 3, 'nbl': 20 }]):
+            slvr_cfg = montblanc.rime_solver_cfg(na=14, ntime=10, nchan=16,
+                sources=montblanc.sources(point=10, gaussian=10, sersic=10),
+                dtype=Options.DTYPE_DOUBLE,
+                data_source=Options.DATA_SOURCE_TEST,
+                polarisation_mode=Options.POLARISATION_MODE_AUTO,
+                vis_tile_shape=tile_shape,
+                pipeline=Pipeline([]))
+
+            full_slvr_cfg = slvr_cfg.copy()
+            full_slvr_cfg[Options.POLARISATION_MODE] = (
+                Options.POLARISATION_MODE_FULL)
+
+            with CPUSolver(slvr_cfg) as cpu_slvr, \
+                CPUSolver(full_slvr_cfg) as full_slvr:
+
+                # Polarised sources need all correlations
+                self.assertIsNone(cpu_slvr.diagonal_correlations())
+
+                # Unpolarised sky and diagonal beam
+                cpu_slvr.stokes[:,:,1:] = 0
+                cpu_slvr.E_beam[:,:,:,1:3] = 0
+
+                if scalar:
+                    cpu_slvr.E_beam[:,:,:,3] = cpu_slvr.E_beam[:,:,:,0]
+
+                cpu_slvr.mark_dirty('stokes', 'E_beam')
+
+                self.assertEqual(cpu_slvr.diagonal_correlations(),
+                    [0] if scalar else [0, 3])
+
+                # The reduced correlations are loaded
+                # from the corners of the full cube
+                offsets = cpu_slvr.beam_corners(*(np.zeros((2, 3))
+                    for i in range(3)))[0]
+                corners, corner_abs = cpu_slvr.gather_beam_corners(
+                    offsets, corrs=[0, 3])
+                E_flat = cpu_slvr.E_beam.reshape(-1, 4)
+                self.assertTrue(np.array_equal(corners,
+                    E_flat[offsets][...,[0, 3]]))
+                self.assertTrue(np.allclose(corner_abs,
+                    np.abs(E_flat[offsets][...,[0, 3]])))
+
+                for name in cpu_slvr.arrays().iterkeys():
+                    if name not in full_slvr._ignored_arrays:
+                        getattr(full_slvr, name)[:] = getattr(cpu_slvr, name)
+
+                self.assertIsNone(full_slvr.diagonal_correlations())
+
+                # Sub-solvers take the correlations of this solver
+                subslvr = cpu_slvr._sub_solver(cpu_slvr._source_slice(0, 5))
+                self.assertNotEqual(subslvr._polarisation_mode,
+                    Options.POLARISATION_MODE_AUTO)
+                self.assertEqual(subslvr.diagonal_correlations(),
+                    cpu_slvr.diagonal_correlations())
+
+                cpu_slvr.solve()
+                full_slvr.solve()
+
+                self.assertTrue(np.allclose(cpu_slvr.model_vis,
+                    full_slvr.model_vis))
+                self.assertTrue(np.allclose(cpu_slvr.X2, full_slvr.X2))
+
+    def test_reduced_polarisations(self):
+        """
+        Confirm that solving for npol = 2 (XX and YY) and npol = 1
+        (XX) produces the corresponding correlations of the npol = 4
+        model visibilities, along with the chi-squared value and
+        gradient of npol = 4 with the remaining correlations flagged.
+        """
+        backends = [Options.CPU_BACKEND_NUMEXPR]
+
+        try:
+            import numba
+            backends.append(Options.CPU_BACKEND_NUMBA)
+        except ImportError:
+            pass
+
+        for npol, backend in itertools.product([1, 2], backends):
+            slvr_cfg = montblanc.rime_solver_cfg(na=7, ntime=5, nchan=8,
+                sources=montblanc.sources(point=3, gaussian=3, sersic=3),
+                dtype=Options.DTYPE_DOUBLE,
+                data_source=Options.DATA_SOURCE_TEST,
+                cpu_backend=backend,
+                pipeline=Pipeline([]))
+
+            pol_slvr_cfg = slvr_cfg.copy()
+            pol_slvr_cfg[Options.NPOL] = npol
+
+            with CPUSolver(slvr_cfg) as cpu_slvr, \
+                CPUSolver(pol_slvr_cfg) as pol_slvr:
+
+                pols = pol_slvr.polarisation_indices()
+                self.assertEqual(pol_slvr.model_vis.shape[3], npol)
+
+                # Flag the correlations that aren't held
+                cpu_slvr.flag[:,:,:,[c for c in range(4) if c not in pols]] = 1
+
+                for name in cpu_slvr.arrays().iterkeys():
+                    if name in pol_slvr._ignored_arrays:
+                        continue
+
+                    ary = getattr(cpu_slvr, name)
+
+                    if pol_slvr.arrays()[name]['shape'][-1] == Options.NPOL:
+                        ary = ary[:,:,:,pols]
+
+                    getattr(pol_slvr, name)[:] = ary
+
+                cpu_slvr.solve()
+                pol_slvr.solve()
+
+                self.assertTrue(np.allclose(pol_slvr.model_vis,
+                    cpu_slvr.model_vis[:,:,:,pols]))
+                self.assertTrue(np.allclose(pol_slvr.X2, cpu_slvr.X2))
+
+                gradient = cpu_slvr.compute_X2_gradient()
+                pol_gradient = pol_slvr.compute_X2_gradient()
+
+                for name, grad in gradient.iteritems():
+                    self.assertTrue(np.allclose(pol_gradient[name], grad))
+
+    def test_E_beam_amplitudes(self):
+        """
+        Confirm that the beam cube amplitudes are recomputed
+        only when the beam cube is marked dirty, that they are
+        shared with sub-solvers, including sub-solvers created
+        on several threads, and that the interpolated
+        beam follows modifications to the beam cube.
+        """
+        slvr_cfg = montblanc.rime_solver_cfg(na=7, ntime=5, nchan=8,
+            sources=montblanc.sources(point=3, gaussian=2, sersic=1),
+            dtype=Options.DTYPE_DOUBLE,
+            data_source=Options.DATA_SOURCE_TEST,
+            pipeline=Pipeline([]))
+
+        with CPUSolver(slvr_cfg) as cpu_slvr, \
+            CPUSolver(slvr_cfg) as other_slvr:
+
+            amplitudes = cpu_slvr.E_beam_amplitudes()
+            self.assertTrue(np.allclose(amplitudes, np.abs(cpu_slvr.E_beam)))
+            self.assertIs(amplitudes, cpu_slvr.E_beam_amplitudes())
+
+            subslvr = cpu_slvr._sub_solver({})
+            self.assertIs(amplitudes, subslvr.E_beam_amplitudes())
+
+            # Unmodified beam cubes keep their amplitudes
+            cpu_slvr.mark_dirty('point_errors')
+            self.assertIs(amplitudes, cpu_slvr.E_beam_amplitudes())
+
+            cpu_slvr.E_beam[:] *= 1j - 2
+            cpu_slvr.mark_dirty('E_beam')
+
+            self.assertIsNot(amplitudes, cpu_slvr.E_beam_amplitudes())
+            self.assertTrue(np.allclose(cpu_slvr.E_beam_amplitudes(),
+                np.abs(cpu_slvr.E_beam)))
+
+            for name in cpu_slvr.arrays().iterkeys():
+                if name not in cpu_slvr._ignored_arrays:
+                    getattr(other_slvr, name)[:] = getattr(cpu_slvr, name)
+
+            self.assertTrue(np.allclose(cpu_slvr.compute_E_beam(),
+                other_slvr.compute_E_beam()))
+
+            # Sub-solvers created concurrently share a
+            # single computation of the amplitudes
+            cpu_slvr.E_beam[:] *= 2
+            cpu_slvr.mark_dirty('E_beam')
+            subslvrs = []
+
+            def _create_sub_solver():
+                subslvrs.append(cpu_slvr._sub_solver({}))
+
+            threads = [threading.Thread(target=_create_sub_solver)
+                for i in xrange(8)]
+
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+            amplitudes = cpu_slvr.E_beam_amplitudes()
+            self.assertTrue(np.allclose(amplitudes, np.abs(cpu_slvr.E_beam)))
+
+            for subslvr in subslvrs:
+                self.assertIs(amplitudes, subslvr.E_beam_amplitudes())
+
+    def test_analytic_beams(self):
+        """
+        Confirm that analytic beam models are evaluated in closed
+        form without a beam cube, and that the analytic gradient
+        of the chi-squared value matches central finite differences.
+        """
+        beam_models = [Options.BEAM_MODEL_COS3, Options.BEAM_MODEL_GAUSSIAN]
+
+        try:
+            from scipy.special import j1
+            beam_models.append(Options.BEAM_MODEL_AIRY)
+        except ImportError:
+            pass
+
+        for beam_model in beam_models:
+            slvr_cfg = montblanc.rime_solver_cfg(na=5, ntime=3, nchan=4,
+                sources=montblanc.sources(point=2, gaussian=1, sersic=1),
+                dtype=Options.DTYPE_DOUBLE,
+                data_source=Options.DATA_SOURCE_TEST,
+                beam_model=beam_model,
+                pipeline=Pipeline([]))
+
+            with CPUSolver(slvr_cfg) as cpu_slvr:
+                self.assertIn('E_beam', cpu_slvr._ignored_arrays)
+
+                cpu_slvr.set_beam_width(10)
+                cpu_slvr.gauss_shape[:] = [[1e-3], [1e-3], [1]]
+                cpu_slvr.sersic_shape[:] = [[0.1], [0.1], [1e-5]]
+
+                l, m = cpu_slvr.compute_beam_lm()
+                rho = (cpu_slvr.beam_width*1e-9*np.sqrt(l**2 + m**2)
+                    *cpu_slvr.frequency)
+
+                if beam_model == Options.BEAM_MODEL_COS3:
+                    beam = np.cos(np.minimum(rho, cpu_slvr.beam_clip))**3
+                elif beam_model == Options.BEAM_MODEL_GAUSSIAN:
+                    beam = np.exp(-rho**2)
+                else:
+                    beam = 2*j1(rho)/rho
+
+                E = cpu_slvr.compute_E_beam()
+                self.assertTrue(np.allclose(E[:,:,:,:,0], beam))
+                self.assertTrue(np.allclose(E[:,:,:,:,3], beam))
+                self.assertFalse(np.any(E[:,:,:,:,1:3]))
+
+                gradient = cpu_slvr.compute_X2_gradient()['lm']
+                fd_gradient = np.empty_like(gradient)
+
+                for idx in np.ndindex(cpu_slvr.lm.shape):
+                    x = cpu_slvr.lm[idx]
+                    h = 1e-6*max(abs(x), 1e-3)
+
+                    cpu_slvr.lm[idx] = x + h
+                    cpu_slvr.solve()
+                    X2_plus = cpu_slvr.X2
+
+                    cpu_slvr.lm[idx] = x - h
+                    cpu_slvr.solve()
+                    X2_minus = cpu_slvr.X2
+
+                    cpu_slvr.lm[idx] = x
+                    fd_gradient[idx] = (X2_plus - X2_minus) / (2*h)
+
+                self.assertTrue(np.allclose(gradient, fd_gradient,
+                    rtol=1e-4, atol=1e-4*np.abs(fd_gradient).max()),
+                    '{b} lm gradient mismatch'.format(b=beam_model))
+
+    def test_beam_time_decimation(self):
+        """
+        Confirm that the E term is evaluated exactly on the
+        decimated timesteps, and linearly interpolated between
+        them, for both the time factor and maximum rotation options.
+        """
+        ntime = 8
+
+        for option, value, factor in (
+                (Options.BEAM_TIME_FACTOR, 3, 3),
+                (Options.BEAM_MAX_ROTATION, 0.025, 2)):
+            slvr_cfg = montblanc.rime_solver_cfg(na=5, ntime=ntime, nchan=4,
+                sources=montblanc.sources(point=2, gaussian=1, sersic=1),
+                dtype=Options.DTYPE_DOUBLE,
+                data_source=Options.DATA_SOURCE_TEST,
+                pipeline=Pipeline([]))
+
+            with CPUSolver(slvr_cfg) as full_slvr:
+                slvr_cfg[option] = value
+
+                with CPUSolver(slvr_cfg) as cpu_slvr:
+                    for name in full_slvr.arrays().iterkeys():
+                        if name not in full_slvr._ignored_arrays:
+                            getattr(cpu_slvr, name)[:] = getattr(full_slvr, name)
+
+                    pa = np.linspace(0, 0.01*(ntime-1), ntime)
+                    cpu_slvr.parallactic_angles[:] = pa[:,np.newaxis]
+                    full_slvr.parallactic_angles[:] = pa[:,np.newaxis]
+
+                    self.assertEqual(cpu_slvr.beam_time_factor(), factor)
+                    samples = cpu_slvr.beam_time_samples()
+                    self.assertTrue(np.array_equal(samples,
+                        np.union1d(np.arange(0, ntime, factor), [ntime-1])))
+
+                    E = cpu_slvr.compute_E_beam()
+                    E_full = full_slvr.compute_E_beam()
+                    self.assertEqual(E.shape, E_full.shape)
+                    self.assertTrue(np.allclose(E[:,samples], E_full[:,samples]))
+
+                    lower, upper = samples[0], samples[1]
+                    for t in range(lower+1, upper):
+                        w = (t - lower) / float(upper - lower)
+                        self.assertTrue(np.allclose(E[:,t],
+                            (1-w)*E_full[:,lower] + w*E_full[:,upper]))
+
+                    cpu_slvr.solve()
+                    full_slvr.solve()
+                    self.assertTrue(np.allclose(cpu_slvr.model_vis,
+                        full_slvr.model_vis, rtol=1e-2, atol=1e-2*
+                            np.abs(full_slvr.model_vis).max()))
+
+    def test_homogeneous_beam(self):
+        """
+        Confirm that a beam shared by all antennas is detected
+        in the auto mode, evaluated once and broadcast across
+        antennas, and that it produces the same visibilities
+        as the per antenna beam.
+        """
+        for beam_model in [Options.BEAM_MODEL_CUBE,
+                Options.BEAM_MODEL_GAUSSIAN]:
+            slvr_cfg = montblanc.rime_solver_cfg(na=7, ntime=5, nchan=8,
+                sources=montblanc.sources(point=3, gaussian=2, sersic=1),
+                dtype=Options.DTYPE_DOUBLE,
+                data_source=Options.DATA_SOURCE_TEST,
+                beam_model=beam_model,
+                homogeneous_beam=Options.HOMOGENEOUS_BEAM_AUTO,
+                pipeline=Pipeline([]))
+
+            per_ant_slvr_cfg = slvr_cfg.copy()
+            per_ant_slvr_cfg[Options.HOMOGENEOUS_BEAM] = (
+                Options.HOMOGENEOUS_BEAM_NEVER)
+
+            with CPUSolver(slvr_cfg) as cpu_slvr, \
+                CPUSolver(per_ant_slvr_cfg) as per_ant_slvr:
+
+                self.assertFalse(cpu_slvr.homogeneous_beam())
+
+                cpu_slvr.parallactic_angles[:] = (
+                    cpu_slvr.parallactic_angles[:,:1])
+                cpu_slvr.point_errors[:] = 0
+                cpu_slvr.antenna_scaling[:] = 1.2
+                cpu_slvr.mark_dirty('parallactic_angles',
+                    'point_errors', 'antenna_scaling')
+
+                for name in cpu_slvr.arrays().iterkeys():
+                    if name not in cpu_slvr._ignored_arrays:
+                        getattr(per_ant_slvr, name)[:] = getattr(cpu_slvr, name)
+
+                self.assertTrue(cpu_slvr.homogeneous_beam())
+                self.assertFalse(per_ant_slvr.homogeneous_beam())
+
+                E = cpu_slvr.compute_E_beam()
+                self.assertEqual(E.strides[2], 0)
+                self.assertTrue(np.allclose(E, per_ant_slvr.compute_E_beam()))
+
+                for dE, per_ant_dE in zip(
+                        cpu_slvr.compute_E_beam_lm_gradient(),
+                        per_ant_slvr.compute_E_beam_lm_gradient()):
+                    self.assertTrue(np.allclose(dE, per_ant_dE))
+
+                cpu_slvr.solve()
+                per_ant_slvr.solve()
+
+                self.assertTrue(np.allclose(cpu_slvr.model_vis,
+                    per_ant_slvr.model_vis))
+                self.assertTrue(np.allclose(cpu_slvr.X2, per_ant_slvr.X2))
+
+                # A pointing error on one antenna breaks homogeneity
+                cpu_slvr.point_errors[:,1,:,:] = 1e-3
+                cpu_slvr.mark_dirty('point_errors')
+                self.assertFalse(cpu_slvr.homogeneous_beam())
+
+                per_ant_slvr.point_errors[:] = cpu_slvr.point_errors
+                cpu_slvr.solve()
+                per_ant_slvr.solve()
+
+                self.assertTrue(np.allclose(cpu_slvr.model_vis,
+                    per_ant_slvr.model_vis))
+
+    def test_beam_compression(self):
+        """
+        Confirm that the E term interpolated from compressed
+        beam cubes matches the E term of the full cube, to the
+        precision of each representation, and that a full
+        rank decomposition is exact.
+        """
+        beam_nud = 6
+
+        for compression, rtol in (
+                (Options.BEAM_COMPRESSION_COMPLEX64, 1e-6),
+                (Options.BEAM_COMPRESSION_FLOAT16, 1e-2),
+                (Options.BEAM_COMPRESSION_SVD, 1e-8)):
+            slvr_cfg = montblanc.rime_solver_cfg(na=5, ntime=3, nchan=8,
+                sources=montblanc.sources(point=3, gaussian=1, sersic=1),
+                beam_nud=beam_nud,
+                dtype=Options.DTYPE_DOUBLE,
+                data_source=Options.DATA_SOURCE_TEST,
+                pipeline=Pipeline([]))
+
+            compressed_slvr_cfg = slvr_cfg.copy()
+            compressed_slvr_cfg[Options.BEAM_COMPRESSION] = compression
+            compressed_slvr_cfg[Options.BEAM_RANK] = beam_nud
+
+            with CPUSolver(slvr_cfg) as cpu_slvr, \
+                CPUSolver(compressed_slvr_cfg) as compressed_slvr:
+
+                for name in cpu_slvr.arrays().iterkeys():
+                    if name not in cpu_slvr._ignored_arrays:
+                        getattr(compressed_slvr, name)[:] = getattr(
+                            cpu_slvr, name)
+
+                E = cpu_slvr.compute_E_beam()
+                compressed_E = compressed_slvr.compute_E_beam()
+                atol = rtol*np.abs(E).max()
+
+                self.assertTrue(np.allclose(compressed_E, E,
+                    rtol=rtol, atol=atol),
+                    '{c} E term mismatch'.format(c=compression))
+                self.assertTrue(np.allclose(
+                    compressed_slvr.compute_E_beam(corrs=[0, 3]),
+                    E[:,:,:,:,[0, 3]], rtol=rtol, atol=atol))
+
+                # The compressed cube is shared with sub-solvers
+                compressed = compressed_slvr.compressed_E_beam()
+                self.assertIs(compressed,
+                    compressed_slvr._sub_solver({}).compressed_E_beam())
+
+                # and rebuilt when the beam cube is marked dirty
+                compressed_slvr.E_beam[:] *= 2
+                compressed_slvr.mark_dirty('E_beam')
+                self.assertIsNot(compressed,
+                    compressed_slvr.compressed_E_beam())
+                self.assertTrue(np.allclose(compressed_slvr.compute_E_beam(),
+                    2*E, rtol=rtol, atol=2*atol))
+
+    def test_beam_clustering(self):
+        """
+        Confirm that clustered sources lie within the tolerance
+        of their cluster centres, and that each source takes
+        the E term of its cluster centre.
+        """
+        tolerance = 1e-2
+
+        for clustering in [Options.BEAM_CLUSTERING_GRID,
+                Options.BEAM_CLUSTERING_KMEANS]:
+            slvr_cfg = montblanc.rime_solver_cfg(na=5, ntime=3, nchan=4,
+                sources=montblanc.sources(point=6, gaussian=4, sersic=2),
+                dtype=Options.DTYPE_DOUBLE,
+                data_source=Options.DATA_SOURCE_TEST,
+                pipeline=Pipeline([]))
+
+            clustered_slvr_cfg = slvr_cfg.copy()
+            clustered_slvr_cfg[Options.BEAM_CLUSTERING] = clustering
+            clustered_slvr_cfg[Options.BEAM_CLUSTER_TOLERANCE] = tolerance
+
+            with CPUSolver(slvr_cfg) as cpu_slvr, \
+                CPUSolver(clustered_slvr_cfg) as clustered_slvr:
+
+                for name in cpu_slvr.arrays().iterkeys():
+                    if name not in cpu_slvr._ignored_arrays:
+                        getattr(clustered_slvr, name)[:] = getattr(
+                            cpu_slvr, name)
+
+                # Place pairs of sources close together
+                clustered_slvr.lm[1::2] = (clustered_slvr.lm[0::2]
+                    + 1e-4*np.random.random(size=(6, 2)))
+                clustered_slvr.mark_dirty('lm')
+
+                centres, labels = clustered_slvr.beam_clusters()
+                self.assertTrue(len(centres) < clustered_slvr.dim_local_size('nsrc'))
+                self.assertTrue(np.all(np.sqrt(((clustered_slvr.lm -
+                    centres[labels])**2).sum(axis=1)) <= tolerance))
+
+                # The E term of each source is that of its centre
+                cpu_slvr.lm[:] = centres[labels]
+                cpu_slvr.mark_dirty('lm')
+
+                self.assertTrue(np.allclose(clustered_slvr.compute_E_beam(),
+                    cpu_slvr.compute_E_beam()))
+
+                for dE, centre_dE in zip(
+                        clustered_slvr.compute_E_beam_lm_gradient(),
+                        cpu_slvr.compute_E_beam_lm_gradient()):
+                    self.assertTrue(np.allclose(dE, centre_dE))
+
+                clustered_slvr.solve()
+
+                # Moving a source clusters it again
+                clustered_slvr.lm[0] += 1
+                clustered_slvr.mark_dirty('lm')
+                centres, labels = clustered_slvr.beam_clusters()
+                self.assertTrue(np.all(np.sqrt(((clustered_slvr.lm -
+                    centres[labels])**2).sum(axis=1)) <= tolerance))
+
+    def test_numba_solve(self):
+        """
+        Confirm that the fused numba kernel produces the same
+        model visibilities, residuals, chi-squared terms and
+        chi-squared value as the numexpr CPU solver, and that
+        options it doesn't support are rejected.
+        """
+        for name, value in (
+                (Options.BEAM_COMPRESSION, Options.BEAM_COMPRESSION_FLOAT16),
+                (Options.BEAM_CLUSTERING, Options.BEAM_CLUSTERING_GRID),
+                (Options.HOMOGENEOUS_BEAM, Options.HOMOGENEOUS_BEAM_ALWAYS),
+                (Options.POLARISATION_MODE, Options.POLARISATION_MODE_SCALAR)):
+            slvr_cfg = montblanc.rime_solver_cfg(na=7, ntime=5, nchan=8,
+                sources=montblanc.sources(point=3, gaussian=2, sersic=1),
+                dtype=Options.DTYPE_DOUBLE,
+                data_source=Options.DATA_SOURCE_TEST,
+                cpu_backend=Options.CPU_BACKEND_NUMBA,
+                pipeline=Pipeline([]))
+            slvr_cfg[name] = value
+
+            with self.assertRaises(ValueError):
+                CPUSolver(slvr_cfg)
+
+        try:
+            import numba
+        except ImportError:
+            raise unittest.SkipTest('numba is not installed')
+
+        for vis_output, tile_shape in itertools.product(
+                [Options.VISIBILITY_OUTPUT_MODEL,
+                    Options.VISIBILITY_OUTPUT_RESIDUALS],
+                [None, { 'ntime': 3, 'nbl': 20 }]):
+            slvr_cfg = montblanc.rime_solver_cfg(na=14, ntime=10, nchan=16,
+                sources=montblanc.sources(point=10, gaussian=10, sersic=10),
+                dtype=Options.DTYPE_DOUBLE,
+                weight_vector=True,
+                vis_output=vis_output,
+                data_source=Options.DATA_SOURCE_TEST,
+                pipeline=Pipeline([]))
+
+            numba_slvr_cfg = slvr_cfg.copy()
+            numba_slvr_cfg[Options.CPU_BACKEND] = Options.CPU_BACKEND_NUMBA
+            numba_slvr_cfg[Options.VISIBILITY_TILE_SHAPE] = tile_shape
+
+            with CPUSolver(slvr_cfg) as cpu_slvr, \
+                CPUSolver(numba_slvr_cfg) as numba_slvr:
+
+                cpu_slvr.flag[:] = np.random.random(
+                    size=cpu_slvr.flag.shape) < 0.1
+
+                for name in cpu_slvr.arrays().iterkeys():
+                    if name not in numba_slvr._ignored_arrays:
+                        getattr(numba_slvr, name)[:] = getattr(cpu_slvr, name)
+
+                cpu_slvr.solve()
+                numba_slvr.solve()
+
+                self.assertTrue(np.allclose(cpu_slvr.model_vis,
+                    numba_slvr.model_vis))
+                self.assertTrue(np.allclose(cpu_slvr.chi_sqrd_result,
+                    numba_slvr.chi_sqrd_result))
+                self.assertTrue(np.allclose(cpu_slvr.X2, numba_slvr.X2))
+
     def test_transpose(self):
         slvr_cfg = montblanc.rime_solver_cfg(na=14, ntime=10, nchan=16,
             sources=montblanc.sources(point=10, gaussian=10),
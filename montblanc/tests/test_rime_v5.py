@@ -150,6 +150,47 @@ class TestRimeV5(unittest.TestCase):
             self.assertTrue(slvr.observed_vis.dtype == np.complex128)
             slvr.solve()
 
+    def test_flagged_chunks(self):
+        """
+        Test that fully flagged chunks are summarised once for
+        each version of the flags, and that skipping them produces
+        the chi-squared value of the CPU solver
+        """
+        slvr_cfg = montblanc.rime_solver_cfg(na=14, ntime=20, nchan=16,
+            sources=montblanc.sources(point=10, gaussian=10, sersic=10),
+            beam_lw=50, beam_mh=50, beam_nud=50,
+            weight_vector=True, dtype=Options.DTYPE_DOUBLE)
+
+        cpu_slvr_cfg = slvr_cfg.copy()
+        cpu_slvr_cfg[Options.DATA_SOURCE] = Options.DATA_SOURCE_TEST
+
+        with solver(slvr_cfg) as slvr, CPUSolver(cpu_slvr_cfg) as cpu_slvr:
+            cpu_slice, gpu_slice = next(slvr._gen_vis_slices())
+            t, bl, ch = (cpu_slice[d] for d in ('ntime', 'nbl', 'nchan'))
+
+            flag = np.zeros_like(slvr.flag)
+            flag[t, bl, ch] = 1
+            slvr.transfer_flag(flag)
+
+            chunks = slvr._flagged_vis_chunks()
+            self.assertIn((t.start, bl.start, ch.start), chunks)
+            self.assertIs(chunks, slvr._flagged_vis_chunks())
+
+            # The summary is recomputed once the flags are marked dirty
+            slvr.flag[:] = 0
+            slvr.mark_dirty('flag')
+            self.assertEqual(len(slvr._flagged_vis_chunks()), 0)
+            slvr.transfer_flag(flag)
+
+            for name in cpu_slvr.arrays().iterkeys():
+                if name not in cpu_slvr._ignored_arrays:
+                    getattr(cpu_slvr, name)[:] = getattr(slvr, name)
+
+            slvr.solve()
+            cpu_slvr.solve()
+
+            self.assertTrue(np.allclose(slvr.X2, cpu_slvr.X2))
+            self.assertTrue(np.all(slvr.model_vis[t, bl, ch] == 0))
 
 if __name__ == '__main__':
     suite = unittest.TestLoader().loadTestsFromTestCase(TestRimeV5)
@@ -202,6 +202,33 @@ class TestUtils(unittest.TestCase):
         self.assertTrue(np.all(ary[0] == fl))
         self.assertTrue(np.all(ary[1] == fm))
 
+    def test_flagged_chunk_starts(self):
+        """
+        Test that the starts of the fully flagged chunks of
+        a partially flagged visibility space are found
+        """
+        ntime, nbl, nchan, npol = 6, 5, 8, 4
+        flag = np.zeros(shape=(ntime, nbl, nchan, npol), dtype=np.uint8)
+
+        # Fully flag two chunks, and one correlation of another
+        flag[0:2, 0:3, 4:8] = 1
+        flag[4:6, 3:5, 0:4] = 1
+        flag[2:4, 0:3, 0:4, 0] = 1
+
+        cpu_slices = [{ 'ntime': slice(t, t+2, 1),
+                'nbl': slice(bl, min(bl+3, nbl), 1),
+                'nchan': slice(ch, ch+4, 1) }
+            for t in range(0, ntime, 2)
+            for bl in range(0, nbl, 3)
+            for ch in range(0, nchan, 4)]
+
+        self.assertEqual(mbu.flagged_chunk_starts(flag, cpu_slices),
+            set([(0, 0, 4), (4, 3, 0)]))
+
+        flag[:] = 1
+        self.assertEqual(len(mbu.flagged_chunk_starts(flag, cpu_slices)),
+            len(cpu_slices))
+
     def test_config_file(self):
         """ Test config file """
         import tempfile
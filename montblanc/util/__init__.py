@@ -25,6 +25,7 @@ import re
 import montblanc
 
 from ary_dim_eval import eval_expr, eval_expr_names_and_nrs
+from derived_term import DerivedTerm
 from sky_model_parser import parse_sky_model
 
 from const_data import (
@@ -111,6 +112,34 @@ def flatten(nested):
 
     return flat_return
 
+def flagged_chunk_starts(flag, cpu_slices):
+    """
+    Return the chunks of the visibility space in
+    which all visibilities are flagged
+
+    Arguments
+    ---------------
+    flag : ndarray
+        (ntime, nbl, nchan, npol) array of flags
+    cpu_slices : iterable
+        Dictionaries of the 'ntime', 'nbl' and 'nchan'
+        slices describing each chunk
+
+    Returns
+    -----------
+    The set of (time, baseline, channel)
+    starts of the fully flagged chunks.
+    """
+    flagged = set()
+
+    for cpu_slice in cpu_slices:
+        t, bl, ch = (cpu_slice[d] for d in ('ntime', 'nbl', 'nchan'))
+
+        if flag[t, bl, ch].all():
+            flagged.add((t.start, bl.start, ch.start))
+
+    return flagged
+
 def dict_array_bytes(ary, template):
     """
     Return the number of bytes required by an array
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015 Simon Perkins
+#
+# This file is part of montblanc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+import threading
+
+class DerivedTerm(object):
+    """
+    Term derived from solver arrays, such as the amplitudes
+    of the beam cube, along with the versions of the arrays
+    from which it was derived. Threads sharing the term wait
+    on a lock while it is computed, so that it is computed once.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = None
+        self._value = None
+        self._pinned = False
+
+    def get(self, versions, compute):
+        """
+        Returns the term, calling compute() to compute it if
+        versions, the versions of the arrays from which the term
+        is derived, differ from those of the last computation.
+        """
+        with self._lock:
+            if not self._pinned and self._versions != versions:
+                # Release the previous term first
+                self._value = self._versions = None
+                self._value = compute()
+                self._versions = versions
+
+            return self._value
+
+    def pin(self, value):
+        """
+        Fixes the term to value, which is returned whatever
+        the array versions. Used to share a term with
+        sub-solvers over views of the arrays
+        from which the term was derived.
+        """
+        with self._lock:
+            self._value = value
+            self._pinned = True